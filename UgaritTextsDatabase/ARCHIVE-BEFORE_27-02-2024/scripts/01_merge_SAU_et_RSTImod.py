@@ -4,97 +4,293 @@ import pandas as pd
 import numpy as np
 import os
 import re
+import sys
+from collections import defaultdict
 
 ROOT_PATH = os.getcwd()
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
 INPUT_DBN_PATH = os.path.join(ROOT_PATH, 'RSTI_MODIFIED.csv')
 INPUT_SAU_PATH = os.path.join(ROOT_PATH, 'SAU_COLLECTION.csv')
 OUTPUT_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
 
+# NOTE: modules shared with analyse.py are kept in CURRENT_VERSION.
+sys.path.append(os.path.join(SCRIPTS_PATH, '..', '..', 'CURRENT_VERSION'))
+from excavation_numbers import decode_ex_nums, encode_ex_nums, explode_ex_nums
+from database_schema import MERGED_ENTRY_SCHEMA, SAU_COLLECTION_SCHEMA, RSTI_MODIFIED_SCHEMA, validate_columns
+from run_log import measure_stage, save_run_log, print_run_log
+from fuzzy_ex_nums import find_similar_rs_numbers
+
+SCRIPT_NAME = os.path.basename(__file__)
 
-empty_entry_dict = {
-        'Excavation Siglum': np.nan,
-        'Excavation Numbers "Cleared"': np.nan,
-        'Excavation Numbers UTDB (+-RSTI)': np.nan,
-        'Excavation Numbers SAU': np.nan,
-        'KTU3': np.nan,
-        'SAU Biblio (not full!!)': np.nan,
-        'Script': np.nan,
-        'Language': np.nan,
-        'SAU Script': np.nan,
-        'SAU Language': np.nan,
-        'SAU Script et Language': np.nan,
-        'SAU genre': np.nan,
-        'RSTI object type': np.nan,
-        'RSTI description': np.nan,
-        'Archive/General area': np.nan,
-        'SAU Archive/General area': np.nan,
-        'Detail in General': np.nan,
-        'SAU Detail in General': np.nan,
-        'SAU findspot': np.nan,
-        'possible relevant (religious) genres': np.nan,
-        '"Clemens 2001"': np.nan,
-        'Clemens Type': np.nan,
-        'Clemens Note': np.nan,
-        'Seal': np.nan,
-        'Size': np.nan,
-        'Museal Siglum': np.nan,
-        'SAU Museal Siglum': np.nan,
-        'TEO findspot': np.nan,
-        'Topographic Point': np.nan,
-        'SAU p.t.': np.nan,
-        'Depth': np.nan,
-        'SAU Depth': np.nan,
-        'Note': np.nan
-    }
 
+empty_entry_dict = dict.fromkeys(MERGED_ENTRY_SCHEMA, np.nan)
+
+# NOTE: excavation numbers found in one source only are proposed as links to numbers of the other source within this distance (see fuzzy_ex_nums.py), e.g. "24.244" and "24.424" are in distance 1.
+MAX_CANDIDATE_DISTANCE = 1
+
+# NOTE: entries linked by shared excavation numbers (see collect_components) are merged to one entry only if there are at most this many of them and their UTDB (+-RSTI) entries are not linked only through one SAU entry (see review_reason); the other components are split (see split_component) and listed in a separate CSV to be checked by hand.
+MAX_MERGED_COMPONENT_SIZE = 4
+
+
+# NOTE: SAU separates the numbers of joined fragments by "+", "=", "|" (also in brackets, e.g. "(+)", "[=]"); a number may be in square brackets with spaces in it (e.g., "[Varia 1]").
+SAU_ex_num_separators = re.compile(r'\(\+\)|\[\+\]|\+|\(=\)|\[=\]|=|\|')
+SAU_ex_num_pattern = re.compile(r'(\[[^\]]*\]|\S+)')
+
+# NOTE: only letters, numbers, ".", "," and "-" are kept in the cleared excavation numbers.
+rs_num_deleted_chars = re.compile(r'[^\w.,-]|_')
 
 
 def interpret_SAU_desses(full_RS:str)->list:
-    text = full_RS.replace('(+)', ' ').replace('[+]', ' ').replace('+', ' ').replace('(=)', ' ').replace('[=]', ' ').replace('=', ' ').replace('|', ' ')
+    return SAU_ex_num_pattern.findall(SAU_ex_num_separators.sub(' ', full_RS))
 
-    pattern = r'\[[^\]]*\]|\S+'
-    result = re.findall(pattern, text)
-    
-    return result
+
+def explode_SAU_desses(RS_column:pd.core.series.Series)->pd.core.series.Series:
+    """ This splits the whole column with SAU excavation numbers as interpret_SAU_desses splits one cell: one number per item, indexed by the index of its row (see explode_ex_nums in excavation_numbers.py). """
+    # NOTE: str.findall with explode is several times faster than str.extractall; rows without any number are exploded to empty items, which are dropped.
+    ex_nums = RS_column.str.replace(SAU_ex_num_separators, ' ', regex=True).str.findall(SAU_ex_num_pattern).explode().dropna()
+    return pd.Series(ex_nums.to_numpy(dtype=object), index=ex_nums.index, dtype=object, name=RS_column.name)
 
 
 def clear_rs_num(orig_rs_num:str)->str:
-    cleared_rs = ''
-    for char in orig_rs_num:
-        if char.isnumeric() or char.isalpha() or char =='.' or char == ',' or char == '-':
-            cleared_rs += char
+    return rs_num_deleted_chars.sub('', orig_rs_num)
+
+
+def clear_rs_nums(ex_nums:pd.core.series.Series)->pd.core.series.Series:
+    """ This clears all excavation numbers of the series as clear_rs_num clears one. The characters to be deleted are taken from the characters of the series, so that they are deleted by one str.translate. """
+    ex_nums = ex_nums.astype(object)
+    chars = set(''.join(ex_nums))
+    deleted_chars = ''.join(char for char in chars if rs_num_deleted_chars.match(char))
+    return ex_nums.str.translate(str.maketrans('', '', deleted_chars))
+
+
+def rs_numbers_table(ex_nums_column:pd.core.series.Series, explode_ex_nums_column)->pd.core.frame.DataFrame:
+    """
+    This function splits and clears all excavation numbers of a source at once.
+
+    Args:
+        ex_nums_column (pd.core.series.Series): column with the excavation numbers of the entries
+        explode_ex_nums_column (function): splits the column to one number per item (e.g., explode_SAU_desses)
+
+    Returns:
+        pd.core.frame.DataFrame: one row per excavation number, in the order of the entries and of the numbers in them: "row_id" (index of the entry), "ex_num" (the number as written in the source) and "rs_number" (the cleared number)
+    """
+    ex_nums = explode_ex_nums_column(ex_nums_column)
+    return pd.DataFrame({'row_id': ex_nums.index, 'ex_num': ex_nums.to_numpy(), 'rs_number': clear_rs_nums(ex_nums).to_numpy()})
+
+
+def index_rs_numbers(entries:dict)->dict:
+    """ This builds an inverted index of the entries, i.e., it points each (cleared) RS number to the list of all keys of the entries in which it appears (in the order of the entries). """
+    rs_index = defaultdict(list)
+    
+    for key, rs_nums in entries.items():
+        for rs_num in rs_nums:
+            keys_of_rs_num = rs_index[rs_num]
+            if not keys_of_rs_num or keys_of_rs_num[-1] != key:
+                keys_of_rs_num.append(key)
     
-    return cleared_rs
+    return rs_index
 
 
-def compare_entries(dict_1:dict, dict_2:dict):
-    """ This function compares to dicts that consist of keys pointing to lists. """
-    # Vytvoření slovníku pro ukládání výsledků
+def match_entries(dict_1:dict, dict_2:dict)->dict:
+    """ This function matches two dicts that consist of keys pointing to lists of RS numbers. For each RS number, it returns the lists of all keys in dict_1 and dict_2 in which the number appears. """
+    index_1 = index_rs_numbers(dict_1)
+    index_2 = index_rs_numbers(dict_2)
+    
     result = {}
+    for val in index_1.keys() | index_2.keys():
+        result[val] = (index_1.get(val, []), index_2.get(val, []))
+    
+    return result
 
-    # Získání všech unikátních hodnot z obou slovníků
-    all_values = set(val for values in dict_1.values() for val in values) | set(val for values in dict_2.values() for val in values)
 
-    # Pro každou hodnotu zjistíme, v kterých klíčích se nachází v obou slovnících
-    for val in all_values:
-        key1 = next((k for k, v in dict_1.items() if val in v), None)
-        key2 = next((k for k, v in dict_2.items() if val in v), None)
+def compare_entries(dict_1:dict, dict_2:dict)->dict:
+    """ This function compares to dicts that consist of keys pointing to lists. For each value, it returns the first key in dict_1 and the first key in dict_2 in which the value appears (or None). """
+    result = {}
+    
+    for val, (keys_1, keys_2) in match_entries(dict_1, dict_2).items():
+        key1 = keys_1[0] if keys_1 else None
+        key2 = keys_2[0] if keys_2 else None
         result[val] = (key1, key2)
 
     return result
 
 
-def clear_all_entries(full_entries:list):
-    rs_nums_on_line_cleared = []
-    for rs in full_entries:
-        rs_clear = clear_rs_num(rs)
-        rs_nums_on_line_cleared.append(rs_clear)
+def clear_all_entries(full_entries:list)->list:
+    """ Returns the cleared excavation numbers of one entry, sorted and without duplicates. """
+    return sorted(set(clear_rs_num(rs) for rs in full_entries))
+
+
+# NOTE: input sources of the merge; each source has its file, schema of its columns (see database_schema.py), column with excavation numbers, and the function that splits this whole column into individual numbers (excavation numbers in RSTI_MODIFIED.csv are saved as python lists, see excavation_numbers.py).
+INPUT_SOURCES = {
+    'SAU': {'path': INPUT_SAU_PATH, 'schema': SAU_COLLECTION_SCHEMA, 'ex_num_column': 'RS', 'explode_ex_nums': explode_SAU_desses},
+    'DBN': {'path': INPUT_DBN_PATH, 'schema': RSTI_MODIFIED_SCHEMA, 'ex_num_column': 'Excavation Numbers', 'explode_ex_nums': explode_ex_nums},
+}
+
+
+def load_corpus()->dict:
+    """
+    This function loads all INPUT_SOURCES only once, so that all phases of the merge may share them.
+
+    Returns:
+        dict: for each source (e.g., "SAU", "DBN"), a dict with the dataframe ("df"), the excavation numbers of each row ("ex_nums"), their cleared versions in the original order ("rs_nums"), and the cleared entries as returned by clear_all_entries ("cleared_entries"); all keyed by the dataframe index.
+    """
+    corpus = {}
+    
+    for source_name, source in INPUT_SOURCES.items():
+        source_df = pd.read_csv(source['path'], encoding='utf-8', delimiter=';', dtype=str)
+        validate_columns(source_df, source['schema'], os.path.basename(source['path']))
         
-    rs_nums_on_line_cleared.sort()
+        # NOTE: all excavation numbers of the source are split and cleared at once (see rs_numbers_table), then grouped by the entries.
+        rs_numbers = rs_numbers_table(source_df[source['ex_num_column']], source['explode_ex_nums'])
+        ex_nums = {idx: [] for idx in source_df.index}
+        rs_nums = {idx: [] for idx in source_df.index}
+        for idx, ex_num, rs_num in zip(rs_numbers['row_id'].tolist(), rs_numbers['ex_num'].tolist(), rs_numbers['rs_number'].tolist()):
+            ex_nums[idx].append(ex_num)
+            rs_nums[idx].append(rs_num)
+        cleared_entries = {idx: sorted(set(rs_nums[idx])) for idx in rs_nums}
         
-    rs_nums_on_line_cleared = list(set(rs_nums_on_line_cleared))
+        corpus[source_name] = {'df': source_df, 'ex_nums': ex_nums, 'rs_nums': rs_nums, 'cleared_entries': cleared_entries}
     
-    return rs_nums_on_line_cleared
+    return corpus
+
+
+class UnionFind:
+    """ Union-find (disjoint sets) of entries that are linked by shared excavation numbers. """
+    def __init__(self):
+        self.parents = {}
+
+    def find(self, node):
+        self.parents.setdefault(node, node)
+        root = node
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[node] != root:
+            self.parents[node], node = root, self.parents[node]
+        return root
+
+    def union(self, node_1, node_2):
+        root_1 = self.find(node_1)
+        root_2 = self.find(node_2)
+        if root_1 != root_2:
+            self.parents[root_2] = root_1
+
+    def groups(self)->dict:
+        """ Returns root --> list of all nodes in the group (in the order in which the nodes were added). """
+        groups = defaultdict(list)
+        for node in self.parents:
+            groups[self.find(node)].append(node)
+        return groups
+
+
+def link_entries(matched_entries:dict, source_names=('SAU', 'DBN'))->UnionFind:
+    """ This links all entries (as (source name, index) tuples) that share any excavation number (see match_entries). """
+    linked_entries = UnionFind()
+    
+    for keys_1, keys_2 in matched_entries.values():
+        nodes = [(source_names[0], key) for key in keys_1] + [(source_names[1], key) for key in keys_2]
+        for node in nodes:
+            linked_entries.union(nodes[0], node)
+    
+    return linked_entries
+
+
+def report_rs_nums(corpus_source:dict, source_name:str):
+    """ This prints excavation numbers that appear more times in one source (on one line or in more entries). """
+    RS_nums_in_source = set()
+    number_of_RS_nums = 0
+
+    for idx in corpus_source['df'].index:
+        rs_cleared_on_line = set()
+        for rs, rs_clear in zip(corpus_source['ex_nums'][idx], corpus_source['rs_nums'][idx]):
+            if rs_clear in RS_nums_in_source:
+                print(rs_clear, rs, 'already in another entry!!')
+            if rs_clear in rs_cleared_on_line:
+                print(rs_clear, rs, '\talready on line')
+            rs_cleared_on_line.add(rs_clear)
+            number_of_RS_nums += 1
+        RS_nums_in_source.update(rs_cleared_on_line)
+        
+    print(f'Number of excavation sigla in {source_name}', number_of_RS_nums)
+
+
+def classify_overlaps(cleared_entries:dict, other_cleared_entries:dict, associated_keys:dict)->dict:
+    """
+    This function classifies the overlap of entries of one source with the entries of the other source.
+
+    Args:
+        cleared_entries (dict): index --> cleared RS numbers of the entry (see load_corpus)
+        other_cleared_entries (dict): the same for the other source
+        associated_keys (dict): RS number --> index of the (first) entry in the other source that contains it, or None
+
+    Returns:
+        dict: "truly fully overlapped" (index --> other index; both entries have the same RS numbers), "fully overlapped" (index --> other index), "partially overlapped with None" (index --> other index; some RS numbers are not in the other source), "not in other" (set of indexes), and "associated with more lines" (index --> list of other indexes)
+    """
+    overlaps = {
+        'truly fully overlapped': {},
+        'fully overlapped': {},
+        'partially overlapped with None': {},
+        'not in other': set(),
+        'associated with more lines': {}
+    }
+
+    for idx, cleared_rs_nums in cleared_entries.items():
+        associated_indexes = list(set(associated_keys[rs] for rs in cleared_rs_nums))
+        
+        if associated_indexes == [None]:
+            overlaps['not in other'].add(idx)
+        elif len(associated_indexes) == 1:
+            if cleared_rs_nums == other_cleared_entries[associated_indexes[0]]:
+                overlaps['truly fully overlapped'][idx] = associated_indexes[0]
+            else:
+                overlaps['fully overlapped'][idx] = associated_indexes[0]
+        elif len(associated_indexes) == 2 and None in associated_indexes:
+            overlaps['partially overlapped with None'][idx] = next(other_idx for other_idx in associated_indexes if other_idx is not None)
+        elif len(associated_indexes) >= 2:
+            overlaps['associated with more lines'][idx] = associated_indexes
+
+    return overlaps
+
+
+def print_overlaps(overlaps:dict, source_name:str, other_source_name:str):
+    print(f'truly_fully_overlapped_entries_{source_name}', len(overlaps['truly fully overlapped']))
+    print(f'fully_overlapped_entries_{source_name}', len(overlaps['fully overlapped']))
+    print(f'partially_overlapped_entries_with_None_{source_name}', len(overlaps['partially overlapped with None']))
+    print(f'entries_in_{source_name}_but_not_in_{other_source_name}', len(overlaps['not in other']))
+    print(f'idxs_in_{source_name}_associated_with_more_lines_in_{other_source_name}', len(overlaps['associated with more lines']))
+    print()
+
+
+def propose_candidate_links(compared_entries:dict, corpus:dict, max_distance:int=MAX_CANDIDATE_DISTANCE)->pd.DataFrame:
+    """
+    This function proposes links of entries that were not linked because their excavation numbers differ slightly (e.g., transposed digits, missing season, "Varia" variants): excavation numbers found only in SAU are compared with the numbers found only in DBN.
+
+    Args:
+        compared_entries (dict): RS number --> (first SAU index, first DBN index), see compare_entries
+        corpus (dict): see load_corpus
+        max_distance (int, optional): the largest distance of the linked numbers. Defaults to MAX_CANDIDATE_DISTANCE.
+
+    Returns:
+        pd.core.frame.DataFrame: the proposed links, the closest first, to be checked by hand
+    """
+    # NOTE: the numbers are sorted so that the list does not depend on the order of the sets in compare_entries.
+    SAU_only_rs_nums = sorted(rs for rs, (SAU_idx, DBN_idx) in compared_entries.items() if DBN_idx is None)
+    DBN_only_rs_nums = sorted(rs for rs, (SAU_idx, DBN_idx) in compared_entries.items() if SAU_idx is None)
+
+    candidate_links = []
+    for SAU_rs, DBN_rs, distance in find_similar_rs_numbers(SAU_only_rs_nums, DBN_only_rs_nums, max_distance):
+        SAU_idx = compared_entries[SAU_rs][0]
+        DBN_idx = compared_entries[DBN_rs][1]
+        candidate_links.append({
+            'Distance': distance,
+            'SAU RS Number': SAU_rs,
+            'UTDB (+-RSTI) RS Number': DBN_rs,
+            'SAU Entry': SAU_idx,
+            'UTDB (+-RSTI) Entry': DBN_idx,
+            'SAU RS': corpus['SAU']['df'].loc[SAU_idx, 'RS'],
+            'UTDB (+-RSTI) Excavation Numbers': corpus['DBN']['df'].loc[DBN_idx, 'Excavation Numbers']
+        })
+
+    return pd.DataFrame(candidate_links, columns=['Distance', 'SAU RS Number', 'UTDB (+-RSTI) RS Number', 'SAU Entry', 'UTDB (+-RSTI) Entry', 'SAU RS', 'UTDB (+-RSTI) Excavation Numbers'])
 
 
 def detect_SAU_script_et_language(SAU_scr_lang:str):
@@ -142,13 +338,16 @@ def detect_SAU_script_et_language(SAU_scr_lang:str):
         return SAU_scr_lang, SAU_languages, SAU_scripts
     
     
-def extract_desired_info_from_DBN_entry(DBN_line_index, DBN_dataframe):
-    line_data_dict = DBN_dataframe.loc[DBN_line_index].to_dict()
+def extract_desired_info_from_DBN_entry(DBN_line_index=None, DBN_dataframe=None, already_line_dictionary=None):
+    if already_line_dictionary:
+        line_data_dict = already_line_dictionary
+    else:
+        line_data_dict = DBN_dataframe.loc[DBN_line_index].to_dict()
     
     transformed_dictionary = {
         'Excavation Siglum': line_data_dict['Excavation Siglum'],
         'Excavation Numbers "Cleared"': 'np.nan',
-        'Excavation Numbers UTDB (+-RSTI)': line_data_dict['Excavation Numbers'],
+        'Excavation Numbers UTDB (+-RSTI)': encode_ex_nums(decode_ex_nums(line_data_dict['Excavation Numbers'])),
         'Excavation Numbers SAU': np.nan,
         'KTU3': line_data_dict['KTU3'],
         'SAU Biblio (not full!!)': np.nan,
@@ -235,11 +434,8 @@ def merge_entries(dict_DBN:dict, dict_SAU:dict, keep_ex_num:str)->dict:
     out_dict = {}
     for key in dict_DBN:
         if key == 'Excavation Numbers "Cleared"':
-            try:
-                entries_in_DBN = eval(dict_DBN['Excavation Numbers UTDB (+-RSTI)'])
-                cleared_entries_in_DBN = clear_all_entries(entries_in_DBN)
-            except:
-                cleared_entries_in_DBN = []
+            entries_in_DBN = decode_ex_nums(dict_DBN['Excavation Numbers UTDB (+-RSTI)'])
+            cleared_entries_in_DBN = clear_all_entries(entries_in_DBN)
                 
             try:
                 entries_in_SAU = interpret_SAU_desses(dict_SAU['Excavation Numbers SAU'])
@@ -249,18 +445,17 @@ def merge_entries(dict_DBN:dict, dict_SAU:dict, keep_ex_num:str)->dict:
             
             if keep_ex_num == 'DBN':
                 cleared_entries_in_DBN.sort()
-                out_dict['Excavation Numbers "Cleared"'] = cleared_entries_in_DBN
+                out_dict['Excavation Numbers "Cleared"'] = encode_ex_nums(cleared_entries_in_DBN)
             elif keep_ex_num == 'SAU':
                 cleared_entries_in_SAU.sort()
-                out_dict['Excavation Numbers "Cleared"'] = cleared_entries_in_SAU
+                out_dict['Excavation Numbers "Cleared"'] = encode_ex_nums(cleared_entries_in_SAU)
             elif keep_ex_num == 'both':
                 all_entries = []
                 for entry in cleared_entries_in_SAU:
                     all_entries.append(entry)
                 for entry in cleared_entries_in_DBN:
                     all_entries.append(entry)
-                all_entries.sort()
-                out_dict['Excavation Numbers "Cleared"'] = list(set(all_entries))
+                out_dict['Excavation Numbers "Cleared"'] = encode_ex_nums(sorted(set(all_entries)))
             else:
                 print('EORROR in Clearing numbers!!!', cleared_entries_in_DBN, cleared_entries_in_SAU)
         elif pd.isna(dict_DBN[key]) and pd.isna(dict_SAU[key]):
@@ -309,364 +504,313 @@ def remove_duplicates_in_dict(input_dict:dict)->dict:
     
     return input_dict
 
-def merge_multiple_SAU_entries_to_one_dict(SAU_dataframe, SAU_indexes:list)->dict:
+def merge_multiple_entries_to_one_dict(dataframe, indexes:list, ex_num_column:str=None)->dict:
+    """ This merges more lines of one dataframe to one dict. If ex_num_column is given, the excavation numbers in this column are decoded and saved again as one list (see excavation_numbers.py), instead of being joined by "|". """
     all_relevant_dicts = []   
-    for idx in SAU_indexes:
+    for idx in indexes:
         if idx == None:
             continue
         else:
-            line_data = SAU_dataframe.loc[idx].to_dict()
+            line_data = dataframe.loc[idx].to_dict()
             all_relevant_dicts.append(line_data)
         
     merged_dict = merge_dicts(all_relevant_dicts)
     
     merged_dict = remove_duplicates_in_dict(merged_dict)
     
+    if ex_num_column:
+        all_ex_nums = {}
+        for line_data in all_relevant_dicts:
+            all_ex_nums.update(dict.fromkeys(decode_ex_nums(line_data[ex_num_column])))
+        merged_dict[ex_num_column] = encode_ex_nums(list(all_ex_nums))
+    
     return merged_dict
 
 
-def main():
-    """ Preparation step 1 - checking RS nums in SAU and DBN """
-    SAU_df = pd.read_csv(INPUT_SAU_PATH, encoding='utf-8', delimiter=';', dtype=str)
+def collect_components(linked_entries:UnionFind, corpus:dict)->list:
+    """
+    This function collects the connected components of the graph of DBN and SAU entries linked by shared excavation numbers (see link_entries). Entries without any link form components of their own.
+
+    Returns:
+        list: components as dicts {'DBN': [indexes], 'SAU': [indexes]}; in the order of the first DBN entry of the component, components with SAU entries only follow in the order of SAU entries
+    """
+    components = {}
+    
+    for source_name in ['DBN', 'SAU']:
+        for idx in corpus[source_name]['df'].index:
+            component = components.setdefault(linked_entries.find((source_name, idx)), {'DBN': [], 'SAU': []})
+            component[source_name].append(idx)
+    
+    return list(components.values())
 
-    RS_nums_in_SAU = []
 
-    for idx in SAU_df.index:
-        rs_cleared_on_line = []
-        rs_nums_on_line = interpret_SAU_desses(SAU_df.loc[idx]['RS'])
-        for rs in rs_nums_on_line:
-            rs_clear = clear_rs_num(rs)
-            if rs_clear in RS_nums_in_SAU:
-                    print(rs_clear, rs, 'already in another entry!!')
-            if rs_clear in rs_cleared_on_line:
-                    print(rs_clear, rs, '\talready on line')
-            rs_cleared_on_line.append(rs_clear)
-        RS_nums_in_SAU.extend(rs_cleared_on_line)
-        
-    print('Number of excavation sigla in SAU', len(RS_nums_in_SAU))
+def find_linking_SAU_entry(component:dict, corpus:dict):
+    """ Returns the index of the SAU entry (with more excavation numbers) without which the UTDB (+-RSTI) entries of the component would not be linked together (e.g., SAU "19.174,1-56" linking 56 tablets of RSTI), or None. """
+    if len(component['DBN']) < 2:
+        return None
 
+    for linking_idx in component['SAU']:
+        if len(corpus['SAU']['cleared_entries'][linking_idx]) < 2:
+            continue
 
-    DBN_df = pd.read_csv(INPUT_DBN_PATH, encoding='utf-8', delimiter=';', dtype=str)
+        # NOTE: the entries of the component are linked again by their shared numbers, without the tested SAU entry.
+        nodes = [('DBN', idx) for idx in component['DBN']] + [('SAU', idx) for idx in component['SAU'] if idx != linking_idx]
+        nodes_by_rs_num = defaultdict(list)
+        for source_name, idx in nodes:
+            for rs_num in corpus[source_name]['cleared_entries'][idx]:
+                nodes_by_rs_num[rs_num].append((source_name, idx))
 
-    RS_nums_in_DBN = []
+        linked_entries = UnionFind()
+        for linked_nodes in nodes_by_rs_num.values():
+            for node in linked_nodes:
+                linked_entries.union(linked_nodes[0], node)
 
-    for idx in DBN_df.index:
-        line_data = DBN_df.loc[idx].to_dict()
+        if len({linked_entries.find(('DBN', idx)) for idx in component['DBN']}) > 1:
+            return linking_idx
 
-        rs_cleared_on_line = []
-        
-        rs_nums_on_line = eval(line_data['Excavation Numbers'])
-        for rs in rs_nums_on_line:
-            rs_clear = clear_rs_num(rs)
-            if rs_clear in RS_nums_in_DBN:
-                    print(rs_clear, rs, 'already in another entry!!')
-            if rs_clear in rs_cleared_on_line:
-                    print(rs_clear, rs, '\talready on line')
-            rs_cleared_on_line.append(rs_clear)
-        
-        RS_nums_in_DBN.extend(rs_cleared_on_line)
-        
-    print('Number of excavation sigla in DBN', len(RS_nums_in_DBN))
-    print()
+    return None
+
+
+def review_reason(component:dict, corpus:dict):
+    """ Returns why the component should not be merged to one entry (see MAX_MERGED_COMPONENT_SIZE), or None if it may be merged. """
+    linking_idx = find_linking_SAU_entry(component, corpus)
+    if linking_idx is not None:
+        return f'UTDB (+-RSTI) entries linked only through SAU {linking_idx}'
+
+    if len(component['DBN']) + len(component['SAU']) > MAX_MERGED_COMPONENT_SIZE:
+        return f'more than {MAX_MERGED_COMPONENT_SIZE} linked entries'
+
+    return None
+
+
+def split_component(component:dict, corpus:dict)->list:
+    """ This splits the component that is not merged to one entry: each UTDB (+-RSTI) entry forms a component with the SAU entries sharing any of its excavation numbers (so these SAU entries may be in more of them), and the SAU entries sharing no number with UTDB (+-RSTI) entries form components of their own. """
+    SAU_idxs_by_rs_num = defaultdict(list)
+    for SAU_idx in component['SAU']:
+        for rs_num in corpus['SAU']['cleared_entries'][SAU_idx]:
+            SAU_idxs_by_rs_num[rs_num].append(SAU_idx)
+
+    split_components = []
+    linked_SAU_idxs = set()
+    for DBN_idx in component['DBN']:
+        shared_SAU_idxs = {SAU_idx for rs_num in corpus['DBN']['cleared_entries'][DBN_idx] for SAU_idx in SAU_idxs_by_rs_num[rs_num]}
+        split_components.append({'DBN': [DBN_idx], 'SAU': [SAU_idx for SAU_idx in component['SAU'] if SAU_idx in shared_SAU_idxs]})
+        linked_SAU_idxs.update(shared_SAU_idxs)
+
+    split_components += [{'DBN': [], 'SAU': [SAU_idx]} for SAU_idx in component['SAU'] if SAU_idx not in linked_SAU_idxs]
+
+    return split_components
+
+
+def resolve_component(component:dict, corpus:dict)->dict:
+    """ This merges all entries of one component (see collect_components) to one entry of the final database. The column "Merged Entries" keeps the indexes of all source entries the record was merged from. """
+    DBN_df = corpus['DBN']['df']
+    SAU_df = corpus['SAU']['df']
+    DBN_idxs = component['DBN']
+    SAU_idxs = component['SAU']
     
-    """ Comparing and clearing the entries. """
+    if len(DBN_idxs) == 1:
+        DBN_dict = extract_desired_info_from_DBN_entry(DBN_idxs[0], DBN_df)
+    elif len(DBN_idxs) > 1:
+        DBN_dict = extract_desired_info_from_DBN_entry(already_line_dictionary=merge_multiple_entries_to_one_dict(DBN_df, DBN_idxs, ex_num_column='Excavation Numbers'))
+    
+    if len(SAU_idxs) == 1:
+        SAU_dict = extract_desired_info_from_SAU_entry(SAU_idxs[0], SAU_df)
+    elif len(SAU_idxs) > 1:
+        SAU_dict = extract_desired_info_from_SAU_entry(already_line_dictionary=merge_multiple_entries_to_one_dict(SAU_df, SAU_idxs))
     
-    SAU_df = pd.read_csv(INPUT_SAU_PATH, encoding='utf-8', delimiter=';', dtype=str)
-    DBN_df = pd.read_csv(INPUT_DBN_PATH, encoding='utf-8', delimiter=';', dtype=str)
+    # Option one: the entry is only in DBN --> add DBN entry
+    if not SAU_idxs:
+        merged_entry = merge_entries(DBN_dict, empty_entry_dict, keep_ex_num='DBN')
+    
+    # Option two: the entry is only in SAU --> add SAU entry
+    elif not DBN_idxs:
+        merged_entry = merge_entries(SAU_dict, empty_entry_dict, keep_ex_num='SAU')
+    
+    # Option three: there is the "full overlap" (ie, all excavation sigla of one DBN entry are in one SAU entry, which has some more) --> keep the DBN entry for clear ex sigla
+    elif len(DBN_idxs) == 1 and len(SAU_idxs) == 1 and set(corpus['DBN']['cleared_entries'][DBN_idxs[0]]) < set(corpus['SAU']['cleared_entries'][SAU_idxs[0]]):
+        merged_entry = merge_entries(DBN_dict, SAU_dict, keep_ex_num='DBN')
+    
+    # Option four: the entries reffer to the same excavation sigla, overlap partially, or there are more entries in DBN and/or SAU associated with this text --> merge entries, keep both ex sigla
+    else:
+        merged_entry = merge_entries(DBN_dict, SAU_dict, keep_ex_num='both')
+    
+    merged_entry['Merged Entries'] = encode_ex_nums([f'UTDB (+-RSTI) {idx}' for idx in DBN_idxs] + [f'SAU {idx}' for idx in SAU_idxs])
+    
+    return merged_entry
 
-    entries_in_SAU = {}
 
-    for idx in SAU_df.index:
-        rs_nums_on_line_cleared = []
-        rs_nums_on_line = interpret_SAU_desses(SAU_df.loc[idx]['RS'])
-        for rs in rs_nums_on_line:
-            rs_clear = clear_rs_num(rs)
-            rs_nums_on_line_cleared.append(rs_clear)
-            
-        entries_in_SAU[idx] = rs_nums_on_line_cleared
+def main():
+    with measure_stage(SCRIPT_NAME, 'load corpus') as record:
+        corpus = load_corpus()
+        record['rows'] = sum(len(source['df']) for source in corpus.values())
+
+    SAU_df = corpus['SAU']['df']
+    DBN_df = corpus['DBN']['df']
+    
+    """ Preparation step 1 - checking RS nums in SAU and DBN """
+    report_rs_nums(corpus['SAU'], 'SAU')
+    report_rs_nums(corpus['DBN'], 'DBN')
+    print()
+    
+    """ Comparing and clearing the entries. """
+    
+    entries_in_SAU = corpus['SAU']['rs_nums']
         
     print('Entries in SAU', len(entries_in_SAU))
 
-    entries_in_DBN = {}
-
-    for idx in DBN_df.index:
-        line_data = DBN_df.loc[idx].to_dict()
-        rs_nums_on_line_cleared = []
-        rs_nums_on_line = eval(line_data['Excavation Numbers'])
-        for rs in rs_nums_on_line:
-            rs_clear = clear_rs_num(rs)
-            rs_nums_on_line_cleared.append(rs_clear)
-            
-        entries_in_DBN[idx] = rs_nums_on_line_cleared
+    entries_in_DBN = corpus['DBN']['rs_nums']
         
     print('Entries in DBN', len(entries_in_DBN))
     print()
 
-    compared_entries_in_SAU_et_DBN = compare_entries(entries_in_SAU, entries_in_DBN)
+    with measure_stage(SCRIPT_NAME, 'match and link entries', rows=len(entries_in_SAU) + len(entries_in_DBN)):
+        matched_entries_in_SAU_et_DBN = match_entries(entries_in_SAU, entries_in_DBN)
+        compared_entries_in_SAU_et_DBN = compare_entries(entries_in_SAU, entries_in_DBN)
+
+        linked_entries = link_entries(matched_entries_in_SAU_et_DBN)
+
+    groups_of_linked_entries = [group for group in linked_entries.groups().values() if len(group) > 1]
+    print('Groups of entries linked by shared excavation numbers', len(groups_of_linked_entries))
+    print()
     
     """ Preparing the data from the perspective of SAU """
     
-    SAU_df = pd.read_csv(INPUT_SAU_PATH, encoding='utf-8', delimiter=';', dtype=str)
-    DBN_df = pd.read_csv(INPUT_DBN_PATH, encoding='utf-8', delimiter=';', dtype=str)
+    with measure_stage(SCRIPT_NAME, 'classify overlaps', rows=len(entries_in_SAU) + len(entries_in_DBN)):
+        SAU_overlaps = classify_overlaps(corpus['SAU']['cleared_entries'], corpus['DBN']['cleared_entries'], {rs: keys[1] for rs, keys in compared_entries_in_SAU_et_DBN.items()})
+        DBN_overlaps = classify_overlaps(corpus['DBN']['cleared_entries'], corpus['SAU']['cleared_entries'], {rs: keys[0] for rs, keys in compared_entries_in_SAU_et_DBN.items()})
 
-    truly_fully_overlapped_entries_SAU = {}
-    fully_overlapped_entries_SAU = {}
-    partially_overlapped_entries_with_None_SAU = {}
-    entries_in_SAU_but_not_in_DBN = []
-    idxs_in_SAU_associated_with_more_lines_in_DBN = {}
+    truly_fully_overlapped_entries_SAU = SAU_overlaps['truly fully overlapped']
+    fully_overlapped_entries_SAU = SAU_overlaps['fully overlapped']
+    partially_overlapped_entries_with_None_SAU = SAU_overlaps['partially overlapped with None']
+    entries_in_SAU_but_not_in_DBN = SAU_overlaps['not in other']
+    idxs_in_SAU_associated_with_more_lines_in_DBN = SAU_overlaps['associated with more lines']
 
-    for idx_SAU in SAU_df.index:
-        rs_nums_of_entry_in_SAU = interpret_SAU_desses(SAU_df.loc[idx_SAU]['RS'])
-        cleared_rs_nums_in_SAU_entry = clear_all_entries(rs_nums_of_entry_in_SAU)
-        
-        associated_indexes_in_DBN_for_this_SAU_entry = []
-        for SAU_rs in cleared_rs_nums_in_SAU_entry:
-            DBN_idx = compared_entries_in_SAU_et_DBN[SAU_rs][1]
-            associated_indexes_in_DBN_for_this_SAU_entry.append(DBN_idx)
-            
-        associated_indexes_in_DBN_for_this_SAU_entry = list(set(associated_indexes_in_DBN_for_this_SAU_entry))
-        
-        if len(associated_indexes_in_DBN_for_this_SAU_entry) == 1 and associated_indexes_in_DBN_for_this_SAU_entry != [None]:
-            cleared_entries_in_DBN_for_this_idx = clear_all_entries(eval(DBN_df.loc[associated_indexes_in_DBN_for_this_SAU_entry[0]]['Excavation Numbers']))
-            if cleared_rs_nums_in_SAU_entry == cleared_entries_in_DBN_for_this_idx:
-                truly_fully_overlapped_entries_SAU[idx_SAU] = associated_indexes_in_DBN_for_this_SAU_entry[0]
-        
-        if associated_indexes_in_DBN_for_this_SAU_entry == [None]:
-            entries_in_SAU_but_not_in_DBN.append(idx_SAU)
-        elif len(associated_indexes_in_DBN_for_this_SAU_entry) == 1 and idx_SAU not in truly_fully_overlapped_entries_SAU:
-            fully_overlapped_entries_SAU[idx_SAU] = associated_indexes_in_DBN_for_this_SAU_entry[0]
-        elif len(associated_indexes_in_DBN_for_this_SAU_entry) == 2 and None in associated_indexes_in_DBN_for_this_SAU_entry:
-            for DIDX in associated_indexes_in_DBN_for_this_SAU_entry:
-                if DIDX == None:
-                    continue
-                else:
-                    the_DBN_idx_for_this_entry = DIDX
-            partially_overlapped_entries_with_None_SAU[idx_SAU] = the_DBN_idx_for_this_entry
-        elif len(associated_indexes_in_DBN_for_this_SAU_entry) >= 2:
-            idxs_in_SAU_associated_with_more_lines_in_DBN[idx_SAU] = associated_indexes_in_DBN_for_this_SAU_entry
-            
-
-    print('truly_fully_overlapped_entries_SAU', len(truly_fully_overlapped_entries_SAU))
-    print('fully_overlapped_entries_SAU', len(fully_overlapped_entries_SAU))
-    print('partially_overlapped_entries_with_None_SAU', len(partially_overlapped_entries_with_None_SAU))
-    print('entries_in_SAU_but_not_in_DBN', len(entries_in_SAU_but_not_in_DBN))
-    print('idxs_in_SAU_associated_with_more_lines_in_DBN', len(idxs_in_SAU_associated_with_more_lines_in_DBN))
-    print()
+    print_overlaps(SAU_overlaps, 'SAU', 'DBN')
     
     """ Preparing the data from the perspective of DBN """
+
+    truly_fully_overlapped_entries_DBN = DBN_overlaps['truly fully overlapped']
+    fully_overlapped_entries_DBN = DBN_overlaps['fully overlapped']
+    partially_overlapped_entries_with_None_DBN = DBN_overlaps['partially overlapped with None']
+    entries_in_DBN_but_not_in_SAU = DBN_overlaps['not in other']
+    idxs_in_DBN_associated_with_more_lines_in_SAU = DBN_overlaps['associated with more lines']
     
-    SAU_df = pd.read_csv(INPUT_SAU_PATH, encoding='utf-8', delimiter=';', dtype=str)
-    DBN_df = pd.read_csv(INPUT_DBN_PATH, encoding='utf-8', delimiter=';', dtype=str)
+    print_overlaps(DBN_overlaps, 'DBN', 'SAU')
 
-    truly_fully_overlapped_entries_DBN = {}
-    fully_overlapped_entries_DBN = {}
-    partially_overlapped_entries_with_None_DBN = {}
-    entries_in_DBN_but_not_in_SAU = []
-    idxs_in_DBN_associated_with_more_lines_in_SAU = {}
+    """ Proposing links of entries with similar (but not equal) excavation numbers, to be checked by hand """
 
-    for idx_DBN in DBN_df.index:
-        rs_nums_of_entry_in_DBN = eval(DBN_df.loc[idx_DBN]['Excavation Numbers'])
-        cleared_rs_nums_in_DBN_entry = clear_all_entries(rs_nums_of_entry_in_DBN)
+    with measure_stage(SCRIPT_NAME, 'propose candidate links') as record:
+        candidate_links = propose_candidate_links(compared_entries_in_SAU_et_DBN, corpus)
+        record['rows'] = len(candidate_links)
 
-        associated_indexes_in_SAU_for_this_DBN_entry = []
-        for DBN_rs in cleared_rs_nums_in_DBN_entry:
-            SAU_idx = compared_entries_in_SAU_et_DBN[DBN_rs][0]
-            associated_indexes_in_SAU_for_this_DBN_entry.append(SAU_idx)
-            
-        associated_indexes_in_SAU_for_this_DBN_entry = list(set(associated_indexes_in_SAU_for_this_DBN_entry))
-        
-        if len(associated_indexes_in_SAU_for_this_DBN_entry) == 1 and associated_indexes_in_SAU_for_this_DBN_entry != [None]:
-            cleared_entries_in_SAU_for_this_idx = clear_all_entries(interpret_SAU_desses(SAU_df.loc[associated_indexes_in_SAU_for_this_DBN_entry[0]]['RS']))
-            if cleared_rs_nums_in_DBN_entry == cleared_entries_in_SAU_for_this_idx:
-                truly_fully_overlapped_entries_DBN[idx_DBN] = associated_indexes_in_SAU_for_this_DBN_entry[0]        
-        
-        if associated_indexes_in_SAU_for_this_DBN_entry == [None]:
-            entries_in_DBN_but_not_in_SAU.append(idx_DBN)
-        elif len(associated_indexes_in_SAU_for_this_DBN_entry) == 1 and idx_DBN not in truly_fully_overlapped_entries_DBN:
-            fully_overlapped_entries_DBN[idx_DBN] = associated_indexes_in_SAU_for_this_DBN_entry[0]
-        elif len(associated_indexes_in_SAU_for_this_DBN_entry) == 2 and None in associated_indexes_in_SAU_for_this_DBN_entry:
-            for SIDX in associated_indexes_in_SAU_for_this_DBN_entry:
-                if SIDX == None:
-                    continue
-                else:
-                    the_SAU_idx_for_this_entry = SIDX
-            partially_overlapped_entries_with_None_DBN[idx_DBN] = the_SAU_idx_for_this_entry
-        elif len(associated_indexes_in_SAU_for_this_DBN_entry) >= 2:
-            idxs_in_DBN_associated_with_more_lines_in_SAU[idx_DBN] = associated_indexes_in_SAU_for_this_DBN_entry    
-            
-    print('truly_fully_overlapped_entries_DBN', len(truly_fully_overlapped_entries_DBN))
-    print('fully_overlapped_entries_DBN', len(fully_overlapped_entries_DBN))
-    print('partially_overlapped_entries_with_None_DBN', len(partially_overlapped_entries_with_None_DBN))
-    print('entries_in_DBN_but_not_in_SAU', len(entries_in_DBN_but_not_in_SAU))
-    print('idxs_in_DBN_associated_with_more_lines_in_SAU', len(idxs_in_DBN_associated_with_more_lines_in_SAU))
+    print(f'Candidate links of excavation numbers found only in SAU or only in DBN (distance at most {MAX_CANDIDATE_DISTANCE})', len(candidate_links))
     print()
     
-    """ Joining the dataframes: """
-    """ First, create the output which is primarily based on DBN: """
+    """ Joining the dataframes: each connected component of linked entries is merged to one entry, unless it has to be checked by hand (see review_reason) """
     output_dictionary = {}
+    components_for_review = {}
 
-    out_idx = 0
+    with measure_stage(SCRIPT_NAME, 'join entries') as record:
+        components = collect_components(linked_entries, corpus)
 
-    SAU_idxs_added_to_final_db = []
+        for component in components:
+            reason = review_reason(component, corpus)
+            if reason:
+                components_for_review[len(components_for_review)] = {'component': component, 'reason': reason}
+                resolved_components = split_component(component, corpus)
+            else:
+                resolved_components = [component]
 
-    for DBN_idx in DBN_df.index:
-        # Option one: the entries in DBN and SAU reffer to the same excavation sigla --> merge entries, keep both ex sigla
-        if DBN_idx in truly_fully_overlapped_entries_DBN:
-            SAU_idx = truly_fully_overlapped_entries_DBN[DBN_idx]
-            
-            DBN_dict = extract_desired_info_from_DBN_entry(DBN_idx, DBN_df)
-            SAU_dict = extract_desired_info_from_SAU_entry(SAU_idx, SAU_df)
-            
-            merged_entry = merge_entries(DBN_dict, SAU_dict, keep_ex_num='both')
-            
-            output_dictionary[out_idx] = merged_entry
-            out_idx += 1
-            
-            SAU_idxs_added_to_final_db.append(SAU_idx)
-                
-        # Option two: the entry is only is DBN --> add DBN entry
-        elif DBN_idx in entries_in_DBN_but_not_in_SAU:
-            processed_line_dict = merge_entries(extract_desired_info_from_DBN_entry(DBN_idx, DBN_df), empty_entry_dict, keep_ex_num='DBN')
-            output_dictionary[out_idx] = processed_line_dict
-            out_idx += 1        
-            
-        # Option three: there is the "full overlap" (ie, there is more associated with this entry in SAU, but not in more entries; in DBN this is in more entries) --> keep the DBN entry for clear ex sigla
-        elif DBN_idx in fully_overlapped_entries_DBN:
-            SAU_idx = fully_overlapped_entries_DBN[DBN_idx]
-            
-            DBN_dict = extract_desired_info_from_DBN_entry(DBN_idx, DBN_df)
-            SAU_dict = extract_desired_info_from_SAU_entry(SAU_idx, SAU_df)
-            
-            merged_entry = merge_entries(DBN_dict, SAU_dict, keep_ex_num='DBN')
-            
-            output_dictionary[out_idx] = merged_entry
-            out_idx += 1
-            
-            SAU_idxs_added_to_final_db.append(SAU_idx)
-        
-        # Option four: There is partial overlap (some rs nums are not in SAU, but it is not associated with more entries) --> merge entries, keep both ex sigla
-        elif DBN_idx in partially_overlapped_entries_with_None_DBN:
-            SAU_idx = partially_overlapped_entries_with_None_DBN[DBN_idx]
-            
-            DBN_dict = extract_desired_info_from_DBN_entry(DBN_idx, DBN_df)
-            SAU_dict = extract_desired_info_from_SAU_entry(SAU_idx, SAU_df)
-            
-            merged_entry = merge_entries(dict_DBN=DBN_dict, dict_SAU=SAU_dict, keep_ex_num='both')
-            
-            output_dictionary[out_idx] = merged_entry
-            out_idx += 1        
-            
-            SAU_idxs_added_to_final_db.append(SAU_idx)
-            
-        # Option five: There are more entries in SAU associated with this text --> Add all info from the SAU entries to the final entry, but also save the SAU idxs to put them in the separate DF
-        elif DBN_idx in idxs_in_DBN_associated_with_more_lines_in_SAU:
-            DBN_dict = extract_desired_info_from_DBN_entry(DBN_idx, DBN_df)
-            
-            SAU_indexes = idxs_in_DBN_associated_with_more_lines_in_SAU[DBN_idx]
-            
-            SAU_dict = merge_multiple_SAU_entries_to_one_dict(SAU_dataframe=SAU_df, SAU_indexes=SAU_indexes)
-            SAU_dict = extract_desired_info_from_SAU_entry(already_line_dictionary=SAU_dict)
-            
-            merged_entry = merge_entries(DBN_dict, SAU_dict, keep_ex_num='both')
-            
-            output_dictionary[out_idx] = merged_entry
-            out_idx += 1        
-            
-            SAU_idxs_added_to_final_db.extend(SAU_indexes)
-            
-        else:
-            print('There is some error with', DBN_idx)
-            
-    """ Then add more entries from the SAU dataframe. The output dictionary and its indexes continue from the previous cell """
+            for resolved_component in resolved_components:
+                output_dictionary[len(output_dictionary)] = resolve_component(resolved_component, corpus)
 
-    print('Size of the dataframe before adding SAU:', len(output_dictionary))
+        record['rows'] = len(output_dictionary)
 
-    for SAU_idx in SAU_df.index:
-        # Option one: the SAU entry has already been processed:
-        if SAU_idx in SAU_idxs_added_to_final_db:
-            continue
-        else:            
-        # Option two: the entry is only is SAU --> add SAU entry
-            if SAU_idx in entries_in_SAU_but_not_in_DBN:            
-                processed_line_dict = merge_entries(extract_desired_info_from_SAU_entry(SAU_idx, SAU_df), empty_entry_dict, keep_ex_num='SAU')
-                output_dictionary[out_idx] = processed_line_dict
-                out_idx += 1
-                
-            # Option three: there is the "full overlap" (ie, there is more associated with this entry in DBN, but not in more entries; in SAU this is in more entries) --> keep the SAU entry for clear ex sigla ... this should have actually already been resolved, because we have went through DBN entries --> Check if this returns something
-            elif SAU_idx in fully_overlapped_entries_SAU:
-                print(f'This is weird - the DBN entry associated with SAU index{SAU_idx} should have already been processed! FULL OL')
-                
-            # Option four: There is partial overlap (some rs nums are not in DBN, but it is not associated with more entries) --> merge entries, keep both ex sigla ... this should have actually already been resolved, because we have went through DBN entries --> Check if this returns something
-            elif SAU_idx in partially_overlapped_entries_with_None_SAU:
-                print(f'This is weird - the DBN entry associated with SAU index{SAU_idx} should have already been processed! PARTIAL OL')
-                
-            # Option five: There are more entries in DBN associated with this text --> Add all info from the DBN entries to the final entry, but also save the DBN idxs to put them in the separate DF --> These line must have actually already been processed, too --> Check it!
-            elif SAU_idx in idxs_in_SAU_associated_with_more_lines_in_DBN:
-                print(f'This is weird - the DBN entry associated with SAU index{SAU_idx} should have already been processed! Multiple DBN lines!!')
-                
-            else:
-                print('There is some error with', SAU_idx)
-                            
-    print('Size of the dataframe after adding SAU:', len(output_dictionary))
+    merged_components = [component for component in components if len(component['DBN']) + len(component['SAU']) > 1]
+    print('Components of linked entries', len(merged_components), 'of which split and listed for review', len(components_for_review))
+    print('Components with more DBN entries', sum(1 for component in components if len(component['DBN']) > 1))
+    print('Components with more SAU entries', sum(1 for component in components if len(component['SAU']) > 1))
+    print('Size of the dataframe:', len(output_dictionary))
     print()
     
     """ Save the merged dict of both databases to CSV file """
 
-    NEW_DF = pd.DataFrame.from_dict(output_dictionary, orient='index')
-    NEW_DF.to_csv(OUTPUT_PATH, sep=';', encoding='utf-8')       
-    
-    """ Finally, export the SAU and DBN indexes that were in multiple entries to a separate databases, so they may be easily checked: """
-
     OUTPUT_PATH_MORE_ENTRIES_IN_SAU = os.path.join(ROOT_PATH, 'ENTRIES_IN_SAU_ASSOCIATED_WITH_MULTIPLE_UTDB_ENTRIES.csv')
     OUTPUT_PATH_MORE_ENTRIES_IN_DBN = os.path.join(ROOT_PATH, 'ENTRIES_IN_UTDB_ASSOCIATED_WITH_MULTIPLE_SAU_ENTRIES.csv')
+    OUTPUT_PATH_CANDIDATE_LINKS = os.path.join(ROOT_PATH, 'CANDIDATE_LINKS_OF_SIMILAR_EXCAVATION_NUMBERS.csv')
+    OUTPUT_PATH_COMPONENTS_FOR_REVIEW = os.path.join(ROOT_PATH, 'LINKED_ENTRIES_NOT_MERGED_FOR_REVIEW.csv')
+
+    with measure_stage(SCRIPT_NAME, 'export', rows=len(output_dictionary), output_paths=[OUTPUT_PATH, OUTPUT_PATH_MORE_ENTRIES_IN_SAU, OUTPUT_PATH_MORE_ENTRIES_IN_DBN, OUTPUT_PATH_CANDIDATE_LINKS, OUTPUT_PATH_COMPONENTS_FOR_REVIEW]):
+        NEW_DF = pd.DataFrame.from_dict(output_dictionary, orient='index')
+        NEW_DF.to_csv(OUTPUT_PATH, sep=';', encoding='utf-8')       
+
+        candidate_links.to_csv(OUTPUT_PATH_CANDIDATE_LINKS, sep=';', encoding='utf-8', index=False)
 
-    # NOTE: SAU
-    SAU_multiple_dict = {}
-    SAU_multiple_idx = 0
-    for DBN_idx in idxs_in_DBN_associated_with_more_lines_in_SAU:
-        dbn_rss = DBN_df.loc[DBN_idx]['Excavation Numbers']
+        # NOTE: the components that were not merged to one entry, one line per source entry.
+        review_rows = []
+        for component_num, component_for_review in components_for_review.items():
+            for source_name, source_label, ex_num_column in [('DBN', 'UTDB (+-RSTI)', 'Excavation Numbers'), ('SAU', 'SAU', 'RS')]:
+                for idx in component_for_review['component'][source_name]:
+                    review_rows.append({'Component': component_num, 'Reason': component_for_review['reason'], 'Source': source_label, 'Index': idx, 'Excavation Numbers': corpus[source_name]['df'].loc[idx, ex_num_column]})
+
+        pd.DataFrame(review_rows, columns=['Component', 'Reason', 'Source', 'Index', 'Excavation Numbers']).to_csv(OUTPUT_PATH_COMPONENTS_FOR_REVIEW, sep=';', encoding='utf-8', index=False)
+
+        print(f'Separate CSV file for linked entries that were not merged to one entry has been created. It contains {len(components_for_review)} groups of {len(review_rows)} entries')
+    
+        """ Finally, export the SAU and DBN indexes that were in multiple entries to a separate databases, so they may be easily checked: """
+
+        # NOTE: SAU
+        SAU_multiple_dict = {}
+        SAU_multiple_idx = 0
+        for DBN_idx in idxs_in_DBN_associated_with_more_lines_in_SAU:
+            dbn_rss = DBN_df.loc[DBN_idx]['Excavation Numbers']
         
-        SAU_indexes = idxs_in_DBN_associated_with_more_lines_in_SAU[DBN_idx]
-        for SAU_idx in SAU_indexes:
-            if SAU_idx == None:
-                continue
-            else:
-                line_data = SAU_df.loc[SAU_idx].to_dict()
-                line_data['Associated UTDB(+-RSTI) Entry'] = dbn_rss
-                SAU_multiple_dict[SAU_multiple_idx] = line_data
-                SAU_multiple_idx += 1
+            SAU_indexes = idxs_in_DBN_associated_with_more_lines_in_SAU[DBN_idx]
+            for SAU_idx in SAU_indexes:
+                if SAU_idx == None:
+                    continue
+                else:
+                    line_data = SAU_df.loc[SAU_idx].to_dict()
+                    line_data['Associated UTDB(+-RSTI) Entry'] = dbn_rss
+                    SAU_multiple_dict[SAU_multiple_idx] = line_data
+                    SAU_multiple_idx += 1
 
-    SAU_multiple_DF = pd.DataFrame.from_dict(SAU_multiple_dict, orient='index')
-    SAU_multiple_DF.to_csv(OUTPUT_PATH_MORE_ENTRIES_IN_SAU, sep=';', encoding='utf-8')
+        SAU_multiple_DF = pd.DataFrame.from_dict(SAU_multiple_dict, orient='index')
+        SAU_multiple_DF.to_csv(OUTPUT_PATH_MORE_ENTRIES_IN_SAU, sep=';', encoding='utf-8')
 
-    print(f'Separate CSV file for DBN entries with multiple SAU connections has been created. It contains {len(SAU_multiple_DF)} entries')
+        print(f'Separate CSV file for DBN entries with multiple SAU connections has been created. It contains {len(SAU_multiple_DF)} entries')
 
-    # NOTE: DBN
-    DBN_multiple_dict = {}
-    DBN_multiple_idx = 0
+        # NOTE: DBN
+        DBN_multiple_dict = {}
+        DBN_multiple_idx = 0
 
-    for SAU_idx in idxs_in_SAU_associated_with_more_lines_in_DBN:
-        sau_rss = SAU_df.loc[SAU_idx]['RS']
+        for SAU_idx in idxs_in_SAU_associated_with_more_lines_in_DBN:
+            sau_rss = SAU_df.loc[SAU_idx]['RS']
         
-        DBN_indexes = idxs_in_SAU_associated_with_more_lines_in_DBN[SAU_idx]
+            DBN_indexes = idxs_in_SAU_associated_with_more_lines_in_DBN[SAU_idx]
 
-        for DBN_idx in DBN_indexes:
-            if DBN_idx == None:
-                continue
-            else:
-                line_data = DBN_df.loc[DBN_idx].to_dict()
-                line_data['Associated SAU Entry'] = sau_rss
-                DBN_multiple_dict[DBN_multiple_idx] = line_data
-                DBN_multiple_idx += 1
+            for DBN_idx in DBN_indexes:
+                if DBN_idx == None:
+                    continue
+                else:
+                    line_data = DBN_df.loc[DBN_idx].to_dict()
+                    line_data['Associated SAU Entry'] = sau_rss
+                    DBN_multiple_dict[DBN_multiple_idx] = line_data
+                    DBN_multiple_idx += 1
 
-    # Save the dict to CSV file
-    DBN_multiple_DF = pd.DataFrame.from_dict(DBN_multiple_dict, orient='index')
-    DBN_multiple_DF.to_csv(OUTPUT_PATH_MORE_ENTRIES_IN_DBN, sep=';', encoding='utf-8') 
+        # Save the dict to CSV file
+        DBN_multiple_DF = pd.DataFrame.from_dict(DBN_multiple_dict, orient='index')
+        DBN_multiple_DF.to_csv(OUTPUT_PATH_MORE_ENTRIES_IN_DBN, sep=';', encoding='utf-8') 
 
     print(f'Separate CSV file for SAU entries with multiple DBN connections has been created. It contains {len(DBN_multiple_DF)} entires')
     
     print()
     
+    print_run_log()
+    save_run_log(os.path.join(ROOT_PATH, 'RUN_LOGS'), SCRIPT_NAME)
+    print()
+    
     print('The process in finished. Do not forget to run 02_backup-et-publish.py script to make a backup of previous databases and to publish these final results in 01_CURRENT_DATABASE_FILES folder.')
     
 
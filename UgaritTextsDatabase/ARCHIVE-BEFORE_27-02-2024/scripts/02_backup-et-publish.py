@@ -1,25 +1,32 @@
 """ This python script serves to make backup of the old published files, copy the current db files to the final destination (01_CURRENT_DATABASE_FILES), and transform them to .xlsx format. """
 
 import os
+import sys
 import shutil
-import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
+import xlsxwriter
 
 ROOT_PATH = os.getcwd()
 
 CSV_files_PATH = os.path.join(ROOT_PATH, '01_CURRENT_DATABASE_FILES', 'CSV')
 EXCEL_files_PATH = os.path.join(ROOT_PATH, '01_CURRENT_DATABASE_FILES', 'EXCEL')
+BACKUP_files_PATH = os.path.join(ROOT_PATH, '01_CURRENT_DATABASE_FILES', 'BACKUP')
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
 
+# NOTE: modules shared with analyse.py are kept in CURRENT_VERSION.
+sys.path.append(os.path.join(SCRIPTS_PATH, '..', '..', 'CURRENT_VERSION'))
+from backup_store import make_snapshot
+from run_log import measure_stage, save_run_log, print_run_log
+
+SCRIPT_NAME = os.path.basename(__file__)
 
-def save_backup():
-    BACKUPT_TIMESTAMP = time.strftime("%d-%m-%Y--%H-%M", time.localtime())
-    BACKUP_files_PATH_CSV = os.path.join(ROOT_PATH, '01_CURRENT_DATABASE_FILES', 'BACKUP', f'BACKUP_{BACKUPT_TIMESTAMP}', 'CSV')
-    BACKUP_files_PATH_EXCEL = os.path.join(ROOT_PATH, '01_CURRENT_DATABASE_FILES', 'BACKUP', f'BACKUP_{BACKUPT_TIMESTAMP}', 'EXCEL')
 
-    shutil.copytree(CSV_files_PATH, BACKUP_files_PATH_CSV)
-    shutil.copytree(EXCEL_files_PATH, BACKUP_files_PATH_EXCEL)
+def save_backup():
+    """ This backs up the published CSV and EXCEL files to the content-addressed store in BACKUP (see backup_store.py): files that have not changed since the previous backup are not stored again. """
+    snapshot_name = make_snapshot(BACKUP_files_PATH, {'CSV': CSV_files_PATH, 'EXCEL': EXCEL_files_PATH})
     
-    print('Backup has been made to directory BACKUP_'+BACKUPT_TIMESTAMP)
+    print('Backup has been made to snapshot', snapshot_name)
     
     
 def move_files():
@@ -38,6 +45,7 @@ def move_files():
     files_to_move = [
         'ENTRIES_IN_SAU_ASSOCIATED_WITH_MULTIPLE_UTDB_ENTRIES.csv',
         'ENTRIES_IN_UTDB_ASSOCIATED_WITH_MULTIPLE_SAU_ENTRIES.csv',
+        'LINKED_ENTRIES_NOT_MERGED_FOR_REVIEW.csv',
         'RSTI_NON_TEXTS_OBJECTS.csv',
         'SAU_NON_TEXTS_OBJECTS.csv',
         'SAU_COLLECTION.csv',
@@ -52,51 +60,69 @@ def move_files():
     
     
 def csv_to_excel_with_formatting(csv_file:str, excel_file:str, header_color='#FFA500', odd_lines_color='#FFFFFF', even_lines_color='#FFF2E5'):
+    """ This saves the CSV file as .xlsx with coloured header and banded lines. The rows are streamed to the file (constant_memory mode of xlsxwriter) and the banding is made by two conditional formats over the whole table, so no cell needs its own format. """
     df = pd.read_csv(csv_file, encoding='utf-8', sep=';')
     
-    with pd.ExcelWriter(excel_file, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Data')
+    workbook = xlsxwriter.Workbook(excel_file, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Data')
 
-        workbook  = writer.book
-        worksheet = writer.sheets['Data']
+    header_format = workbook.add_format({
+        'bg_color': header_color,
+        'bold': True
+    })
 
-        header_format = workbook.add_format({
-            'bg_color': header_color,
-            'bold': True
-        })
+    worksheet.write_row(0, 0, df.columns.values, header_format)
 
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
+    # NOTE: empty cells are written as None, which xlsxwriter skips (there is no per-cell format to keep).
+    data = df.astype(object).where(df.notna(), None)
+    for row, values in enumerate(data.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row, 0, values)
 
+    if len(df) > 0:
         row_format1 = workbook.add_format({'bg_color': odd_lines_color}) # Bílá
         row_format2 = workbook.add_format({'bg_color': even_lines_color}) # Jemná oranžová
+        
+        # NOTE: the data start on the second line of the sheet, so the first data line is "odd" (as in the previous versions of this script).
+        worksheet.conditional_format(1, 0, len(df), len(df.columns) - 1, {'type': 'formula', 'criteria': '=MOD(ROW(),2)=1', 'format': row_format2})
+        worksheet.conditional_format(1, 0, len(df), len(df.columns) - 1, {'type': 'formula', 'criteria': '=MOD(ROW(),2)=0', 'format': row_format1})
 
-        for row in range(1, len(df) + 1):
-            row_format = row_format2 if row % 2 == 0 else row_format1
-            for col in range(len(df.columns)):
-                cell_value = df.iloc[row-1, col]
-                if pd.isnull(cell_value):
-                    worksheet.write_blank(row, col, '', row_format)
-                else:
-                    worksheet.write(row, col, cell_value, row_format)
+    worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
+    workbook.close()
+    
 
-        worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
+def export_all_to_excel(csv_dir:str=CSV_files_PATH, excel_dir:str=EXCEL_files_PATH, max_workers=None):
+    """ This converts all CSV files in csv_dir to .xlsx files in excel_dir; each file is converted in a separate worker process. """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        conversions = {}
+        for csv_filename in os.listdir(csv_dir):
+            csv_file_PATH = os.path.join(csv_dir, csv_filename)
+            excel_filename = csv_filename.replace('.csv', '.xlsx')
+            excel_PATH = os.path.join(excel_dir, excel_filename)
+            
+            conversions[executor.submit(csv_to_excel_with_formatting, csv_file=csv_file_PATH, excel_file=excel_PATH)] = (csv_filename, excel_filename)
         
+        for conversion in as_completed(conversions):
+            conversion.result()
+            csv_filename, excel_filename = conversions[conversion]
+            print(csv_filename, 'has been saved as', excel_filename)
+
 
 if __name__ == "__main__":
-    save_backup()
-    move_files()
+    with measure_stage(SCRIPT_NAME, 'backup'):
+        save_backup()
     
-    files_in_csv = os.listdir(CSV_files_PATH)
-
-    for csv_filename in files_in_csv:
-        csv_file_PATH = os.path.join(CSV_files_PATH, csv_filename)
-        excel_filename = csv_filename.replace('.csv', '.xlsx')
-        excel_PATH = os.path.join(EXCEL_files_PATH, excel_filename)
-        
-        csv_to_excel_with_formatting(csv_file=csv_file_PATH, excel_file=excel_PATH)
-        
-        print(csv_filename, 'has been saved as', excel_filename)
+    with measure_stage(SCRIPT_NAME, 'move files') as record:
+        move_files()
+        record['output_paths'] = [os.path.join(CSV_files_PATH, file_) for file_ in os.listdir(CSV_files_PATH)]
+        record['rows'] = len(record['output_paths'])
+    
+    with measure_stage(SCRIPT_NAME, 'export to excel') as record:
+        export_all_to_excel()
+        record['output_paths'] = [os.path.join(EXCEL_files_PATH, file_) for file_ in os.listdir(EXCEL_files_PATH)]
+        record['rows'] = len(record['output_paths'])
+    
+    print_run_log()
+    save_run_log(os.path.join(ROOT_PATH, 'RUN_LOGS'), SCRIPT_NAME)
     
     print()
-    input("Press Enter to finish...")
\ No newline at end of file
+    input("Press Enter to finish...")
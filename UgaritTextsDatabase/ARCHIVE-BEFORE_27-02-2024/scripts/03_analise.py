@@ -4,6 +4,7 @@ import os
 import pandas as pd
 import numpy as np
 from collections import defaultdict
+from functools import lru_cache
 import shutil
 import time
 
@@ -86,38 +87,33 @@ language_exceptions_KTU_multilingual = {
     '1.26': 'Hurrian',
 }
 
+# NOTE: brackets, question marks and spaces are deleted from language designations in one pass (e.g., "[Akkadian?]" --> "Akkadian").
+language_deletion_table = str.maketrans('', '', '[]?() ')
+
+language_rank = {lang: rank for rank, lang in enumerate(order_of_languages)}
+
+
+@lru_cache(maxsize=4096)
+def normalise_lang_string(input_lang:str, use_multilingual:bool)->str:
+    """ Cached normalisation of one (non-empty) language string, see normalise_lang. """
+    normalised_langs = list(dict.fromkeys(input_lang.translate(language_deletion_table).split(';')))
+            
+    if use_multilingual and len(normalised_langs) > 1:
+        return 'multilingual'
+    
+    known_langs = [lang for lang in normalised_langs if lang in language_rank]
+    known_langs.sort(key=language_rank.get)
+            
+    return ';'.join(known_langs)
+
+
 def normalise_lang(input_lang, use_multilingual=False):
     """ This serves to "normalise" and simplify language attribution (e.g., from Akkadian? --> Akkadian)"""
     
     if type(input_lang) == float:
         return 'unknown/unassigned'
     
-    langs_in_entry = input_lang.split(';')
-    normalised_langs = []
-    for lang in langs_in_entry:
-        while '[' in lang or ']' in lang or '?' in lang or '(' in lang or ')' in lang or ' ' in lang:
-            lang = lang.replace('[', '')
-            lang = lang.replace(']', '')
-            lang = lang.replace('?', '')
-            lang = lang.replace('(', '')
-            lang = lang.replace(')', '')
-            lang = lang.replace(' ', '')
-        
-        if lang not in normalised_langs:
-            normalised_langs.append(lang)
-            
-    if use_multilingual and len(normalised_langs) > 1:
-        return 'multilingual'
-    
-    else:
-        final_lang_string = ''
-        for lang in order_of_languages:
-            if lang in normalised_langs:
-                final_lang_string += f';{lang}'
-            else:
-                continue
-            
-    return final_lang_string[1:]
+    return normalise_lang_string(input_lang, bool(use_multilingual))
 
 
 def get_all_lang_combinations(input_db):
@@ -1,15 +1,35 @@
 """ This file serves to provide csv files for different kinds of statistical analysis of the Ugaritic corpus. It also makes a backup of the previous statistical files. """
 
 import os
+import hashlib
 import pandas as pd
 import numpy as np
 from collections import defaultdict
-import shutil
+from functools import lru_cache
 import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from database_schema import load_typed_database
+from count_cube import build_count_cube, cube_cells, cube_dimensions, slice_cube
+from report_registry import get_report_fingerprints, load_reports_manifest, save_reports_manifest, find_outdated_reports, report_input_columns, update_column_hashes
+from backup_store import make_snapshot
+from run_log import measure_stage, add_records, save_run_log, print_run_log, configure_profiling
+import run_log
+from incremental_stats import hash_code, hash_rows, empty_stats_state, load_stats_state, save_stats_state, find_changed_rows, update_stats_state, count_cube_from_state
+from streaming_stats import DEFAULT_CHUNK_SIZE, read_database_chunks, add_cube_counts, cube_from_counts
+from findspot_index import build_findspot_index, select_location
+from classification_rules import classify_column, compiled_relevant_genre_rules, compiled_sau_genre_rules, compiled_relation_rules
 
 ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
 UGARIT_TEXTS_DATABASE_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
 STATS_PATH = os.path.join(ROOT_PATH, 'STATISTICS')
+STATS_STATE_PATH = os.path.join(STATS_PATH, 'STATS_STATE.pickle')
+RUN_LOGS_PATH = os.path.join(STATS_PATH, 'RUN_LOGS')
+
+# NOTE: modules whose code makes the numbers of the statistics (this file with the derivation of the row attributes, language maps, counting and saving; the rules; the cubes and indexes; the loading of the database). When any of them changes, all reports are made again (see report_registry.py) and the row attributes of all rows are derived again (see incremental_stats.py).
+statistics_code_files = ['analyse.py', 'classification_rules.py', 'count_cube.py', 'findspot_index.py', 'database_schema.py', 'database_snapshot.py', 'excavation_numbers.py', 'incremental_stats.py', 'streaming_stats.py']
+STATISTICS_CODE_HASH = hash_code([os.path.join(ROOT_PATH, code_file) for code_file in statistics_code_files])
 
 order_of_languages = ['Ugaritic', 'Akkadian', 'Sumerian', 'Hurrian', 'Hittite', 'Egyptian', 'Cypro-Minoan', 'Phoenician', 'Latin', 'unknown/unassigned']
 
@@ -65,6 +85,39 @@ ktu_classification_str_religenres_related = {
     '10': 'Ugaritic in syllabic'
 }
 
+# NOTE: locations (as they appear in the DB under "(SAU) Archive/General area" column) that have their own row in the statistics; the rest is counted as "Other/unknown".
+locations_in_ugarit = ['Royal Palace', 'House of Urtenu', 'House of Rapanu', 'House of Yabninu', 'Lamaštu', 'House of the Literary Tablets', 'Between Royal Palace and South Palace', 'House of the High Priest', 'House of Rašapabu', 'Literate’s House', 'House of the Hurrian Priest']
+locations_around_ugarit = ['Ras Ibn-Hani', 'Minet el-Beida']
+# NOTE: locations left out of the "Other/unknown" row of the statistics of languages in locations.
+locations_outside_ugarit = ['Ras Ibn-Hani', 'Minet el-Beida', 'Minet el Beida', 'outside']
+
+# NOTE: "total" of these rows is set for the ordering of the bars in Flourish (not counted).
+flourish_order_totals = {'Other/unknown': 2, 'Ras Ibn-Hani': 1, 'Minet el-Beida': 0}
+
+related_clemens_values = ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']
+
+language_columns = {'utdb': 'UTDB Language', 'rsti': 'RSTI Language', 'sau': 'SAU Language'}
+
+
+# NOTE: brackets, question marks and spaces are deleted from language designations in one pass (e.g., "[Akkadian?]" --> "Akkadian").
+language_deletion_table = str.maketrans('', '', '[]?() ')
+
+language_rank = {lang: rank for rank, lang in enumerate(order_of_languages)}
+
+
+@lru_cache(maxsize=4096)
+def normalise_lang_string(input_lang:str, use_multilingual:bool)->str:
+    """ Cached normalisation of one (non-empty) language string, see normalise_lang. """
+    normalised_langs = list(dict.fromkeys(input_lang.translate(language_deletion_table).split(';')))
+            
+    if use_multilingual and len(normalised_langs) > 1:
+        return 'multilingual'
+    
+    known_langs = [lang for lang in normalised_langs if lang in language_rank]
+    known_langs.sort(key=language_rank.get)
+            
+    return ';'.join(known_langs)
+
 
 def normalise_lang(input_lang, use_multilingual=False):
     """ This serves to "normalise" and simplify language attribution (e.g., from Akkadian? --> Akkadian)"""
@@ -72,63 +125,177 @@ def normalise_lang(input_lang, use_multilingual=False):
     if type(input_lang) == float:
         return 'unknown/unassigned'
     
-    langs_in_entry = input_lang.split(';')
-    normalised_langs = []
-    for lang in langs_in_entry:
-        while '[' in lang or ']' in lang or '?' in lang or '(' in lang or ')' in lang or ' ' in lang:
-            lang = lang.replace('[', '')
-            lang = lang.replace(']', '')
-            lang = lang.replace('?', '')
-            lang = lang.replace('(', '')
-            lang = lang.replace(')', '')
-            lang = lang.replace(' ', '')
-        
-        if lang not in normalised_langs:
-            normalised_langs.append(lang)
-            
-    if use_multilingual and len(normalised_langs) > 1:
-        return 'multilingual'
+    return normalise_lang_string(input_lang, bool(use_multilingual))
+
+
+def map_distinct(column:pd.core.series.Series, mapping)->pd.core.series.Series:
+    """ This maps a column by a function or a dict (as pd.Series.map does); each distinct value is mapped only once and the results are mapped back to the rows. It works the same for string and categorical columns. """
+    if callable(mapping):
+        map_value = mapping
+    else:
+        map_value = lambda value: mapping.get(value, np.nan)
+    
+    codes, distinct_values = pd.factorize(column)
+    
+    # NOTE: the last item serves for empty cells (code -1).
+    mapped_values = np.array([map_value(value) for value in distinct_values] + [map_value(np.nan)], dtype=object)
     
+    return pd.Series(mapped_values[codes], index=column.index)
+
+
+def coalesce(*columns, default)->pd.core.series.Series:
+    """ Returns the first non-empty value of the columns in each row (or the default). """
+    result = columns[0].astype(object)
+    for column in columns[1:]:
+        result = result.fillna(column.astype(object))
+    
+    return result.fillna(default)
+
+
+def normalise_lang_series(languages:pd.core.series.Series, use_multilingual=False)->pd.core.series.Series:
+    """ This normalises a whole column of language designations; each distinct value is normalised only once and the results are mapped back to the rows. """
+    return map_distinct(languages, lambda lang: normalise_lang(lang, use_multilingual=use_multilingual))
+
+
+def language_column(lang_by:str, use_multilingual:bool)->str:
+    """ Name of the derived column with normalised languages according to the selected source ("utdb", "rsti" or "sau"). """
+    if use_multilingual:
+        return f'languages_{lang_by}_multilingual'
     else:
-        final_lang_string = ''
-        for lang in order_of_languages:
-            if lang in normalised_langs:
-                final_lang_string += f';{lang}'
-            else:
-                continue
-            
-    return final_lang_string[1:]
+        return f'languages_{lang_by}'
 
 
-def get_all_lang_combinations(input_db):
-    all_lang_combinations = []
+def derive_row_attributes(input_db:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
+    """
+    This function derives the normalised attributes of each row (general area, detail in the area, KTU category, languages, relation and religious genre) once, so that the individual reports may be computed as groupby operations over these columns.
 
-    for row_id in db.index:
-        languages = normalise_lang(db.loc[row_id]['UTDB Language'], use_multilingual=False)
-            
-        all_lang_combinations.append(languages)
-        
-    all_lang_combinations = list(set(all_lang_combinations))
+    Args:
+        input_db (pd.core.frame.DataFrame): pandas dataframe of the UGARIT_TEXTS_DATABASE.csv
+
+    Returns:
+        pd.core.frame.DataFrame: dataframe with the derived columns (with the same index as input_db)
+    """
+    row_attributes = pd.DataFrame(index=input_db.index)
+    
+    row_attributes['general_area'] = coalesce(input_db['Archive/General area'], input_db['SAU Archive/General area'], default='Other/unknown')
+    row_attributes['detail_in_cluster'] = coalesce(input_db['Detail in General'], input_db['SAU Detail in General'], default='Other/unknown')
+    row_attributes['findspot'] = coalesce(input_db['TEO findspot'], input_db['SAU findspot'], default='Other/unknown')
+    row_attributes['topographic_point'] = coalesce(input_db['Topographic Point'], input_db['SAU p.t.'], default='Other/unknown')
+    row_attributes['has_excavation_siglum'] = input_db['Excavation Siglum'].notna()
+    
+    in_utdb = input_db['Excavation Numbers UTDB'].notna().to_numpy()
+    in_sau = input_db['Excavation Numbers SAU'].notna().to_numpy()
+    row_attributes['source'] = pd.Categorical(np.select([in_utdb & in_sau, in_utdb, in_sau], ['UTDB and SAU', 'UTDB', 'SAU'], default='unknown'), categories=['UTDB and SAU', 'UTDB', 'SAU', 'unknown'])
+    
+    row_attributes['has_ktu'] = input_db['KTU3'].notna()
+    row_attributes['ktu_category'] = map_distinct(input_db['KTU3'], lambda ktu: str(ktu).split('.', 1)[0])
+    
+    for lang_by, column in language_columns.items():
+        for use_multilingual in [False, True]:
+            row_attributes[language_column(lang_by, use_multilingual)] = normalise_lang_series(input_db[column], use_multilingual=use_multilingual)
+    
+    related_texts = input_db['"Clemens 2001"']
+    row_attributes['relational_category'] = map_distinct(related_texts, dict.fromkeys(related_clemens_values, 'related'))
+    row_attributes['relation_category'] = classify_column(related_texts, compiled_relation_rules).astype('category')
+    
+    row_attributes['possible_relevant_genre'] = input_db['possible relevant (religious) genres'].notna()
+    row_attributes['genre_by_relevant'] = classify_column(input_db['possible relevant (religious) genres'], compiled_relevant_genre_rules)
+    row_attributes['genre_by_sau'] = classify_column(input_db['SAU genre'], compiled_sau_genre_rules)
+    
+    # NOTE: texts with a relevant genre that fits no rule are "other religious", the rest is classified by SAU genre or as "related" (empty if none of these applies).
+    religious_genre = row_attributes['genre_by_relevant'].fillna('other religious').where(row_attributes['possible_relevant_genre'], row_attributes['genre_by_sau'].fillna(row_attributes['relational_category']))
+    row_attributes['religious_genre'] = religious_genre.astype('category')
+    
+    return row_attributes
+
+
+def add_row_attributes(input_db:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
+    """ Returns input_db with the derived row attributes as additional columns (if they are not there already). """
+    if 'general_area' in input_db.columns:
+        return input_db
+    
+    return pd.concat([input_db, derive_row_attributes(input_db)], axis=1)
+
+
+def count_by(*keys, weights=None)->dict:
+    """ This counts the values (or combinations of values, as tuples) of the given series in the order of their first appearance, i.e., in the same order in which the original row by row counting filled its dictionaries. With weights (e.g., the "count" column of the count cube cells), the weights are summed instead of counting the rows. """
+    if len(keys[0]) == 0:
+        return {}
+    
+    if weights is None:
+        counts = keys[0].groupby(list(keys), sort=False, observed=True).size()
+    else:
+        counts = weights.groupby(list(keys), sort=False, observed=True).sum()
+    
+    return {key: int(count) for key, count in counts.items()}
+
+
+def count_nested(outer_key, inner_key, weights=None)->dict:
+    """ This counts combinations of two series into a nested dictionary (e.g., {location: {language: count}}). """
+    nested_counts = {}
+    for (outer, inner), count in count_by(outer_key, inner_key, weights=weights).items():
+        if outer not in nested_counts:
+            nested_counts[outer] = {}
+        nested_counts[outer][inner] = count
+    
+    return nested_counts
+
+
+def save_stats_csv(df:pd.core.frame.DataFrame, outfile_name:str)->bool:
+    """ This saves the statistics to STATS_PATH; the file is written only if its content has changed. It is replaced (not rewritten in place), so that a file restored as a hardlink to the backup store (see restore_snapshot in backup_store.py) is never changed. Returns True if the file was written. """
+    outfile_path = os.path.join(STATS_PATH, outfile_name)
+    content = df.to_csv(sep=',').encode('utf-8')
+    
+    if os.path.exists(outfile_path):
+        with open(outfile_path, 'rb') as f:
+            if f.read() == content:
+                return False
+    
+    temporary_path = outfile_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(content)
+    os.replace(temporary_path, outfile_path)
+    
+    return True
+
+
+def get_cube_cells(input_db:pd.core.frame.DataFrame, count_cube=None)->pd.core.frame.DataFrame:
+    """ Returns the cells of the count cube (see count_cube.py) with the "count" column; the cube is built from input_db when it is not given. """
+    if count_cube is None:
+        count_cube = build_count_cube(add_row_attributes(input_db))
+    
+    return cube_cells(count_cube)
+
+
+def select_cluster(db:pd.core.frame.DataFrame, cluster:str, findspot_index:dict=None)->pd.core.frame.DataFrame:
+    """ Returns the rows of db in the cluster (general area); with findspot_index (see findspot_index.py, built from db), the rows are taken from the index instead of comparing all rows. """
+    if findspot_index is None:
+        return db[db['general_area'] == cluster]
+    
+    return select_location(db, findspot_index, cluster)
+
+
+def get_all_lang_combinations(input_db, count_cube=None):
+    if count_cube is None:
+        languages = add_row_attributes(input_db)['languages_utdb']
+    else:
+        languages = count_cube.index.get_level_values('languages_utdb')
+    all_lang_combinations = list(set(languages))
     all_lang_combinations.sort()
     # print(all_lang_combinations)
     return all_lang_combinations
 
 
-def list_languages_sau_et_rsti(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin ("RSTI")', 'Phoenician ("RSTI")', 'Latin (SAU)', 'Phoenician (SAU)']):
-    languages_counts = defaultdict(int)
-
-    for row_id in input_db.index:
-        languages_rsti = normalise_lang(input_db.loc[row_id]['RSTI Language'], use_multilingual=use_multilingual)
-        languages_rsti = f'{languages_rsti} ("RSTI")'
-
-        sau_languages = normalise_lang(input_db.loc[row_id]['SAU Language'], use_multilingual=use_multilingual)
-        sau_languages = f'{sau_languages} (SAU)'
-            
-        if languages_rsti in ignore_langs or sau_languages in ignore_langs:
-            continue
-        else:
-            languages_counts[sau_languages] += 1
-            languages_counts[languages_rsti] += 1
+def list_languages_sau_et_rsti(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin ("RSTI")', 'Phoenician ("RSTI")', 'Latin (SAU)', 'Phoenician (SAU)'], count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    
+    languages_rsti = db[language_column('rsti', use_multilingual)] + ' ("RSTI")'
+    sau_languages = db[language_column('sau', use_multilingual)] + ' (SAU)'
+    
+    to_count = ~(languages_rsti.isin(ignore_langs) | sau_languages.isin(ignore_langs))
+    
+    # NOTE: SAU and RSTI languages are interleaved, so that the order of the output is the same as when counting row by row.
+    languages_counts = count_by(pd.Series(np.column_stack([sau_languages[to_count], languages_rsti[to_count]]).ravel()), weights=pd.Series(np.repeat(db['count'][to_count].to_numpy(), 2)))
             
     out_dict = {}
     for i, lang in enumerate(languages_counts):
@@ -137,14 +304,14 @@ def list_languages_sau_et_rsti(input_db, outfile_name:str, use_multilingual=True
         if 'RSTI' in lang:
             out_dict[i]['RSTI_count'] = languages_counts[lang]
         else:
-            out_dict[i]['RSTI_count'] = languages_counts[lang.replace('SAU', '"RSTI"')]
+            out_dict[i]['RSTI_count'] = languages_counts.get(lang.replace('SAU', '"RSTI"'), 0)
 
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+    save_stats_csv(df, outfile_name)
 
 
-def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name: str, ignore_langs=['Latin', 'Phoenician'], use_multilingual=True):
+def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name: str, ignore_langs=['Latin', 'Phoenician'], use_multilingual=True, count_cube=None):
     """
     This function counts languages that are associated with individual archives (only at Ugarit).
 
@@ -153,24 +320,9 @@ def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name:
         outfile_name (str): csv output filename (incl. ".cvs"), the file will be saved to STATS_PATH.
         ignore_langs (list): What languages should be ignored from the analysis (only when appearing independently!!)
     """
+    db = get_cube_cells(input_db, count_cube)
     
-    locations_et_languages = defaultdict(dict)
-
-    for row_id in input_db.index:
-        languages = normalise_lang(input_db.loc[row_id]['UTDB Language'], use_multilingual=use_multilingual)
-            
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float:
-                general_area = 'Other/unknown'
-
-
-        if locations_et_languages[general_area]:
-            locations_et_languages[general_area][languages] += 1
-        else:
-            locations_et_languages[general_area] = defaultdict(int)
-            locations_et_languages[general_area][languages] += 1
+    locations_et_languages = count_nested(db['general_area'], db[language_column('utdb', use_multilingual)], weights=db['count'])
 
     row_mockup = {'Akkadian': 0, 
                   'Ugaritic': 0, 
@@ -185,24 +337,13 @@ def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name:
     
     if not use_multilingual:
         row_mockup = {}
-        all_langs = get_all_lang_combinations(input_db=input_db)
+        all_langs = get_all_lang_combinations(input_db=input_db, count_cube=count_cube)
         for lng_comb in all_langs:
             row_mockup[lng_comb] = 0
         row_mockup['total'] = 0
 
     # NOTE: list locations (as they appear in the DB under "(SUA) Archive/General area" column)
-    locations_to_count_in = ['Royal Palace', 
-                             'House of Urtenu', 
-                             'House of Rapanu', 
-                             'House of Yabninu', 
-                             'Lamaštu', 
-                             'House of the Literary Tablets', 
-                             'Between Royal Palace and South Palace', 
-                             'House of the High Priest', 
-                             'House of Rašapabu', 
-                             'Literate’s House', 
-                             'House of the Hurrian Priest',
-                             ]
+    locations_to_count_in = locations_in_ugarit
     
     # Create first entry to the output dictionary, prepared to include all other locations.
     out_dict = {'Other/unknown': row_mockup.copy()}
@@ -224,7 +365,7 @@ def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name:
                 total += locations_et_languages[location][lang]
                 if location in locations_to_count_in:
                     row_dict[lang] = locations_et_languages[location][lang]
-                elif location == 'Ras Ibn-Hani' or location == 'Minet el-Beida' or location == 'Minet el Beida' or location == 'outside':
+                elif location in locations_outside_ugarit:
                     continue
                 else:
                     out_dict['Other/unknown'][lang] += locations_et_languages[location][lang]
@@ -237,109 +378,44 @@ def list_locations_et_languages(input_db:pd.core.frame.DataFrame, outfile_name:
 
     output_db = pd.DataFrame.from_dict(out_dict)
     output_db = output_db.transpose()
-    output_db.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+    save_stats_csv(output_db, outfile_name)
 
 
-def compare_languages_in_RSTI_et_SAU(input_db:pd.core.frame.DataFrame, outfile_name='SAU_RSTI_lang_flow.csv', use_multilingual=False, ignore_langs=None):
+def compare_languages_in_RSTI_et_SAU(input_db:pd.core.frame.DataFrame, outfile_name='SAU_RSTI_lang_flow.csv', use_multilingual=False, ignore_langs=None, count_cube=None):
     """
     This function compares information on languages as provided by RSTI (+-) or SAU.
     """
+    db = get_cube_cells(input_db, count_cube)
     
-    from_to_dict = {}
-
-    for row_id in input_db.index:
-        SAU_lang = normalise_lang(input_db.loc[row_id]['SAU Language'], use_multilingual=use_multilingual)
-        RSTI_lang = normalise_lang(input_db.loc[row_id]['RSTI Language'], use_multilingual=use_multilingual)
-        
-        from_to = f'{SAU_lang}--to--{RSTI_lang}'
-        
-        try:
-            from_to_dict[from_to] += 1
-        except:
-            from_to_dict[from_to] = 1
+    from_to_dict = count_by(db[language_column('sau', use_multilingual)], db[language_column('rsti', use_multilingual)], weights=db['count'])
             
     out_dict = {}
     idx = 0
-    for key in from_to_dict:
-        SAU_lang = key.split('--to--')[0]
-        RSTI_lang = key.split('--to--')[1]
-        
+    for SAU_lang, RSTI_lang in from_to_dict:
         if ignore_langs:
             if SAU_lang in ignore_langs or RSTI_lang in ignore_langs:
                 continue
             else:
-                out_dict[idx] = {'SAU language': SAU_lang, '"RSTI" language': RSTI_lang, 'value': from_to_dict[key]}
+                out_dict[idx] = {'SAU language': SAU_lang, '"RSTI" language': RSTI_lang, 'value': from_to_dict[(SAU_lang, RSTI_lang)]}
                 
                 idx += 1
         else:
-            out_dict[idx] = {'SAU language': SAU_lang, '"RSTI" language': RSTI_lang, 'value': from_to_dict[key]}
+            out_dict[idx] = {'SAU language': SAU_lang, '"RSTI" language': RSTI_lang, 'value': from_to_dict[(SAU_lang, RSTI_lang)]}
         
             idx += 1
 
     output_db = pd.DataFrame.from_dict(out_dict)
     output_db = output_db.transpose()
-    output_db.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
-
+    save_stats_csv(output_db, outfile_name)
 
-def list_languages_by_db(input_db, lang_by:str, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician'], only_multi=False):
-    languages_counts = defaultdict(int)
 
-    for row_id in input_db.index:
-        if lang_by == 'utdb':
-            languages = normalise_lang(input_db.loc[row_id]['UTDB Language'], use_multilingual=use_multilingual)
-        elif lang_by == 'rsti':
-            languages = normalise_lang(input_db.loc[row_id]['RSTI Language'], use_multilingual=use_multilingual)
-        elif lang_by == 'sau':
-            languages = normalise_lang(input_db.loc[row_id]['SAU Language'], use_multilingual=use_multilingual)
-        else:
-            print('WARNING: there is error in data selection setting, choose "utdb", "rsti" or "sau" for lang_by parameter.')
-            return
-        
-        if not only_multi:
-            if languages in ignore_langs:
-                continue
-            else:
-                languages_counts[languages] += 1
-        else:
-            if languages in ignore_langs:
-                continue
-            elif len(languages.split(';')) >= 2:
-                languages_counts[languages] += 1
-            else:
-                continue
-    
-    out_dict = {}
-    for i, lang in enumerate(languages_counts):
-        #print(lang, languages_counts[lang])
-        out_dict[i] = {'language': lang, 'count of texts': languages_counts[lang]}
-
-    df = pd.DataFrame.from_dict(out_dict)
-    df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+def count_languages(languages, outfile_name:str, ignore_langs:list, only_multi:bool, weights=None):
+    """ This counts the (normalised) languages and saves them to outfile_name (shared by list_languages_by_db and list_languages). """
+    to_count = ~languages.isin(ignore_langs)
+    if only_multi:
+        to_count &= languages.str.count(';') >= 1
     
-    
-def list_languages(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician'], only_multi=False, only_Ugarit_MeB_RIH=True):
-    languages_counts = defaultdict(int)
-
-    for row_id in input_db.index:
-        if only_Ugarit_MeB_RIH:
-            if type(input_db.loc[row_id]['Excavation Siglum']) == float:
-                continue
-            
-        languages = normalise_lang(input_db.loc[row_id]['UTDB Language'], use_multilingual=use_multilingual)
-            
-        if not only_multi:
-            if languages in ignore_langs:
-                continue
-            else:
-                languages_counts[languages] += 1
-        else:
-            if languages in ignore_langs:
-                continue
-            elif len(languages.split(';')) >= 2:
-                languages_counts[languages] += 1
-            else:
-                continue
+    languages_counts = count_by(languages[to_count], weights=weights[to_count] if weights is not None else None)
     
     out_dict = {}
     for i, lang in enumerate(languages_counts):
@@ -348,34 +424,37 @@ def list_languages(input_db, outfile_name:str, use_multilingual=True, ignore_lan
 
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+    save_stats_csv(df, outfile_name)
 
 
-def list_locations_et_ktu_genres(input_db, outfile_name:str):
-    locations_et_ktu = defaultdict(dict)
+def list_languages_by_db(input_db, lang_by:str, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician'], only_multi=False, count_cube=None):
+    if lang_by not in language_columns:
+        print('WARNING: there is error in data selection setting, choose "utdb", "rsti" or "sau" for lang_by parameter.')
+        return
+    
+    db = get_cube_cells(input_db, count_cube)
+    
+    count_languages(db[language_column(lang_by, use_multilingual)], outfile_name=outfile_name, ignore_langs=ignore_langs, only_multi=only_multi, weights=db['count'])
+    
+    
+def list_languages(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician'], only_multi=False, only_Ugarit_MeB_RIH=True, count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    
+    if only_Ugarit_MeB_RIH:
+        db = db[db['has_excavation_siglum']]
+    
+    count_languages(db[language_column('utdb', use_multilingual)], outfile_name=outfile_name, ignore_langs=ignore_langs, only_multi=only_multi, weights=db['count'])
 
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float:
-                general_area = 'Other/unknown'
-                
-        ktu_num = str(input_db.loc[row_id]['KTU3'])
-        
-        if type(ktu_num) == float or ktu_num == 'nan':
-            continue
-        else:
-            ktu_category = ktu_num.split('.')[0]
 
-            if locations_et_ktu[general_area]:
-                locations_et_ktu[general_area][ktu_category] += 1
-            else:
-                locations_et_ktu[general_area] = defaultdict(int)
-                locations_et_ktu[general_area][ktu_category] += 1
+def list_locations_et_ktu_genres(input_db, outfile_name:str, count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    db = db[db['has_ktu']]
+    
+    locations_et_ktu = count_nested(db['general_area'], db['ktu_category'], weights=db['count'])
     
     row_mockup = {'Literary and Religious': 0, 'Letters': 0, 'Legal and Juridical': 0, 'Economic': 0, 'Scribal Excercises': 0, 'Inscriptions': 0, 'Unclassified etc.': 0, 'Ugaritic in syllabic': 0, 'total': 0}
-    locations_to_count_in = ['Royal Palace', 'House of Urtenu', 'House of Rapanu', 'House of Yabninu', 'Lamaštu', 'House of the Literary Tablets', 'Between Royal Palace and South Palace', 'House of the High Priest', 'House of Rašapabu', 'Literate’s House', 'House of the Hurrian Priest']
+
+    locations_to_count_in = locations_in_ugarit
 
     out_dict = {'Other/unknown': row_mockup.copy()}
 
@@ -402,77 +481,27 @@ def list_locations_et_ktu_genres(input_db, outfile_name:str):
 
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+    save_stats_csv(df, outfile_name)
 
 
-def get_religious_texts_stats(input_db, outfile_name:str, detailed_relation=False):
-    locations_et_reli = defaultdict(dict)
-
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float or general_area == 'nan':
-                general_area = 'Other/unknown'
-        
-        related_texts = input_db.loc[row_id]['"Clemens 2001"']
-        if detailed_relation:
-            out_dict = {'Other/unknown': {'religious': 0, 'related':0, 'probably related': 0, 'possibly related': 0, 'probably not related': 0, 'uncertain relation': 0, 'other': 0, 'total': 0}}
-            if 'PRAVDA' == related_texts:
-                relational_category = 'related'
-            elif 'ADD TRUE' == related_texts:
-                relational_category = 'related'
-            elif 'PROBABLY TRUE' == related_texts:
-                relational_category = 'probably related'
-            elif 'POSSIBLY TRUE' == related_texts:
-                relational_category = 'possibly related'
-            elif 'UNCERTAIN' == related_texts:
-                relational_category = 'uncertain relation'
-            elif 'PROBABLY FALSE' == related_texts:
-                relational_category = 'probably not related'
-            elif 'SET TO FALSE' == related_texts:
-                relational_category = False
-            elif 'FALSE' == related_texts:
-                relational_category = False
-            else:
-                relational_category = False
-        else:
-            out_dict = {'Other/unknown': {'religious': 0, 'related':0, 'other': 0, 'total': 0}}
-            if related_texts in ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']:
-                relational_category = 'related'
-            else:
-                relational_category = False
-
-        possible_relevant_genre = input_db.loc[row_id]['possible relevant (religious) genres']
-        if type(possible_relevant_genre) == float or possible_relevant_genre == 'nan':
-            possible_relevant_genre = False
-
-        ktu_num = str(input_db.loc[row_id]['KTU3'])
-        ktu_category = ktu_num.split('.')[0]
-
-        if possible_relevant_genre or ktu_category == '1':
-            if locations_et_reli[general_area]:
-                locations_et_reli[general_area]['religious'] += 1
-            else:
-                locations_et_reli[general_area] = defaultdict(int)
-                locations_et_reli[general_area]['religious'] += 1
-
-        
-        elif relational_category:
-            if locations_et_reli[general_area]:
-                locations_et_reli[general_area][relational_category] += 1
-            else:
-                locations_et_reli[general_area] = defaultdict(int)
-                locations_et_reli[general_area][relational_category] += 1
+def get_religious_texts_stats(input_db, outfile_name:str, detailed_relation=False, count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    
+    if detailed_relation:
+        out_dict = {'Other/unknown': {'religious': 0, 'related':0, 'probably related': 0, 'possibly related': 0, 'probably not related': 0, 'uncertain relation': 0, 'other': 0, 'total': 0}}
+        relational_category = db['relation_category']
+    else:
+        out_dict = {'Other/unknown': {'religious': 0, 'related':0, 'other': 0, 'total': 0}}
+        relational_category = db['relational_category']
+    
+    religious = db['possible_relevant_genre'] | (db['ktu_category'] == '1')
+    religious_category = relational_category.astype(object).fillna('other').mask(religious, 'religious')
+    
+    locations_et_reli = count_nested(db['general_area'], religious_category, weights=db['count'])
 
-        else:
-            if locations_et_reli[general_area]:
-                locations_et_reli[general_area]['other'] += 1
-            else:
-                locations_et_reli[general_area] = defaultdict(int)
-                locations_et_reli[general_area]['other'] += 1
     
-    locations_to_count_in = ['Royal Palace', 'House of Urtenu', 'House of Rapanu', 'House of Yabninu', 'Lamaštu', 'House of the Literary Tablets', 'Between Royal Palace and South Palace', 'House of the High Priest', 'House of Rašapabu', 'Literate’s House', 'House of the Hurrian Priest', 'Ras Ibn-Hani', 'Minet el-Beida']
+    
+    locations_to_count_in = locations_in_ugarit + locations_around_ugarit
     
     for location in locations_et_reli:
         #(location)
@@ -493,124 +522,28 @@ def get_religious_texts_stats(input_db, outfile_name:str, detailed_relation=Fals
             out_dict['Other/unknown'] = row_data
             
     # NOTE: for ordering of the bars in Flourish:
-    out_dict['Other/unknown']['total'] = 2
-    out_dict['Ras Ibn-Hani']['total'] = 1
-    out_dict['Minet el-Beida']['total'] = 0
+    for location, total in flourish_order_totals.items():
+        out_dict[location]['total'] = total
 
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
-
+    save_stats_csv(df, outfile_name)
 
-def get_religious_texts_detailed_stats(input_db, outfile_name:str):
-    locations_et_religenre = defaultdict(dict)
 
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float or general_area == 'nan':
-                general_area = 'Other/unknown'
-        
-        related_texts = input_db.loc[row_id]['"Clemens 2001"']
-        if related_texts in ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']:
-            relational_category = 'related'
-        else:
-            relational_category = False
+def get_religious_texts_detailed_stats(input_db, outfile_name:str, count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    
+    religious_genre = db['religious_genre']
+    to_count = religious_genre.notna()
+    
+    locations_et_religenre = count_nested(db['general_area'][to_count], religious_genre[to_count], weights=db['count'][to_count])
 
-        possible_relevant_genre = input_db.loc[row_id]['possible relevant (religious) genres']
-        if type(possible_relevant_genre) == float or possible_relevant_genre == 'nan':
-            possible_relevant_genre = False
-        
-        genre_according_to_sau = input_db.loc[row_id]['SAU genre']
-        if type(genre_according_to_sau) == float or genre_according_to_sau == 'nan':
-            genre_according_to_sau = False
-
-        if possible_relevant_genre:
-            if 'ritual' in possible_relevant_genre or  'sacrifices' in possible_relevant_genre or 'offerings' in possible_relevant_genre:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['ritual'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['ritual'] += 1
-            elif  'myth' in possible_relevant_genre or  'epic' in possible_relevant_genre or 'wisdom' in possible_relevant_genre or 'literary' in possible_relevant_genre or 'narrative' in possible_relevant_genre:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['narrative'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['narrative'] += 1
-            elif  'hymn' in possible_relevant_genre or  'prayer' in possible_relevant_genre:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['hymn/prayer'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['hymn/prayer'] += 1
-            elif 'incantation' in possible_relevant_genre or 'magic' in possible_relevant_genre or 'medical' in possible_relevant_genre:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['incantation/magic'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['incantation/magic'] += 1
-            elif  'omen' in possible_relevant_genre or  'divination' in possible_relevant_genre or 'oracular' in possible_relevant_genre or 'divinatiory' in possible_relevant_genre:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['divination'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['divination'] += 1
-            else:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['other religious'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['other religious'] += 1
 
-        elif genre_according_to_sau:
-            if 'D' in genre_according_to_sau or 'liv' in genre_according_to_sau and 'Diri' not in genre_according_to_sau:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['divination'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['divination'] += 1
-            elif 'M' in genre_according_to_sau or 'Lam' in genre_according_to_sau or 'Med' in genre_according_to_sau and 'Mat' not in genre_according_to_sau and 'Mea' not in genre_according_to_sau:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['incantation/magic'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['incantation/magic'] += 1                
-            elif 'Lit' in genre_according_to_sau:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['narrative'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['narrative'] += 1
-            elif 'Rel' in genre_according_to_sau or 'G' in genre_according_to_sau and 'RSGT' not in genre_according_to_sau:
-                if locations_et_religenre[general_area]:
-                    locations_et_religenre[general_area]['other religious'] += 1
-                else:
-                    locations_et_religenre[general_area] = defaultdict(int)
-                    locations_et_religenre[general_area]['other religious'] += 1
-            else:
-                if relational_category:
-                    if locations_et_religenre[general_area]:
-                        locations_et_religenre[general_area]['related'] += 1
-                    else:
-                        locations_et_religenre[general_area] = defaultdict(int)
-                        locations_et_religenre[general_area]['related'] += 1
-            
-        elif relational_category:
-            if locations_et_religenre[general_area]:
-                locations_et_religenre[general_area]['related'] += 1
-            else:
-                locations_et_religenre[general_area] = defaultdict(int)
-                locations_et_religenre[general_area]['related'] += 1
-        
-        else:
-            continue
 
     row_mockup = {'ritual': 0, 'narrative': 0, 'hymn/prayer': 0, 'divination': 0, 'incantation/magic': 0, 'other religious': 0, 'related': 0, 'total': 0}
 
     out_dict = {'Other/unknown': row_mockup.copy()} # The totals are for Flourish ordering of bars.
-    locations_to_count_in = ['Royal Palace', 'House of Urtenu', 'House of Rapanu', 'House of Yabninu', 'Lamaštu', 'House of the Literary Tablets', 'Between Royal Palace and South Palace', 'House of the High Priest', 'House of Rašapabu', 'Literate’s House', 'House of the Hurrian Priest', 'Ras Ibn-Hani', 'Minet el-Beida']
+    locations_to_count_in = locations_in_ugarit + locations_around_ugarit
     
     for location in locations_et_religenre:
         #print(location)
@@ -631,76 +564,32 @@ def get_religious_texts_detailed_stats(input_db, outfile_name:str):
             out_dict['Other/unknown'] = row_data
 
     # NOTE: for ordering of the bars in Flourish:
-    out_dict['Other/unknown']['total'] = 2
-    out_dict['Ras Ibn-Hani']['total'] = 1
-    out_dict['Minet el-Beida']['total'] = 0
+    for location, total in flourish_order_totals.items():
+        out_dict[location]['total'] = total
 
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
-
-
-def religious_languages(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician']):
-    locations_languages = defaultdict(dict)
-
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float or general_area == 'nan':
-                general_area = 'Other/unknown'
+    save_stats_csv(df, outfile_name)
 
-        languages = normalise_lang(input_db.loc[row_id]['UTDB Language'], use_multilingual=use_multilingual)
-        
-        related_texts = input_db.loc[row_id]['"Clemens 2001"']
-        if related_texts in ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']:
-            relational_category = 'related'
-        else:
-            relational_category = False
 
-        possible_relevant_genre = input_db.loc[row_id]['possible relevant (religious) genres']
-        if type(possible_relevant_genre) == float or possible_relevant_genre == 'nan':
-            add_religious_entry = False
-        else:
-            add_religious_entry = True
-            
-        genre_according_to_sau = input_db.loc[row_id]['SAU genre']
-        if genre_according_to_sau == 'nan' or type(genre_according_to_sau) == float:
-            genre_according_to_sau = 'None'
-        if not add_religious_entry:
-            if 'D' in genre_according_to_sau or 'liv' in genre_according_to_sau and 'Diri' not in genre_according_to_sau:
-                add_religious_entry = True
-            elif 'M' in genre_according_to_sau or 'Lam' in genre_according_to_sau or 'Med' in genre_according_to_sau and 'Mat' not in genre_according_to_sau and 'Mea' not in genre_according_to_sau:
-                add_religious_entry = True             
-            elif 'Lit' in genre_according_to_sau:
-                add_religious_entry = True
-            elif 'Rel' in genre_according_to_sau or 'G' in genre_according_to_sau and 'RSGT' not in genre_according_to_sau:
-                add_religious_entry = True
-            else:
-                add_religious_entry = False
+def religious_languages(input_db, outfile_name:str, use_multilingual=True, ignore_langs=['Latin', 'Phoenician'], count_cube=None):
+    db = get_cube_cells(input_db, count_cube)
+    
+    languages = db[language_column('utdb', use_multilingual)]
+    add_religious_entry = db['possible_relevant_genre'] | db['genre_by_sau'].notna()
+    
+    religious_languages = ('related ' + languages).where(db['relational_category'].notna()).mask(add_religious_entry, languages)
+    to_count = religious_languages.notna()
+    
+    locations_languages = count_nested(db['general_area'][to_count], religious_languages[to_count], weights=db['count'][to_count])
 
-        if add_religious_entry:
-            if locations_languages[general_area]:
-                locations_languages[general_area][languages] += 1
-            else:
-                locations_languages[general_area] = defaultdict(int)
-                locations_languages[general_area][languages] += 1
 
-        elif relational_category:
-            if locations_languages[general_area]:
-                locations_languages[general_area][f'related {languages}'] += 1
-            else:
-                locations_languages[general_area] = defaultdict(int)
-                locations_languages[general_area][f'related {languages}'] += 1
-        
-        else:
-            continue
 
     row_mockup = {'Ugaritic': 0, 'Akkadian': 0, 'Hurrian': 0, 'Sumerian': 0, 'Hittite': 0, 'multilingual': 0, 'unknown/unassigned': 0, 'related Ugaritic': 0, 'related Akkadian': 0, 'related Sumerian':0, 'related Hittite': 0, 'related multilingual': 0, 'related unknown/unassigned': 0}
     row_mockup['total'] = 0
 
     out_dict = {'Other/unknown': row_mockup.copy()}
-    locations_to_count_in = ['Royal Palace', 'House of Urtenu', 'House of Rapanu', 'House of Yabninu', 'Lamaštu', 'House of the Literary Tablets', 'Between Royal Palace and South Palace', 'House of the High Priest', 'House of Rašapabu', 'Literate’s House', 'House of the Hurrian Priest']
+    locations_to_count_in = locations_in_ugarit
     
     for location in locations_languages:
         #print(location)
@@ -728,130 +617,83 @@ def religious_languages(input_db, outfile_name:str, use_multilingual=True, ignor
     
     df = pd.DataFrame.from_dict(out_dict)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, outfile_name), sep=',', encoding='utf-8')
+    save_stats_csv(df, outfile_name)
 
 
-def list_genres_in_cluster(input_db, cluster:str, outfile_name_prefix:str):    
-    religenres = defaultdict(dict)
+def classify_religious_genres_in_cluster(cluster_db, ktu_classification_fallback:dict, ktu_classification_related:dict, fallback_categories=None, classification_state=None):
+    """
+    This function classifies the religious genre of texts in one cluster (shared by list_genres_in_cluster and list_genres_detailes_in_cluster). Texts that are neither religious, nor related get NaN.
 
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float or general_area == 'nan':
-                general_area = 'Other/unknown'
-        
-        if general_area == cluster:            
-            related_texts = input_db.loc[row_id]['"Clemens 2001"']
-            if related_texts in ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']:
-                relational_category = 'related'
-            else:
-                relational_category = False
+    Args:
+        cluster_db (pd.core.frame.DataFrame): rows of the cluster with the derived row attributes
+        ktu_classification_fallback (dict): KTU classification of the texts with a relevant genre that does not fit any religious genre
+        ktu_classification_related (dict): KTU classification of the related texts
+        fallback_categories (list): if given, only these KTU classifications are kept for the relevant genres, the rest falls to "other religious"
+        classification_state (dict): if given, the cluster is classified by parts (in the order of rows): the last classification of the previous part is taken from it and the last one of this part is saved to it
+    """
+    ktu_category = cluster_db['ktu_category']
+    
+    fallback_branch = cluster_db['possible_relevant_genre'] & cluster_db['genre_by_relevant'].isna()
+    related_branch = ~cluster_db['possible_relevant_genre'] & cluster_db['genre_by_sau'].isna() & cluster_db['relational_category'].notna()
+    
+    fallback_classification = ktu_category.map(ktu_classification_fallback).where(fallback_branch)
+    related_classification = ktu_category.map(ktu_classification_related).where(related_branch)
+    
+    # NOTE: related texts without (classified) KTU number take over the classification of the previously classified text (this is how the original row by row analysis counted them).
+    last_classification = fallback_classification.fillna(related_classification).ffill()
+    if classification_state is not None:
+        if pd.notna(classification_state.get('last', np.nan)):
+            last_classification = last_classification.fillna(classification_state['last'])
+        if len(last_classification) > 0:
+            classification_state['last'] = last_classification.iloc[-1]
+    last_classification = last_classification.astype(object)
+    
+    if fallback_categories:
+        fallback_classification = fallback_classification.where(fallback_classification.isin(fallback_categories))
+    
+    religious_genre = cluster_db['genre_by_relevant'].fillna(fallback_classification.fillna('other religious')).where(cluster_db['possible_relevant_genre'], cluster_db['genre_by_sau'])
+    religious_genre = religious_genre.mask(related_branch, 'related ' + last_classification.str.replace('?', '', regex=False))
+    
+    return religious_genre
 
-            possible_relevant_genre = input_db.loc[row_id]['possible relevant (religious) genres']
-            if type(possible_relevant_genre) == float or possible_relevant_genre == 'nan':
-                possible_relevant_genre = False
-            
-            genre_according_to_sau = input_db.loc[row_id]['SAU genre']
-            if type(genre_according_to_sau) == float or genre_according_to_sau == 'nan':
-                genre_according_to_sau = False
-
-            ktu_num = str(input_db.loc[row_id]['KTU3'])
-            ktu_category = ktu_num.split('.')[0]
-
-            if possible_relevant_genre:
-                if 'ritual' in possible_relevant_genre or  'sacrifices' in possible_relevant_genre or 'offerings' in possible_relevant_genre:
-                    if religenres['ritual']:
-                        religenres['ritual'] += 1
-                    else:
-                        religenres['ritual'] = 1
-                elif  'myth' in possible_relevant_genre or  'epic' in possible_relevant_genre or 'wisdom' in possible_relevant_genre or 'literary' in possible_relevant_genre or 'narrative' in possible_relevant_genre:
-                    if religenres['narrative']:
-                        religenres['narrative'] += 1
-                    else:
-                        religenres['narrative'] = 1
-                elif  'hymn' in possible_relevant_genre or  'prayer' in possible_relevant_genre:
-                    if religenres['hymn/prayer']:
-                        religenres['hymn/prayer'] += 1
-                    else:
-                        religenres['hymn/prayer'] = 1
-                elif 'incantation' in possible_relevant_genre or 'magic' in possible_relevant_genre or 'medical' in possible_relevant_genre:
-                    if religenres['incantation/magic']:
-                        religenres['incantation/magic'] += 1
-                    else:
-                        religenres['incantation/magic'] = 1
-                elif  'omen' in possible_relevant_genre or  'divination' in possible_relevant_genre or 'oracular' in possible_relevant_genre or 'divinatiory' in possible_relevant_genre:
-                    if religenres['divination']:
-                        religenres['divination'] += 1
-                    else:
-                        religenres['divination'] = 1
-                else:
-                    try:
-                        ktu_category_classification = ktu_classification_str_religenres[ktu_category]
-                        if religenres[ktu_category_classification]:
-                            religenres[ktu_category_classification] += 1
-                        else:
-                            religenres[ktu_category_classification] = 1
-                    except:
-                        if religenres['other religious']:
-                            religenres['other religious'] += 1
-                        else:
-                            religenres['other religious'] = 1
-
-            elif genre_according_to_sau:
-                if 'D' in genre_according_to_sau or 'liv' in genre_according_to_sau and 'Diri' not in genre_according_to_sau:
-                    if religenres['divination']:
-                        religenres['divination'] += 1
-                    else:
-                        religenres['divination'] = 1
-                elif 'M' in genre_according_to_sau or 'Lam' in genre_according_to_sau or 'Med' in genre_according_to_sau and 'Mat' not in genre_according_to_sau and 'Mea' not in genre_according_to_sau:
-                    if religenres['incantation/magic']:
-                        religenres['incantation/magic'] += 1
-                    else:
-                        religenres['incantation/magic'] = 1                
-                elif 'Lit' in genre_according_to_sau:
-                    if religenres['narrative']:
-                        religenres['narrative'] += 1
-                    else:
-                        religenres['narrative'] = 1
-                elif 'Rel' in genre_according_to_sau or 'G' in genre_according_to_sau and 'RSGT' not in genre_according_to_sau:
-                    if religenres['other religious']:
-                        religenres['other religious'] += 1
-                    else:
-                        religenres['other religious'] = 1
-                else:
-                    if relational_category:
-                        try:
-                            ktu_category_classification = ktu_classification_str_religenres_related[ktu_category]
-                            if religenres[f"related {ktu_category_classification.replace('?', '')}"]:
-                                religenres[f"related {ktu_category_classification.replace('?', '')}"] += 1
-                            else:
-                                religenres[f"related {ktu_category_classification.replace('?', '')}"] = 1
-                        except:
-                            if religenres[f"related {ktu_category_classification.replace('?', '')}"]:
-                                religenres[f"related {ktu_category_classification.replace('?', '')}"] += 1
-                            else:
-                                religenres[f"related {ktu_category_classification.replace('?', '')}"] = 1
 
-            
-            elif relational_category:
-                try:
-                    ktu_category_classification = ktu_classification_str_religenres_related[ktu_category]
-                    if religenres[f"related {ktu_category_classification.replace('?', '')}"]:
-                        religenres[f"related {ktu_category_classification.replace('?', '')}"] += 1
-                    else:
-                        religenres[f"related {ktu_category_classification.replace('?', '')}"] = 1
-                except:
-                    if religenres[f"related {ktu_category_classification.replace('?', '')}"]:
-                        religenres[f"related {ktu_category_classification.replace('?', '')}"] += 1
-                    else:
-                        religenres[f"related {ktu_category_classification.replace('?', '')}"] = 1
+detailed_genres_row_mockup = {'ritual': 0, 'narrative': 0, 'hymn/prayer': 0, 'divination': 0, 'incantation/magic': 0, 'other religious': 0, 'Economic': 0, 'related Economic': 0, 'related Legal and Juridical': 0, 'related Letters': 0, 'related Scribal Excercises': 0, 'related Inscriptions': 0, 'related other': 0, 'total': 0}
 
-            
-            else:
-                continue
-        else:
-            continue
+# NOTE: the two classifications of religious genres in clusters (see classify_religious_genres_in_cluster): by list_genres_in_cluster and by list_genres_detailes_in_cluster.
+cluster_genre_classifications = {
+    'cluster_genre': {'ktu_classification_fallback': ktu_classification_str_religenres, 'ktu_classification_related': ktu_classification_str_religenres_related},
+    'cluster_genre_detailed': {'ktu_classification_fallback': ktu_classification_str, 'ktu_classification_related': ktu_classification_str, 'fallback_categories': list(detailed_genres_row_mockup)}
+}
+
+# NOTE: dimensions of the cube of the religious genres in clusters, used by the cluster reports when the database is read by chunks (see update_statistics_by_chunks).
+cluster_cube_dimensions = ['general_area', 'detail_in_cluster', 'cluster_genre', 'cluster_genre_detailed']
+
+
+def classify_cluster_genres(chunk:pd.core.frame.DataFrame, classification_states:dict)->pd.core.frame.DataFrame:
+    """ This classifies the religious genres of the rows of the chunk (with the row attributes) in each cluster (general area) as the cluster reports do; classification_states keep the last classification of each cluster between the chunks. Returns the columns of cluster_genre_classifications. """
+    cluster_genres = pd.DataFrame(index=chunk.index, columns=list(cluster_genre_classifications), dtype=object)
+    for cluster, positions in chunk.groupby('general_area', sort=False, observed=True).indices.items():
+        cluster_db = chunk.iloc[positions]
+        for column, classification in cluster_genre_classifications.items():
+            classification_state = classification_states.setdefault((column, cluster), {})
+            cluster_genres.iloc[positions, cluster_genres.columns.get_loc(column)] = classify_religious_genres_in_cluster(cluster_db, classification_state=classification_state, **classification).to_numpy()
+    
+    return cluster_genres
+
+
+def list_genres_in_cluster(input_db, cluster:str, outfile_name_prefix:str, findspot_index=None, cluster_cube=None):    
+    if cluster_cube is None:
+        db = add_row_attributes(input_db)
+        db = select_cluster(db, cluster, findspot_index)
+        religious_genre = classify_religious_genres_in_cluster(db, **cluster_genre_classifications['cluster_genre'])
+        weights = None
+    else:
+        cells = cube_cells(slice_cube(cluster_cube, general_area=cluster))
+        religious_genre = cells['cluster_genre']
+        weights = cells['count']
+    
+    to_count = religious_genre.notna()
+    religenres = count_by(religious_genre[to_count], weights=None if weights is None else weights[to_count])
 
     out_dict = {}
     #out_dict['total'] = 0
@@ -863,227 +705,323 @@ def list_genres_in_cluster(input_db, cluster:str, outfile_name_prefix:str):
 
     df = pd.DataFrame.from_dict({0: out_dict})
     #df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, f'{outfile_name_prefix}_{cluster.replace(" ", "-")}.csv'), sep=',', encoding='utf-8')
+    save_stats_csv(df, f'{outfile_name_prefix}_{cluster.replace(" ", "-")}.csv')
 
 
-def list_genres_detailes_in_cluster(input_db, outfile_name_prefix:str, cluster='Royal Palace'):
+def list_genres_detailes_in_cluster(input_db, outfile_name_prefix:str, cluster='Royal Palace', findspot_index=None, cluster_cube=None):
+    if cluster_cube is None:
+        db = add_row_attributes(input_db)
+        db = select_cluster(db, cluster, findspot_index)
+        religious_genre = classify_religious_genres_in_cluster(db, **cluster_genre_classifications['cluster_genre_detailed'])
+        detail_in_cluster_column = db['detail_in_cluster']
+        weights = None
+    else:
+        cells = cube_cells(slice_cube(cluster_cube, general_area=cluster))
+        religious_genre = cells['cluster_genre_detailed']
+        detail_in_cluster_column = cells['detail_in_cluster']
+        weights = cells['count']
+    
+    to_count = religious_genre.notna()
+    
+    details_et_religenres = count_nested(detail_in_cluster_column[to_count], religious_genre[to_count], weights=None if weights is None else weights[to_count])
+    
     religenres = defaultdict(dict)
-
-    for row_id in input_db.index:
-        general_area = input_db.loc[row_id]['Archive/General area']
-        if type(general_area) == float:
-            general_area = input_db.loc[row_id]['SAU Archive/General area']
-            if type(general_area) == float or general_area == 'nan':
-                general_area = 'Other/unknown'
-        
-        if general_area == cluster:
-            detail_in_cluster = input_db.loc[row_id]['Detail in General']
-            if type(detail_in_cluster) == float:
-                detail_in_cluster = input_db.loc[row_id]['SAU Detail in General']
-                if type(detail_in_cluster) == float or detail_in_cluster == 'nan':
-                    detail_in_cluster = 'Other/unknown'
-                    
-            if not religenres[detail_in_cluster]:
-                religenres[detail_in_cluster] = {'ritual': 0, 'narrative': 0, 'hymn/prayer': 0, 'divination': 0, 'incantation/magic': 0, 'other religious': 0, 'Economic': 0, 'related Economic': 0, 'related Legal and Juridical': 0, 'related Letters': 0, 'related Scribal Excercises': 0, 'related Inscriptions': 0, 'related other': 0, 'total': 0}
-            
-            related_texts = input_db.loc[row_id]['"Clemens 2001"']
-            if related_texts in ['PRAVDA', 'ADD TRUE', 'PROBABLY TRUE', 'POSSIBLY TRUE']:
-                relational_category = 'related'
-            else:
-                relational_category = False
-
-            possible_relevant_genre = input_db.loc[row_id]['possible relevant (religious) genres']
-            if type(possible_relevant_genre) == float or possible_relevant_genre == 'nan':
-                possible_relevant_genre = False
-            
-            genre_according_to_sau = input_db.loc[row_id]['SAU genre']
-            if type(genre_according_to_sau) == float or genre_according_to_sau == 'nan':
-                genre_according_to_sau = False
-
-            ktu_num = str(input_db.loc[row_id]['KTU3'])
-            ktu_category = ktu_num.split('.')[0]
-
-            religenres[detail_in_cluster]['total'] += 1 # This will be subtracted if the requirements are not satisfied.
-            if possible_relevant_genre:
-                if 'ritual' in possible_relevant_genre or  'sacrifices' in possible_relevant_genre or 'offerings' in possible_relevant_genre:
-                    if religenres[detail_in_cluster]['ritual']:
-                        religenres[detail_in_cluster]['ritual'] += 1
-                    else:
-                        religenres[detail_in_cluster]['ritual'] = 1
-                elif  'myth' in possible_relevant_genre or  'epic' in possible_relevant_genre or 'wisdom' in possible_relevant_genre or 'literary' in possible_relevant_genre or 'narrative' in possible_relevant_genre:
-                    if religenres[detail_in_cluster]['narrative']:
-                        religenres[detail_in_cluster]['narrative'] += 1
-                    else:
-                        religenres[detail_in_cluster]['narrative'] = 1
-                elif  'hymn' in possible_relevant_genre or  'prayer' in possible_relevant_genre:
-                    if religenres[detail_in_cluster]['hymn/prayer']:
-                        religenres[detail_in_cluster]['hymn/prayer'] += 1
-                    else:
-                        religenres[detail_in_cluster]['hymn/prayer'] = 1
-                elif 'incantation' in possible_relevant_genre or 'magic' in possible_relevant_genre or 'medical' in possible_relevant_genre:
-                    if religenres[detail_in_cluster]['incantation/magic']:
-                        religenres[detail_in_cluster]['incantation/magic'] += 1
-                    else:
-                        religenres[detail_in_cluster]['incantation/magic'] = 1
-                elif  'omen' in possible_relevant_genre or  'divination' in possible_relevant_genre or 'oracular' in possible_relevant_genre or 'divinatiory' in possible_relevant_genre:
-                    if religenres[detail_in_cluster]['divination']:
-                        religenres[detail_in_cluster]['divination'] += 1
-                    else:
-                        religenres[detail_in_cluster]['divination'] = 1
-                else:
-                    try:
-                        ktu_category_classification = ktu_classification_str[ktu_category]
-                        if religenres[detail_in_cluster][ktu_category_classification]:
-                            religenres[detail_in_cluster][ktu_category_classification] += 1
-                        else:
-                            religenres[detail_in_cluster][ktu_category_classification] = 1
-                    except:
-                        if religenres[detail_in_cluster]['other religious']:
-                            religenres[detail_in_cluster]['other religious'] += 1
-                        else:
-                            religenres[detail_in_cluster]['other religious'] = 1
-
-            elif genre_according_to_sau:
-                if 'D' in genre_according_to_sau or 'liv' in genre_according_to_sau and 'Diri' not in genre_according_to_sau:
-                    if religenres[detail_in_cluster]['divination']:
-                        religenres[detail_in_cluster]['divination'] += 1
-                    else:
-                        religenres[detail_in_cluster]['divination'] = 1
-                elif 'M' in genre_according_to_sau or 'Lam' in genre_according_to_sau or 'Med' in genre_according_to_sau and 'Mat' not in genre_according_to_sau and 'Mea' not in genre_according_to_sau:
-                    if religenres[detail_in_cluster]['incantation/magic']:
-                        religenres[detail_in_cluster]['incantation/magic'] += 1
-                    else:
-                        religenres[detail_in_cluster]['incantation/magic'] = 1                
-                elif 'Lit' in genre_according_to_sau:
-                    if religenres[detail_in_cluster]['narrative']:
-                        religenres[detail_in_cluster]['narrative'] += 1
-                    else:
-                        religenres[detail_in_cluster]['narrative'] = 1
-                elif 'Rel' in genre_according_to_sau or 'G' in genre_according_to_sau and 'RSGT' not in genre_according_to_sau:
-                    if religenres[detail_in_cluster]['other religious']:
-                        religenres[detail_in_cluster]['other religious'] += 1
-                    else:
-                        religenres[detail_in_cluster]['other religious'] = 1
-                else:
-                    if relational_category:
-                        try:
-                            ktu_category_classification = ktu_classification_str[ktu_category]
-                            if religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"]:
-                                religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] += 1
-                            else:
-                                religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] = 1
-                        except:
-                            if religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"]:
-                                religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] += 1
-                            else:
-                                religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] = 1
-                                
-                    else:
-                        religenres[detail_in_cluster]['total'] -= 1
-
-            
-            elif relational_category:
-                try:
-                    ktu_category_classification = ktu_classification_str[ktu_category]
-                    if religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"]:
-                        religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] += 1
-                    else:
-                        religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] = 1
-                except:
-                    if religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"]:
-                        religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] += 1
-                    else:
-                        religenres[detail_in_cluster][f"related {ktu_category_classification.replace('?', '')}"] = 1
-
-            
-            else:
-                religenres[detail_in_cluster]['total'] -= 1
-                continue
-        else:
-            continue
+    
+    for detail_in_cluster in count_by(detail_in_cluster_column, weights=weights):
+        religenres[detail_in_cluster] = detailed_genres_row_mockup.copy()
+        for religious, count in details_et_religenres.get(detail_in_cluster, {}).items():
+            religenres[detail_in_cluster][religious] = religenres[detail_in_cluster].get(religious, 0) + count
+            religenres[detail_in_cluster]['total'] += count
 
     religenres['Other/unknown']['total'] = 0
 
     df = pd.DataFrame.from_dict(religenres)
     df = df.transpose()
-    df.to_csv(os.path.join(STATS_PATH, f'{outfile_name_prefix}_{cluster.replace(" ", "-")}.csv'), sep=',', encoding='utf-8')
+    save_stats_csv(df, f'{outfile_name_prefix}_{cluster.replace(" ", "-")}.csv')
 
 
 def make_backup_of_stats():
-    BACKUPT_TIMESTAMP = time.strftime("%d-%m-%Y--%H-%M", time.localtime())
-    BACKUP_files_PATH_STATS = os.path.join(STATS_PATH, 'STATS_BACKUP', f'BACKUP_{BACKUPT_TIMESTAMP}')
+    """ This backs up the statistics (CSV files) to the content-addressed store in STATS_BACKUP (see backup_store.py): files that have not changed since the previous backup are not stored again. """
+    snapshot_name = make_snapshot(os.path.join(STATS_PATH, 'STATS_BACKUP'), {'': STATS_PATH}, patterns=['*.csv'])
     
-    os.mkdir(BACKUP_files_PATH_STATS)
+    print()
+    if snapshot_name is None:
+        print('There are no statistics to back up.')
+    else:
+        print('Backup has been made to snapshot', snapshot_name)
 
-    for file_ in os.listdir(STATS_PATH):
-        file_path = os.path.join(STATS_PATH, file_)
 
-        if file_path.endswith('.csv'):
-            shutil.copy(file_path, BACKUP_files_PATH_STATS)
+def report(description:str, function, parameters:dict, input_columns:list, outputs:list, uses:str='count_cube')->dict:
+    """
+    This function declares one report of all_reports.
+
+    Args:
+        description (str): what is done (printed while running)
+        function: the report function (called with input_db and the parameters)
+        parameters (dict): arguments of the function
+        input_columns (list): columns of db (with the row attributes) on which the report depends
+        outputs (list): files written by the report (in STATS_PATH)
+        uses (str, optional): shared data given to the function besides db - "count_cube" or "findspot_index". Defaults to 'count_cube'.
+    """
+    return {'description': description, 'function': function, 'parameters': parameters, 'input_columns': input_columns, 'outputs': outputs, 'uses': uses}
+
+
+cluster_columns = ['general_area', 'detail_in_cluster', 'ktu_category', 'possible_relevant_genre', 'genre_by_relevant', 'genre_by_sau', 'relational_category']
+
+# NOTE: all statistics made by run_all_reports (name --> report). The reports are independent of each other (each writes its own files), so they can run in parallel, and only those whose inputs, parameters or code have changed are made again (see report_registry.py).
+all_reports = {
+    'locations_et_languages': report('Analysing languages in locations', list_locations_et_languages, {'outfile_name': 'locations_et_languages.csv', 'use_multilingual': False}, ['general_area', 'languages_utdb'], ['locations_et_languages.csv']),
+    'locations_et_languages_full': report('Analysing languages in locations (multilingual)', list_locations_et_languages, {'outfile_name': 'locations_et_languages_full.csv', 'use_multilingual': True}, ['general_area', 'languages_utdb_multilingual'], ['locations_et_languages_full.csv']),
+    'SAU_RSTI_lang_flow': report('Comparing languages in SAU and RSTI', compare_languages_in_RSTI_et_SAU, {'outfile_name': 'SAU_RSTI_lang_flow.csv', 'use_multilingual': False, 'ignore_langs': None}, ['languages_sau', 'languages_rsti'], ['SAU_RSTI_lang_flow.csv']),
+    'SAU_RSTI_lang_flow_multilingual': report('Comparing languages in SAU and RSTI (multilingual)', compare_languages_in_RSTI_et_SAU, {'outfile_name': 'SAU_RSTI_lang_flow_multilingual.csv', 'use_multilingual': True}, ['languages_sau_multilingual', 'languages_rsti_multilingual'], ['SAU_RSTI_lang_flow_multilingual.csv']),
+    'SAU_RSTI_lang_flow_multilingual_ignoreLatEtPhoe': report('Comparing languages in SAU and RSTI (multilingual, without Latin and Phoenician)', compare_languages_in_RSTI_et_SAU, {'outfile_name': 'SAU_RSTI_lang_flow_multilingual_ignoreLatEtPhoe.csv', 'use_multilingual': True, 'ignore_langs': ['Latin', 'Phoenician']}, ['languages_sau_multilingual', 'languages_rsti_multilingual'], ['SAU_RSTI_lang_flow_multilingual_ignoreLatEtPhoe.csv']),
+    'language_statistics': report('Doing general language statistics', list_languages, {'outfile_name': 'language_statistics.csv'}, ['has_excavation_siglum', 'languages_utdb_multilingual'], ['language_statistics.csv']),
+    'language_statistics_multi': report('Doing general language statistics (multilingual texts)', list_languages, {'outfile_name': 'language_statistics_multi.csv', 'only_multi': True, 'use_multilingual': False}, ['has_excavation_siglum', 'languages_utdb'], ['language_statistics_multi.csv']),
+    'KTU_in_locations': report('Analysing KTU classification in locations', list_locations_et_ktu_genres, {'outfile_name': 'KTU_in_locations.csv'}, ['general_area', 'has_ktu', 'ktu_category'], ['KTU_in_locations.csv']),
+    'religious_texts_in_locations': report('Analysing general religious situation', get_religious_texts_stats, {'outfile_name': 'religious_texts_in_locations.csv', 'detailed_relation': False}, ['general_area', 'possible_relevant_genre', 'ktu_category', 'relational_category'], ['religious_texts_in_locations.csv']),
+    'religious_texts_in_locations_detailed': report('Analysing general religious situation (detailed relation)', get_religious_texts_stats, {'outfile_name': 'religious_texts_in_locations_detailed.csv', 'detailed_relation': True}, ['general_area', 'possible_relevant_genre', 'ktu_category', 'relation_category'], ['religious_texts_in_locations_detailed.csv']),
+    'religious_texts_inlocs_detailed_genres': report('Analysing detailed religious situation', get_religious_texts_detailed_stats, {'outfile_name': 'religious_texts_inlocs_detailed_genres.csv'}, ['general_area', 'religious_genre'], ['religious_texts_inlocs_detailed_genres.csv']),
+    'religious_langs_stats': report('Analysing language situation of religious texts', religious_languages, {'outfile_name': 'religious_langs_stats.csv'}, ['general_area', 'languages_utdb_multilingual', 'possible_relevant_genre', 'genre_by_sau', 'relational_category'], ['religious_langs_stats.csv']),
+    'cluster_stats_House-of-the-High-Priest': report('Analysing religious texts in House of the High Priest', list_genres_in_cluster, {'cluster': 'House of the High Priest', 'outfile_name_prefix': 'cluster_stats'}, cluster_columns, ['cluster_stats_House-of-the-High-Priest.csv'], uses='findspot_index'),
+    'cluster_stats_House-of-the-Hurrian-Priest': report('Analysing religious texts in House of the Hurrian Priest', list_genres_in_cluster, {'cluster': 'House of the Hurrian Priest', 'outfile_name_prefix': 'cluster_stats'}, cluster_columns, ['cluster_stats_House-of-the-Hurrian-Priest.csv'], uses='findspot_index'),
+    'detailed_stats_Royal-Palace': report('Analysing religious texts in inner locations of Royal Palace', list_genres_detailes_in_cluster, {'outfile_name_prefix': 'detailed_stats'}, cluster_columns, ['detailed_stats_Royal-Palace.csv'], uses='findspot_index')
+}
+
+# NOTE: data shared by the reports in this process (set by init_report_worker).
+shared_report_data = {}
+
+# NOTE: when the database is read by chunks, the rows are not kept; the reports get these cubes instead of the data they use otherwise (see update_statistics_by_chunks).
+chunked_report_inputs = {'count_cube': 'count_cube', 'findspot_index': 'cluster_cube'}
+
+
+def init_report_worker(db:pd.core.frame.DataFrame, findspot_index:dict, count_cube:pd.core.series.Series, stats_path:str, profiling:tuple=(None, 'cProfile'), cluster_cube:pd.core.series.Series=None):
+    """ This gives the shared data (and the settings of profiling, see run_log.py) to the process that runs the reports. It is called once per worker process, not per report: with the "fork" start method (Linux), the workers get the data of the parent process without any copying (copy on write); otherwise, they are pickled once for each worker. """
+    global STATS_PATH
+    STATS_PATH = stats_path
+    configure_profiling(*profiling)
+    shared_report_data.update({'db': db, 'findspot_index': findspot_index, 'count_cube': count_cube, 'cluster_cube': cluster_cube})
+
+
+def run_report(report_name:str)->dict:
+    """ This runs one report of all_reports with the shared data and returns its record (see measure_stage in run_log.py). """
+    report = all_reports[report_name]
+    output_paths = [os.path.join(STATS_PATH, output) for output in report['outputs']]
     
-    print()
-    print('Backup has been made to directory BACKUP_'+BACKUPT_TIMESTAMP)
+    db = shared_report_data['db']
+    uses = report['uses'] if db is not None else chunked_report_inputs[report['uses']]
+    rows = len(db) if db is not None else int(shared_report_data['count_cube'].sum())
     
-def detele_files():
-    files_in_STATS = os.listdir(STATS_PATH)
-    for file_csv in files_in_STATS:
-        if os.path.isdir(os.path.join(STATS_PATH, file_csv)):
-            continue
-        else:
-            os.remove(os.path.join(STATS_PATH, file_csv))
+    with measure_stage('analyse.py', report_name, rows=rows, output_paths=output_paths):
+        report['function'](input_db=db, **{uses: shared_report_data[uses]}, **report['parameters'])
+    
+    # NOTE: the record is returned to the main process (which saves the run log), also when the report runs in this process.
+    return run_log.run_log_records.pop()
+
+
+def run_all_reports(db:pd.core.frame.DataFrame, findspot_index:dict, count_cube:pd.core.series.Series, report_names=None, max_workers=None, cluster_cube:pd.core.series.Series=None)->dict:
+    """
+    This computes the statistics (all_reports) from db (with the row attributes), its findspot index and count cube, and saves them to STATS_PATH.
+
+    Args:
+        db (pd.core.frame.DataFrame): the database with the row attributes (None when the database was read by chunks)
+        findspot_index (dict): see build_findspot_index (None when the database was read by chunks)
+        count_cube (pd.core.series.Series): see build_count_cube
+        report_names (list, optional): names of the reports to be made. Defaults to None (all reports).
+        max_workers (int, optional): number of processes running the reports; 1 runs them one after another in this process. Defaults to None (number of CPUs).
+        cluster_cube (pd.core.series.Series, optional): the cube of religious genres in clusters (see cluster_cube_dimensions), used instead of db and findspot_index when the database was read by chunks. Defaults to None.
+
+    Returns:
+        dict: name of the report --> its record (see measure_stage in run_log.py)
+    """
+    if report_names is None:
+        report_names = list(all_reports)
+    
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(report_names))
+    
+    report_records = {}
+    start = time.perf_counter()
+    profiling = (run_log.PROFILE_DIR, run_log.PROFILER)
+    
+    if max_workers <= 1:
+        init_report_worker(db, findspot_index, count_cube, STATS_PATH, profiling, cluster_cube)
+        for report_name in report_names:
+            print(all_reports[report_name]['description']+'...')
+            report_records[report_name] = run_report(report_name)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_report_worker, initargs=(db, findspot_index, count_cube, STATS_PATH, profiling, cluster_cube)) as executor:
+            futures = [executor.submit(run_report, report_name) for report_name in report_names]
+            # NOTE: results are collected in the order of all_reports (not in the order of finishing), so the output is always the same.
+            for future, report_name in zip(futures, report_names):
+                report_records[report_name] = future.result()
+                print(all_reports[report_name]['description']+'... done')
+    
+    add_records(list(report_records.values()))
     
     print()
-    print('Previous statistical data were cleared.')
+    print(f'{len(report_names)} reports done in {time.perf_counter() - start:.2f} s ({max_workers} processes).')
     
+    return report_records
 
-if __name__ == "__main__":
-    make_backup_of_stats()
-    detele_files()
+
+def update_statistics(incremental=True, force=False, report_names=None, max_workers=None):
+    """
+    This function regenerates the statistics in STATS_PATH.
+
+    With incremental=True, the state of the previous run (STATS_STATE_PATH) is used: the row attributes are derived only for the rows that have changed (new, edited or removed rows are found by their hashes) and their differences are applied to the counts. Without the state (or with incremental=False), the row attributes are derived for all rows.
+    Only the reports whose inputs, parameters or code have changed since they were made are made again (see report_registry.py), unless force=True. If all are up to date, nothing is done. The reports run in max_workers processes (see run_all_reports).
+
+    Args:
+        incremental (bool, optional): use the state of the previous run. Defaults to True.
+        force (bool, optional): make the reports even if they are up to date. Defaults to False.
+        report_names (list, optional): names of the reports (keys of all_reports) to be considered. Defaults to None (all reports).
+        max_workers (int, optional): see run_all_reports. Defaults to None.
+    """
+    with measure_stage('analyse.py', 'load database') as record:
+        db = load_typed_database(UGARIT_TEXTS_DATABASE_PATH)
+        record['rows'] = len(db)
     
-    db = pd.read_csv(UGARIT_TEXTS_DATABASE_PATH, encoding='utf-8', delimiter=';', dtype=str, index_col=0)
+    with measure_stage('analyse.py', 'find changed rows', rows=len(db)):
+        row_hashes = hash_rows(db)
+        state = load_stats_state(STATS_STATE_PATH, cube_dimensions, STATISTICS_CODE_HASH) if incremental else None
     
-    """ Analysing languages in locations """
-    print('Analysing languages in locations...')
-    list_locations_et_languages(input_db=db, outfile_name='locations_et_languages.csv', use_multilingual=False)
-    list_locations_et_languages(input_db=db, outfile_name='locations_et_languages_full.csv', use_multilingual=True)
+    if state is None:
+        state = empty_stats_state(cube_dimensions, STATISTICS_CODE_HASH)
+        changed_rows = db.index
+        removed_rows = pd.Index([])
+    else:
+        changed_rows, removed_rows = find_changed_rows(state, row_hashes)
+        print('Changed or new rows:', len(changed_rows), 'removed rows:', len(removed_rows))
     
-    """ Comparing languages in SAU and RSTI """
-    print('Cmparing languages in SAU and RSTI...')
-    compare_languages_in_RSTI_et_SAU(db, outfile_name='SAU_RSTI_lang_flow.csv', use_multilingual=False, ignore_langs=None)
-    compare_languages_in_RSTI_et_SAU(db, outfile_name='SAU_RSTI_lang_flow_multilingual.csv', use_multilingual=True)
-    compare_languages_in_RSTI_et_SAU(db, outfile_name='SAU_RSTI_lang_flow_multilingual_ignoreLatEtPhoe.csv', use_multilingual=True, ignore_langs=['Latin', 'Phoenician'])
+    if len(changed_rows) > 0 or len(removed_rows) > 0:
+        with measure_stage('analyse.py', 'derive row attributes', rows=len(changed_rows) + len(removed_rows), output_paths=[STATS_STATE_PATH]):
+            state = update_stats_state(state, db, row_hashes, derive_row_attributes(db.loc[changed_rows]), removed_rows)
+            save_stats_state(state, STATS_STATE_PATH)
     
-    """ General language statistics """
-    print('Doing general language statistics...')    
-    list_languages(input_db=db, outfile_name='language_statistics.csv')
-    list_languages(input_db=db, outfile_name='language_statistics_multi.csv', only_multi=True, use_multilingual=False)
+    db = pd.concat([db, state['row_attributes']], axis=1)
     
-    """ KTU genres in locations """
-    print('Analysing KTU classification in locations...')
-    list_locations_et_ktu_genres(input_db=db, outfile_name='KTU_in_locations.csv')
+    with measure_stage('analyse.py', 'find outdated reports', rows=len(db)):
+        reports = {report_name: all_reports[report_name] for report_name in (report_names or all_reports)}
+        fingerprints = get_report_fingerprints(reports, STATISTICS_CODE_HASH, db)
+        manifest = load_reports_manifest(STATS_PATH)
+        
+        reports_to_make = list(reports) if force else find_outdated_reports(reports, fingerprints, manifest, STATS_PATH)
     
-    """ General religious situation analysis """
-    print('Analysing general language situation...')
-    get_religious_texts_stats(input_db=db, outfile_name='religious_texts_in_locations.csv', detailed_relation=False)
+    if not reports_to_make:
+        print('All statistics are up to date.')
+        save_run_log(RUN_LOGS_PATH, 'analyse.py')
+        return
+    
+    print('Reports to be made:', len(reports_to_make), 'of', len(reports))
+    
+    with measure_stage('analyse.py', 'backup'):
+        make_backup_of_stats()
+    
+    with measure_stage('analyse.py', 'build findspot index and count cube', rows=len(db)):
+        findspot_index = build_findspot_index(db)
+        count_cube = count_cube_from_state(state)
+    
+    run_all_reports(db, findspot_index=findspot_index, count_cube=count_cube, report_names=reports_to_make, max_workers=max_workers)
+    
+    for report_name in reports_to_make:
+        manifest[report_name] = {'fingerprint': fingerprints[report_name], 'outputs': reports[report_name]['outputs']}
+    save_reports_manifest(manifest, STATS_PATH)
+    
+    print_run_log()
+    save_run_log(RUN_LOGS_PATH, 'analyse.py')
+
+
+def update_statistics_by_chunks(chunk_size=DEFAULT_CHUNK_SIZE, force=False, report_names=None, max_workers=None):
+    """
+    This function regenerates the statistics in STATS_PATH as update_statistics does, but the database is read by chunks of chunk_size rows and only the counts of each chunk are kept (see streaming_stats.py), so that the memory does not grow with the number of rows of the database. The state of the incremental regeneration is not used (all rows are read), but only the reports that are not up to date are made.
 
-    get_religious_texts_stats(input_db=db, outfile_name='religious_texts_in_locations_detailed.csv', detailed_relation=True)
+    Args:
+        chunk_size (int, optional): number of rows of one chunk. Defaults to DEFAULT_CHUNK_SIZE.
+        force (bool, optional): make the reports even if they are up to date. Defaults to False.
+        report_names (list, optional): names of the reports (keys of all_reports) to be considered. Defaults to None (all reports).
+        max_workers (int, optional): see run_all_reports. Defaults to None.
+    """
+    reports = {report_name: all_reports[report_name] for report_name in (report_names or all_reports)}
+    column_hashes = {column: hashlib.sha256() for column in report_input_columns(reports)}
+    cell_counts = {}
+    cluster_cell_counts = {}
+    classification_states = {}
     
-    """ Detailed religious situation analysis """
-    print('Analysing detailed language situation...')
-    get_religious_texts_detailed_stats(input_db=db, outfile_name='religious_texts_inlocs_detailed_genres.csv')
+    with measure_stage('analyse.py', 'count database by chunks') as record:
+        rows = 0
+        for chunk in read_database_chunks(UGARIT_TEXTS_DATABASE_PATH, chunk_size):
+            chunk = pd.concat([chunk, derive_row_attributes(chunk)], axis=1)
+            update_column_hashes(column_hashes, chunk)
+            add_cube_counts(cell_counts, build_count_cube(chunk))
+            
+            chunk = pd.concat([chunk, classify_cluster_genres(chunk, classification_states)], axis=1)
+            add_cube_counts(cluster_cell_counts, build_count_cube(chunk, cluster_cube_dimensions))
+            
+            rows += len(chunk)
+            print(f'{rows} rows counted', end='\r')
+        print()
+        record['rows'] = rows
     
-    """ Religious languages """
-    print('Analysing language situation of religious texts...')
-    religious_languages(input_db=db, outfile_name='religious_langs_stats.csv')
+    count_cube = cube_from_counts(cell_counts, cube_dimensions)
+    cluster_cube = cube_from_counts(cluster_cell_counts, cluster_cube_dimensions)
     
-    """ Analysis of religious texts in clusters """
-    print('Analysing religious texts in clusters...')
-    list_genres_in_cluster(input_db=db, cluster='House of the High Priest', outfile_name_prefix='cluster_stats')
-    list_genres_in_cluster(input_db=db, cluster='House of the Hurrian Priest', outfile_name_prefix='cluster_stats')
+    fingerprints = get_report_fingerprints(reports, STATISTICS_CODE_HASH, column_hashes=column_hashes)
+    manifest = load_reports_manifest(STATS_PATH)
+    reports_to_make = list(reports) if force else find_outdated_reports(reports, fingerprints, manifest, STATS_PATH)
     
-    """ Analysis of Religious texts in clusters - inner locations """
-    print('Analysing religious texts in inner locations of clusters...')
-    list_genres_detailes_in_cluster(input_db=db, outfile_name_prefix='detailed_stats')
+    if not reports_to_make:
+        print('All statistics are up to date.')
+        save_run_log(RUN_LOGS_PATH, 'analyse.py')
+        return
     
-    print()
-    input("Press Enter to finish...")
\ No newline at end of file
+    print('Reports to be made:', len(reports_to_make), 'of', len(reports))
+    
+    with measure_stage('analyse.py', 'backup'):
+        make_backup_of_stats()
+    
+    run_all_reports(None, findspot_index=None, count_cube=count_cube, report_names=reports_to_make, max_workers=max_workers, cluster_cube=cluster_cube)
+    
+    for report_name in reports_to_make:
+        manifest[report_name] = {'fingerprint': fingerprints[report_name], 'outputs': reports[report_name]['outputs']}
+    save_reports_manifest(manifest, STATS_PATH)
+    
+    print_run_log()
+    save_run_log(RUN_LOGS_PATH, 'analyse.py')
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Regenerates the statistics of the Ugarit texts database (only those that are not up to date).')
+    parser.add_argument('--full', action='store_true', help='derive the row attributes of all rows again')
+    parser.add_argument('--force', action='store_true', help='make the reports even if they are up to date')
+    parser.add_argument('--reports', nargs='+', choices=list(all_reports), metavar='REPORT', help='make only these reports (see --list)')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes running the reports (default: number of CPUs)')
+    parser.add_argument('--list', action='store_true', help='list the reports and exit')
+    parser.add_argument('--chunk-size', type=int, metavar='ROWS', help='read the database by chunks of ROWS rows, so that the memory does not grow with the size of the database (for very large databases; the state of the previous run is not used)')
+    parser.add_argument('--database', default=UGARIT_TEXTS_DATABASE_PATH, help='the database CSV file (default: UGARIT_TEXTS_DATABASE.csv next to this script)')
+    parser.add_argument('--statistics', default=STATS_PATH, help='directory of the statistics (default: STATISTICS next to this script)')
+    parser.add_argument('--profile', metavar='DIR', help='profile each stage and report, the profiles are saved to DIR')
+    parser.add_argument('--profiler', choices=['cProfile', 'pyinstrument'], default='cProfile', help='profiler used with --profile (default: %(default)s)')
+    
+    return parser.parse_args(arguments)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    
+    if arguments.list:
+        for report_name, report in all_reports.items():
+            print(f'{report_name} - {report["description"]}')
+    else:
+        UGARIT_TEXTS_DATABASE_PATH = arguments.database
+        STATS_PATH = arguments.statistics
+        STATS_STATE_PATH = os.path.join(STATS_PATH, 'STATS_STATE.pickle')
+        RUN_LOGS_PATH = os.path.join(STATS_PATH, 'RUN_LOGS')
+        os.makedirs(STATS_PATH, exist_ok=True)
+        
+        if arguments.profile:
+            configure_profiling(arguments.profile, arguments.profiler)
+        
+        if arguments.chunk_size:
+            update_statistics_by_chunks(arguments.chunk_size, force=arguments.force, report_names=arguments.reports, max_workers=arguments.workers)
+        else:
+            update_statistics(incremental=not arguments.full, force=arguments.force, report_names=arguments.reports, max_workers=arguments.workers)
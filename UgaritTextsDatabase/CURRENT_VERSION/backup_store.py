@@ -0,0 +1,198 @@
+""" This file serves to make backups into a content-addressed store: each distinct file content is stored only once (objects/<hash>), and each backup (snapshot) is only a small manifest (snapshots/<name>.json) listing the files and their hashes. Unchanged files thus cost (almost) no time and no disk space, and old snapshots are evicted by a retention policy. """
+
+import os
+import json
+import time
+import shutil
+import fnmatch
+
+from database_snapshot import hash_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# NOTE: ioctl of Linux that makes a reflink (copy on write clone) of a file on filesystems that support it (Btrfs, XFS, ...).
+FICLONE = 0x40049409
+
+# NOTE: how many snapshots are kept by prune_snapshots: the last ones, and the last one of each day and of each month.
+DEFAULT_RETENTION = {'keep_last': 10, 'keep_daily': 14, 'keep_monthly': 12}
+
+
+def object_path(store_path:str, file_hash:str)->str:
+    return os.path.join(store_path, 'objects', file_hash[:2], file_hash)
+
+
+def snapshots_path(store_path:str)->str:
+    return os.path.join(store_path, 'snapshots')
+
+
+def clone_file(source:str, destination:str):
+    """ This copies the file as a reflink where the filesystem supports it (no data are copied), otherwise as a normal copy. """
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(source, destination)
+
+
+def store_object(store_path:str, file_path:str, file_hash:str):
+    """ This saves the content of the file to the store (if it is not there already). The objects are read-only, so that they cannot be changed through their hardlinks (see restore_snapshot). """
+    destination = object_path(store_path, file_hash)
+    if os.path.exists(destination):
+        return
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temporary_path = destination + '.tmp'
+    clone_file(file_path, temporary_path)
+    os.chmod(temporary_path, 0o444)
+    os.replace(temporary_path, destination)
+
+
+def list_snapshots(store_path:str)->list:
+    """ Returns the names of the snapshots, from the oldest. """
+    if not os.path.isdir(snapshots_path(store_path)):
+        return []
+
+    return sorted(os.path.splitext(file_)[0] for file_ in os.listdir(snapshots_path(store_path)) if file_.endswith('.json'))
+
+
+def load_snapshot(store_path:str, snapshot_name:str)->dict:
+    with open(os.path.join(snapshots_path(store_path), snapshot_name + '.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def list_files(source_dirs:dict, patterns:list)->dict:
+    """ Returns the path in the snapshot (e.g., "CSV/SAU_COLLECTION.csv") --> path of the file, for the files directly in source_dirs (label --> directory) matching any of the patterns. """
+    files = {}
+    for label, source_dir in source_dirs.items():
+        if not os.path.isdir(source_dir):
+            continue
+        for file_ in sorted(os.listdir(source_dir)):
+            file_path = os.path.join(source_dir, file_)
+            if os.path.isfile(file_path) and any(fnmatch.fnmatch(file_, pattern) for pattern in patterns):
+                files[f'{label}/{file_}' if label else file_] = file_path
+
+    return files
+
+
+def make_snapshot(store_path:str, source_dirs:dict, patterns:list=['*'], retention:dict=DEFAULT_RETENTION):
+    """
+    This function makes a backup of the files into the store.
+
+    Args:
+        store_path (str): directory of the store (created if needed)
+        source_dirs (dict): label --> directory whose files are backed up (the label is the directory of the files in the snapshot; '' for none)
+        patterns (list, optional): patterns of the names of files to be backed up (e.g. ['*.csv']). Defaults to ['*'].
+        retention (dict, optional): see prune_snapshots; None keeps all snapshots. Defaults to DEFAULT_RETENTION.
+
+    Returns:
+        str: name of the snapshot (the previous one, if no file has changed since then), or None if there are no files
+    """
+    files = list_files(source_dirs, patterns)
+    if not files:
+        return None
+
+    snapshot_names = list_snapshots(store_path)
+    previous_files = load_snapshot(store_path, snapshot_names[-1])['files'] if snapshot_names else {}
+
+    snapshot_files = {}
+    for path_in_snapshot, file_path in files.items():
+        file_stat = os.stat(file_path)
+        previous_file = previous_files.get(path_in_snapshot)
+
+        # NOTE: files with the same size and modification time as in the previous snapshot are not read again.
+        if previous_file and previous_file['size'] == file_stat.st_size and previous_file['mtime_ns'] == file_stat.st_mtime_ns and os.path.exists(object_path(store_path, previous_file['sha256'])):
+            file_hash = previous_file['sha256']
+        else:
+            file_hash = hash_file(file_path)
+            store_object(store_path, file_path, file_hash)
+
+        snapshot_files[path_in_snapshot] = {'sha256': file_hash, 'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns}
+
+    if snapshot_names and {path: file_['sha256'] for path, file_ in snapshot_files.items()} == {path: file_['sha256'] for path, file_ in previous_files.items()}:
+        print('No file has changed since the backup', snapshot_names[-1])
+        return snapshot_names[-1]
+
+    # NOTE: the name is the time of the snapshot (sortable); a suffix is added if there already is a snapshot of the same second.
+    snapshot_name = time.strftime('%Y-%m-%d--%H-%M-%S', time.localtime())
+    suffix = 1
+    while snapshot_name in snapshot_names:
+        suffix += 1
+        snapshot_name = time.strftime('%Y-%m-%d--%H-%M-%S', time.localtime()) + f'_{suffix:03d}'
+
+    os.makedirs(snapshots_path(store_path), exist_ok=True)
+    manifest_path = os.path.join(snapshots_path(store_path), snapshot_name + '.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'created': time.time(), 'files': snapshot_files}, f, indent=4, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    if retention is not None:
+        prune_snapshots(store_path, **retention)
+
+    return snapshot_name
+
+
+def prune_snapshots(store_path:str, keep_last:int=10, keep_daily:int=14, keep_monthly:int=12)->list:
+    """
+    This function evicts old snapshots: the last keep_last snapshots are kept, and the last snapshot of each of the last keep_daily days and keep_monthly months (that have any snapshot). The objects no longer used by any snapshot are deleted.
+
+    Returns:
+        list: names of the deleted snapshots
+    """
+    snapshot_names = list_snapshots(store_path)
+
+    kept_snapshots = set(snapshot_names[-keep_last:]) if keep_last > 0 else set()
+    for period_length, keep_periods in [(len('YYYY-MM-DD'), keep_daily), (len('YYYY-MM'), keep_monthly)]:
+        last_in_period = {}
+        for snapshot_name in snapshot_names:
+            last_in_period[snapshot_name[:period_length]] = snapshot_name
+        kept_snapshots.update(sorted(last_in_period.values())[-keep_periods:] if keep_periods > 0 else [])
+
+    deleted_snapshots = [snapshot_name for snapshot_name in snapshot_names if snapshot_name not in kept_snapshots]
+    for snapshot_name in deleted_snapshots:
+        os.remove(os.path.join(snapshots_path(store_path), snapshot_name + '.json'))
+
+    if deleted_snapshots:
+        collect_garbage(store_path)
+
+    return deleted_snapshots
+
+
+def collect_garbage(store_path:str)->int:
+    """ This deletes the objects that are not used by any snapshot; returns their number. """
+    used_hashes = {file_['sha256'] for snapshot_name in list_snapshots(store_path) for file_ in load_snapshot(store_path, snapshot_name)['files'].values()}
+
+    deleted_objects = 0
+    objects_path = os.path.join(store_path, 'objects')
+    for prefix in os.listdir(objects_path) if os.path.isdir(objects_path) else []:
+        for file_hash in os.listdir(os.path.join(objects_path, prefix)):
+            if file_hash not in used_hashes:
+                file_path = os.path.join(objects_path, prefix, file_hash)
+                os.chmod(file_path, 0o644)
+                os.remove(file_path)
+                deleted_objects += 1
+
+    return deleted_objects
+
+
+def restore_snapshot(store_path:str, snapshot_name:str, target_dir:str, use_hardlinks:bool=False):
+    """ This restores the files of the snapshot to target_dir as copies (reflinks where the filesystem supports them, see clone_file). With use_hardlinks=True, the files are hardlinks to the objects where possible, which take no space; they are read-only and shared with the store, so they must never be written to (replace them instead). """
+    for path_in_snapshot, file_ in load_snapshot(store_path, snapshot_name)['files'].items():
+        destination = os.path.join(target_dir, *path_in_snapshot.split('/'))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if os.path.exists(destination):
+            os.remove(destination)
+
+        if use_hardlinks:
+            try:
+                os.link(object_path(store_path, file_['sha256']), destination)
+                continue
+            except OSError:
+                pass
+        clone_file(object_path(store_path, file_['sha256']), destination)
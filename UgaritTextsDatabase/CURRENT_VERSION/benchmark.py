@@ -0,0 +1,185 @@
+""" This script serves to measure how the pipeline scales: for each size, a synthetic corpus is generated (see synthetic_corpus.py) and each stage of the pipeline (merge, publish, statistics) is run on it in a separate process, whose time and peak memory are measured. The results are saved as JSON and CSV and may be compared to a previous run (regression baseline). """
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import pandas as pd
+import numpy as np
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_PATH = os.path.join(ROOT_PATH, '..', 'ARCHIVE-BEFORE_27-02-2024', 'scripts')
+MERGE_SCRIPT_PATH = os.path.join(SCRIPTS_PATH, '01_merge_SAU_et_RSTImod.py')
+PUBLISH_SCRIPT_PATH = os.path.join(SCRIPTS_PATH, '02_backup-et-publish.py')
+ANALYSE_SCRIPT_PATH = os.path.join(ROOT_PATH, 'analyse.py')
+GENERATOR_SCRIPT_PATH = os.path.join(ROOT_PATH, 'synthetic_corpus.py')
+BENCHMARKS_PATH = os.path.join(ROOT_PATH, 'BENCHMARKS')
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+# NOTE: share of rows of the database changed before the incremental run of the statistics.
+CHANGED_ROWS_SHARE = 0.01
+
+# NOTE: rows of one chunk of the statistics made by chunks (analyse.py --chunk-size), whose peak memory should not grow with the size of the corpus.
+CHUNK_SIZE = 50000
+
+
+def run_stage(command:list, cwd:str, log_path:str, stdin_text:str='')->dict:
+    """
+    This function runs the command in a separate process and measures it.
+
+    Args:
+        command (list): the command (e.g., [python, script, arguments])
+        cwd (str): working directory of the process
+        log_path (str): file for the output of the process
+        stdin_text (str, optional): input of the process (e.g., "\\n" for scripts ending with input()). Defaults to ''.
+
+    Returns:
+        dict: "seconds" (wall time), "max_rss_mb" (peak resident memory of the process; None where it cannot be measured, e.g. on Windows) and "returncode"
+    """
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.PIPE, stdout=log_file, stderr=subprocess.STDOUT, text=True)
+        process.stdin.write(stdin_text)
+        process.stdin.close()
+
+        if hasattr(os, 'wait4'):
+            pid, status, resources = os.wait4(process.pid, 0)
+            seconds = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # NOTE: ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+            max_rss_mb = resources.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        else:
+            process.wait()
+            seconds = time.perf_counter() - start
+            max_rss_mb = None
+
+    return {'seconds': round(seconds, 3), 'max_rss_mb': None if max_rss_mb is None else round(max_rss_mb, 1), 'returncode': process.returncode}
+
+
+def change_database_rows(database_path:str, share:float=CHANGED_ROWS_SHARE):
+    """ This changes the language ("UTDB Language") of the given share of rows of the database (evenly spread), to measure the incremental regeneration of the statistics. """
+    db = pd.read_csv(database_path, encoding='utf-8', delimiter=';', dtype=str, index_col=0, keep_default_na=False)
+    changed_rows = np.arange(0, len(db), max(1, round(1 / share)))
+    db.iloc[changed_rows, db.columns.get_loc('UTDB Language')] = np.roll(db['UTDB Language'].to_numpy()[changed_rows], 1)
+    db.to_csv(database_path, sep=';', encoding='utf-8')
+
+
+def pipeline_stages(corpus_dir:str, rows:int)->list:
+    """ Returns the stages of the pipeline for the corpus: (name, command, working directory, preparation run before the stage or None). """
+    python = sys.executable
+    database_path = os.path.join(corpus_dir, 'UTDB', 'UGARIT_TEXTS_DATABASE.csv')
+    stats_path = os.path.join(corpus_dir, 'UTDB', 'STATISTICS')
+    analyse_command = [python, ANALYSE_SCRIPT_PATH, '--database', database_path, '--statistics', stats_path]
+
+    def prepare_publish():
+        for directory in ['CSV', 'EXCEL']:
+            os.makedirs(os.path.join(corpus_dir, '01_CURRENT_DATABASE_FILES', directory), exist_ok=True)
+
+    return [
+        ('generate corpus', [python, GENERATOR_SCRIPT_PATH, str(rows), corpus_dir], ROOT_PATH, None),
+        ('merge (01_merge_SAU_et_RSTImod.py)', [python, MERGE_SCRIPT_PATH], corpus_dir, None),
+        ('publish (02_backup-et-publish.py)', [python, PUBLISH_SCRIPT_PATH], corpus_dir, prepare_publish),
+        ('statistics - full', analyse_command + ['--full'], corpus_dir, None),
+        ('statistics - up to date', analyse_command, corpus_dir, None),
+        (f'statistics - {CHANGED_ROWS_SHARE:.0%} rows changed', analyse_command, corpus_dir, lambda: change_database_rows(database_path)),
+        ('statistics - by chunks', analyse_command + ['--chunk-size', str(CHUNK_SIZE), '--force'], corpus_dir, None)
+    ]
+
+
+def run_benchmarks(sizes:list, stage_names:list=None, benchmarks_path:str=BENCHMARKS_PATH)->list:
+    """ This runs the stages (all, or those whose names contain any of stage_names) for each size and returns the results (one dict per size and stage). """
+    results = []
+    for rows in sizes:
+        corpus_dir = os.path.join(benchmarks_path, f'corpus_{rows}')
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        for stage_num, (stage_name, command, cwd, prepare) in enumerate(pipeline_stages(corpus_dir, rows)):
+            if stage_names and not any(name in stage_name for name in stage_names):
+                continue
+            if prepare is not None:
+                prepare()
+
+            result = run_stage(command, cwd, os.path.join(corpus_dir, f'stage_{stage_num}.log'), stdin_text='\n')
+            result = {'rows': rows, 'stage': stage_name, **result}
+            results.append(result)
+
+            print(f'{rows:>9} rows | {stage_name:<40} | {result["seconds"]:>9.2f} s | {result["max_rss_mb"]} MB' + ('' if result['returncode'] == 0 else f' | FAILED ({result["returncode"]}), see the log in {corpus_dir}'))
+
+    return results
+
+
+def environment_info()->dict:
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def save_results(results:list, output_path:str):
+    """ This saves the results as JSON (with the environment) and as CSV (output_path with .json and .csv). """
+    base_path = os.path.splitext(output_path)[0]
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(base_path + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment_info(), 'results': results}, f, indent=4)
+
+    pd.DataFrame(results).to_csv(base_path + '.csv', sep=',', encoding='utf-8', index=False)
+
+
+def compare_with_baseline(results:list, baseline_path:str, tolerance:float=0.25, min_seconds:float=0.5)->list:
+    """
+    This function compares the results with the baseline (JSON saved by save_results).
+
+    Args:
+        results (list): the current results
+        baseline_path (str): path to the JSON of the baseline
+        tolerance (float, optional): allowed relative growth of time and memory. Defaults to 0.25.
+        min_seconds (float, optional): differences of time smaller than this are ignored (noise). Defaults to 0.5.
+
+    Returns:
+        list: the regressions (descriptions)
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(result['rows'], result['stage']): result for result in json.load(f)['results']}
+
+    regressions = []
+    print()
+    print('Comparison with the baseline', baseline_path)
+    for result in results:
+        baseline_result = baseline.get((result['rows'], result['stage']))
+        if baseline_result is None:
+            continue
+
+        time_ratio = result['seconds'] / baseline_result['seconds'] if baseline_result['seconds'] else float('inf')
+        print(f'{result["rows"]:>9} rows | {result["stage"]:<40} | {baseline_result["seconds"]:>9.2f} s --> {result["seconds"]:>9.2f} s ({time_ratio:.2f}x)')
+
+        if result['returncode'] != 0 and baseline_result['returncode'] == 0:
+            regressions.append(f'{result["rows"]} rows, {result["stage"]}: failed')
+        if time_ratio > 1 + tolerance and result['seconds'] - baseline_result['seconds'] > min_seconds:
+            regressions.append(f'{result["rows"]} rows, {result["stage"]}: time {baseline_result["seconds"]} s --> {result["seconds"]} s')
+        if result['max_rss_mb'] and baseline_result['max_rss_mb'] and result['max_rss_mb'] > baseline_result['max_rss_mb'] * (1 + tolerance):
+            regressions.append(f'{result["rows"]} rows, {result["stage"]}: memory {baseline_result["max_rss_mb"]} MB --> {result["max_rss_mb"]} MB')
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measures time and memory of the stages of the pipeline on synthetic corpora of various sizes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of rows of the corpora (default: %(default)s)')
+    parser.add_argument('--stages', nargs='+', help='run only the stages whose names contain any of these words (e.g., merge statistics); the corpus must have been generated before')
+    parser.add_argument('--output', default=os.path.join(BENCHMARKS_PATH, 'benchmark_results.json'), help='results (JSON; CSV is saved next to it)')
+    parser.add_argument('--baseline', help='JSON of previous results; the run fails (exit code 1) if any stage is slower or needs more memory than the tolerance allows')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    arguments = parser.parse_args()
+
+    results = run_benchmarks(arguments.sizes, arguments.stages)
+    save_results(results, arguments.output)
+    print()
+    print('Results have been saved to', os.path.splitext(arguments.output)[0] + '.json/.csv')
+
+    failed_stages = [result for result in results if result['returncode'] != 0]
+    regressions = compare_with_baseline(results, arguments.baseline, arguments.tolerance) if arguments.baseline else []
+    for regression in regressions:
+        print('REGRESSION:', regression)
+
+    sys.exit(1 if regressions or failed_stages else 0)
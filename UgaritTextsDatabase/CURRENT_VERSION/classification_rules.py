@@ -0,0 +1,81 @@
+""" This file declares the rules that classify texts to religious genres and relations (according to the "possible relevant (religious) genres", "SAU genre" and "Clemens 2001" columns). The rules are compiled to regular expressions and applied to whole columns at once. """
+
+import re
+import numpy as np
+import pandas as pd
+
+# NOTE: each rule is (category, patterns); the first rule with any matching pattern wins. A pattern is a substring, or (substring, [substrings]) when the substring counts only if none of the other substrings is present.
+RELEVANT_GENRE_RULES = [
+    ('ritual', ['ritual', 'sacrifices', 'offerings']),
+    ('narrative', ['myth', 'epic', 'wisdom', 'literary', 'narrative']),
+    ('hymn/prayer', ['hymn', 'prayer']),
+    ('incantation/magic', ['incantation', 'magic', 'medical']),
+    ('divination', ['omen', 'divination', 'oracular', 'divinatiory'])
+]
+
+SAU_GENRE_RULES = [
+    ('divination', ['D', ('liv', ['Diri'])]),
+    ('incantation/magic', ['M', 'Lam', ('Med', ['Mat', 'Mea'])]),
+    ('narrative', ['Lit']),
+    ('other religious', ['Rel', ('G', ['RSGT'])])
+]
+
+# NOTE: relation rules are matched against the whole value of the "Clemens 2001" column.
+RELATION_RULES = [
+    ('related', ['PRAVDA', 'ADD TRUE']),
+    ('probably related', ['PROBABLY TRUE']),
+    ('possibly related', ['POSSIBLY TRUE']),
+    ('uncertain relation', ['UNCERTAIN']),
+    ('probably not related', ['PROBABLY FALSE'])
+]
+
+
+def compile_pattern(pattern, whole_value:bool)->str:
+    if whole_value:
+        return re.escape(pattern)
+
+    if isinstance(pattern, str):
+        return re.escape(pattern)
+
+    substring, excluded_substrings = pattern
+    return f'^(?!.*(?:{"|".join(map(re.escape, excluded_substrings))})).*?{re.escape(substring)}'
+
+
+def compile_rules(rules:list, whole_value:bool=False)->list:
+    """ This compiles each rule to one regular expression (alternation of its patterns). With whole_value, the patterns must match the whole value; otherwise, they are searched for anywhere in the value. """
+    compiled_rules = []
+    for category, patterns in rules:
+        alternation = '|'.join(f'(?:{compile_pattern(pattern, whole_value)})' for pattern in patterns)
+        if whole_value:
+            alternation = rf'\A(?:{alternation})\Z'
+        compiled_rules.append((category, re.compile(alternation, re.DOTALL)))
+
+    return compiled_rules
+
+
+compiled_relevant_genre_rules = compile_rules(RELEVANT_GENRE_RULES)
+compiled_sau_genre_rules = compile_rules(SAU_GENRE_RULES)
+compiled_relation_rules = compile_rules(RELATION_RULES, whole_value=True)
+
+
+def classify_value(value, compiled_rules:list):
+    """ This classifies one value (returns None when no rule fits or the value is empty). """
+    if type(value) != str:
+        return None
+
+    for category, regex in compiled_rules:
+        if regex.search(value):
+            return category
+
+    return None
+
+
+def classify_column(column:pd.core.series.Series, compiled_rules:list)->pd.core.series.Series:
+    """ This classifies the whole column, one vectorised regex test per rule. Rows that fit no rule (and empty rows) get None. """
+    rule_matches = []
+    for category, regex in compiled_rules:
+        rule_matches.append(column.str.contains(regex).fillna(False).to_numpy(dtype=bool))
+
+    categories = np.array([category for category, regex in compiled_rules], dtype=object)
+
+    return pd.Series(np.select(rule_matches, categories, default=None), index=column.index, dtype=object)
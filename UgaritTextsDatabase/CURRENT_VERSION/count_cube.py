@@ -0,0 +1,59 @@
+""" This file serves to count the texts once over all dimensions used by the statistics (area, languages, KTU category, religious genre, relation, source, ...). The individual statistics are then slices and roll-ups of this count cube, i.e., they only sum up its cells instead of going through all rows of the database. """
+
+import pandas as pd
+
+# NOTE: derived columns of the rows (see derive_row_attributes in analyse.py) that form the dimensions of the cube.
+cube_dimensions = [
+    'general_area',
+    'languages_utdb',
+    'languages_utdb_multilingual',
+    'languages_rsti',
+    'languages_rsti_multilingual',
+    'languages_sau',
+    'languages_sau_multilingual',
+    'has_excavation_siglum',
+    'has_ktu',
+    'ktu_category',
+    'possible_relevant_genre',
+    'genre_by_sau',
+    'religious_genre',
+    'relational_category',
+    'relation_category',
+    'source'
+]
+
+
+def build_count_cube(db:pd.core.frame.DataFrame, dimensions:list=cube_dimensions)->pd.core.series.Series:
+    """
+    This function counts the rows of db by all combinations of values of the dimensions (in one groupby pass). Only combinations that occur are kept, so the cube never has more cells than db has rows.
+
+    Returns:
+        pd.core.series.Series: counts indexed by the combinations of values (MultiIndex named by the dimensions), in the order of the first row of each combination; empty values are kept as NaN
+    """
+    return db.groupby(dimensions, sort=False, observed=True, dropna=False).size()
+
+
+def slice_cube(cube:pd.core.series.Series, **selection)->pd.core.series.Series:
+    """ Returns the cells of the cube with the selected values, e.g. slice_cube(cube, general_area='Royal Palace', has_ktu=True); a list (or set) selects any of its values. """
+    mask = pd.Series(True, index=cube.index)
+    for dimension, value in selection.items():
+        dimension_values = cube.index.get_level_values(dimension)
+        if isinstance(value, (list, tuple, set)):
+            mask &= dimension_values.isin(value)
+        else:
+            mask &= dimension_values == value
+
+    return cube[mask.to_numpy()]
+
+
+def rollup(cube:pd.core.series.Series, *dimensions)->pd.core.series.Series:
+    """ This sums the cube over all dimensions except the given ones (in the order of the first row of each combination, as counting the rows would give). """
+    return cube.groupby(level=list(dimensions), sort=False, observed=True, dropna=False).sum()
+
+
+def cube_cells(cube:pd.core.series.Series)->pd.core.frame.DataFrame:
+    """ Returns the cells of the cube as a dataframe: one column per dimension and the "count" column. """
+    cells = cube.index.to_frame(index=False)
+    cells['count'] = cube.to_numpy()
+
+    return cells
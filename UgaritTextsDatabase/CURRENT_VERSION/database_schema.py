@@ -0,0 +1,186 @@
+""" This file declares the columns of the database files and their types, and serves to load the database with these types (and to check the columns of incoming CSV files). """
+
+import json
+import hashlib
+import pandas as pd
+
+from excavation_numbers import decode_ex_nums
+from database_snapshot import load_database
+
+# NOTE: types of the columns:
+#   CATEGORY - few distinct values repeated in many rows (areas, languages, genres, ...), loaded as pandas categorical
+#   STRING - free text, loaded as strings (empty cells are np.nan)
+#   EX_NUMS - list of excavation numbers saved in one cell (see excavation_numbers.py), loaded as strings; use decode_ex_nums or explode_ex_nums to get the lists
+CATEGORY = 'category'
+STRING = 'string'
+EX_NUMS = 'excavation numbers'
+
+UGARIT_TEXTS_DATABASE_SCHEMA = {
+    'Excavation Siglum': CATEGORY,
+    'Excavation Numbers "Cleared"': EX_NUMS,
+    'Excavation Numbers UTDB': EX_NUMS,
+    'Excavation Numbers SAU': STRING,
+    'KTU3': STRING,
+    'SAU Biblio (not full!!)': STRING,
+    'UTDB Language': CATEGORY,
+    'RSTI Language': CATEGORY,
+    'RSTI Script': CATEGORY,
+    'Script (prev)': CATEGORY,
+    'Language (prev)': CATEGORY,
+    'SAU Script': CATEGORY,
+    'SAU Language': CATEGORY,
+    'SAU Script et Language': CATEGORY,
+    'SAU genre': CATEGORY,
+    'RSTI object type': CATEGORY,
+    'RSTI description': STRING,
+    'Archive/General area': CATEGORY,
+    'SAU Archive/General area': CATEGORY,
+    'Detail in General': CATEGORY,
+    'SAU Detail in General': CATEGORY,
+    'SAU findspot': CATEGORY,
+    'possible relevant (religious) genres': CATEGORY,
+    '"Clemens 2001"': CATEGORY,
+    'Clemens Type': CATEGORY,
+    'Clemens Note': STRING,
+    'Seal': CATEGORY,
+    'Size': STRING,
+    'Museal Siglum': STRING,
+    'SAU Museal Siglum': STRING,
+    'TEO findspot': STRING,
+    'Topographic Point': STRING,
+    'SAU p.t.': STRING,
+    'Depth': CATEGORY,
+    'SAU Depth': CATEGORY,
+    'Note': STRING
+}
+
+# NOTE: layout of one entry of the database made by 01_merge_SAU_et_RSTImod.py (in the ARCHIVE-BEFORE_27-02-2024).
+MERGED_ENTRY_SCHEMA = {
+    'Excavation Siglum': CATEGORY,
+    'Excavation Numbers "Cleared"': EX_NUMS,
+    'Excavation Numbers UTDB (+-RSTI)': EX_NUMS,
+    'Excavation Numbers SAU': STRING,
+    'KTU3': STRING,
+    'SAU Biblio (not full!!)': STRING,
+    'Script': CATEGORY,
+    'Language': CATEGORY,
+    'SAU Script': CATEGORY,
+    'SAU Language': CATEGORY,
+    'SAU Script et Language': CATEGORY,
+    'SAU genre': CATEGORY,
+    'RSTI object type': CATEGORY,
+    'RSTI description': STRING,
+    'Archive/General area': CATEGORY,
+    'SAU Archive/General area': CATEGORY,
+    'Detail in General': CATEGORY,
+    'SAU Detail in General': CATEGORY,
+    'SAU findspot': CATEGORY,
+    'possible relevant (religious) genres': CATEGORY,
+    '"Clemens 2001"': CATEGORY,
+    'Clemens Type': CATEGORY,
+    'Clemens Note': STRING,
+    'Seal': CATEGORY,
+    'Size': STRING,
+    'Museal Siglum': STRING,
+    'SAU Museal Siglum': STRING,
+    'TEO findspot': STRING,
+    'Topographic Point': STRING,
+    'SAU p.t.': STRING,
+    'Depth': CATEGORY,
+    'SAU Depth': CATEGORY,
+    'Note': STRING,
+    'Merged Entries': EX_NUMS
+}
+
+# NOTE: input files of the merge.
+SAU_COLLECTION_SCHEMA = {
+    'RS': STRING,
+    'archive/general area': CATEGORY,
+    'detail in general': CATEGORY,
+    'loc': CATEGORY,
+    'pt': STRING,
+    'depth': CATEGORY,
+    'script': CATEGORY,
+    'genre': CATEGORY,
+    'date': CATEGORY,
+    'scribe': CATEGORY,
+    'origin': CATEGORY,
+    'bibliography': STRING,
+    'museal sig': STRING,
+    'col': CATEGORY
+}
+
+RSTI_MODIFIED_SCHEMA = {
+    'Excavation Siglum': CATEGORY,
+    'Excavation Numbers': EX_NUMS,
+    'Clemens 2001': CATEGORY,
+    'Clemens 2001 type': CATEGORY,
+    'Clemens note': STRING,
+    'Description': STRING,
+    'Genre': CATEGORY,
+    'Object Type': CATEGORY,
+    'Museum Number': STRING,
+    'Archive/General area': CATEGORY,
+    'detail in general': CATEGORY,
+    'Full TEO Findspot': STRING,
+    'Topographic Point': STRING,
+    'Find Depth': CATEGORY,
+    'Associated Text': STRING,
+    'Script': CATEGORY,
+    'Language': CATEGORY,
+    'Size': STRING,
+    'KTU3': STRING,
+    'possible relevant (religious) genres': CATEGORY,
+    'seal': CATEGORY,
+    'note': STRING
+}
+
+
+def validate_columns(df:pd.core.frame.DataFrame, schema:dict, source_name:str):
+    """
+    This function checks that the dataframe has all columns declared in the schema and that the excavation numbers in EX_NUMS columns can be decoded. Columns that are not declared are only reported.
+
+    Args:
+        df (pd.core.frame.DataFrame): the loaded CSV file
+        schema (dict): column --> type (see above)
+        source_name (str): name of the file used in the messages
+
+    Raises:
+        ValueError: when some declared column is missing or the excavation numbers cannot be decoded
+    """
+    missing_columns = [column for column in schema if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f'{source_name} is missing the columns: {missing_columns}')
+
+    undeclared_columns = [column for column in df.columns if column not in schema]
+    if undeclared_columns:
+        print(f'NOTE: {source_name} has columns that are not in its schema: {undeclared_columns}')
+
+    for column, column_type in schema.items():
+        if column_type != EX_NUMS:
+            continue
+        for ex_nums in df[column].dropna().unique():
+            try:
+                decode_ex_nums(ex_nums)
+            except ValueError as e:
+                raise ValueError(f'{source_name}, column {column}: {e}') from e
+
+
+def apply_schema(df:pd.core.frame.DataFrame, schema:dict, source_name:str)->pd.core.frame.DataFrame:
+    """ This validates the dataframe (see validate_columns) and returns it with CATEGORY columns converted to pandas categoricals. """
+    validate_columns(df, schema, source_name)
+
+    categorical_columns = [column for column, column_type in schema.items() if column_type == CATEGORY]
+
+    return df.astype(dict.fromkeys(categorical_columns, 'category'))
+
+
+def hash_schema(schema:dict)->str:
+    return hashlib.sha256(json.dumps(list(schema.items())).encode('utf-8')).hexdigest()
+
+
+def load_typed_database(csv_path:str, schema:dict=UGARIT_TEXTS_DATABASE_SCHEMA, use_snapshot:bool=True)->pd.core.frame.DataFrame:
+    """ This loads the database CSV (through its snapshot, see database_snapshot.py) as apply_schema returns it. The snapshot keeps the categorical columns and remembers the schemas it was validated with, so the CSV is validated and categorised only when its snapshot is made (or the schema changes), not on every load. """
+    categorical_columns = [column for column, column_type in schema.items() if column_type == CATEGORY]
+
+    return load_database(csv_path, use_snapshot=use_snapshot, categorical_columns=categorical_columns, validate=lambda df: validate_columns(df, schema, csv_path), validation_key=hash_schema(schema))
@@ -0,0 +1,235 @@
+""" This file serves to load UGARIT_TEXTS_DATABASE.csv through a columnar snapshot saved next to it, so that the CSV does not have to be parsed on every run. The CSV stays the source of truth: the snapshot is rebuilt whenever the CSV changes. All columns are saved as categoricals (codes pointing to the sorted distinct values), so the categorical columns of the schema (see database_schema.py) are loaded without converting the strings again. """
+
+import os
+import io
+import json
+import hashlib
+import importlib.util
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT = 'feather' if importlib.util.find_spec('pyarrow') else 'npy'
+
+# NOTE: change this when the structure of the snapshot changes, older snapshots are then rebuilt.
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_paths(csv_path:str)->dict:
+    """ The snapshot consists of the data file (with the "npy" format, the codes are saved apart from the categories, so that they can be memory-mapped) and of the manifest (json) with the key of the CSV it was made from. """
+    base_path = os.path.splitext(csv_path)[0]
+    if SNAPSHOT_FORMAT == 'feather':
+        return {'data': f'{base_path}.snapshot.feather', 'manifest': f'{base_path}.snapshot.json'}
+    return {'data': f'{base_path}.snapshot.codes.npy', 'categories': f'{base_path}.snapshot.categories.npz', 'manifest': f'{base_path}.snapshot.json'}
+
+
+def hash_file(path:str, block_size:int=1 << 20)->str:
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def read_database_csv(csv_path:str)->pd.DataFrame:
+    return pd.read_csv(csv_path, encoding='utf-8', delimiter=';', dtype=str, index_col=0)
+
+
+def read_database_csv_with_key(csv_path:str)->tuple:
+    """ This parses the CSV as read_database_csv does and returns it with its key (see csv_key) computed from the very bytes that were parsed, so that a change of the file during the parsing cannot be missed. """
+    with open(csv_path, 'rb') as f:
+        csv_stat = os.fstat(f.fileno())
+        csv_bytes = f.read()
+
+    return read_database_csv(io.BytesIO(csv_bytes)), csv_key(csv_path, content_hash=hashlib.sha256(csv_bytes).hexdigest(), csv_stat=csv_stat)
+
+
+def to_string_frame(columns:dict, index:np.ndarray, index_name)->pd.DataFrame:
+    """ This builds the dataframe from object arrays (strings and np.nan), so that it has the same dtypes as read_database_csv (pd.read_csv with dtype=str). """
+    return pd.DataFrame(columns, index=pd.Index(index, dtype=object, name=index_name).astype(str))
+
+
+def to_typed_frame(columns:dict, index:np.ndarray, index_name, categorical_columns:list)->pd.DataFrame:
+    """ This builds the dataframe from the columns of the snapshot (pandas categoricals), so that it has the same dtypes as read_database_csv: the categorical_columns are kept as they are and the other columns are converted to strings (np.nan in empty cells). """
+    string_columns = {column: np.asarray(values.astype(object)) for column, values in columns.items() if column not in categorical_columns}
+    typed_df = to_string_frame(string_columns, np.asarray(index.astype(object)), index_name)
+    for column in categorical_columns:
+        typed_df[column] = columns[column]
+
+    return typed_df[list(columns)]
+
+
+def save_npy_snapshot(df:pd.DataFrame, paths:dict):
+    """ The index and the columns are saved as codes (int32 matrix, -1 for empty cells; column-major, so that each column is contiguous in the memory-mapped file) pointing to the categories (sorted distinct values) of each column. All categories are saved as one UTF-8 text with the offsets of the individual strings, so no pickling is needed to load them. """
+    all_codes = []
+    all_categories = []
+    column_starts = [0]
+    for values in [pd.Series(df.index)] + [df[column] for column in df.columns]:
+        codes, categories = pd.factorize(values, sort=True, use_na_sentinel=True)
+        all_codes.append(codes.astype(np.int32))
+        all_categories.extend(categories)
+        column_starts.append(len(all_categories))
+
+    string_offsets = np.cumsum([0] + [len(category) for category in all_categories])
+
+    with open(paths['data'], 'wb') as f:
+        np.save(f, np.asfortranarray(np.column_stack(all_codes)))
+    with open(paths['categories'], 'wb') as f:
+        np.savez(f, column_starts=np.array(column_starts, dtype=np.int64), string_offsets=string_offsets.astype(np.int64), text=np.frombuffer(''.join(all_categories).encode('utf-8'), dtype=np.uint8))
+
+
+def load_npy_snapshot(paths:dict, columns:list, index_name, categorical_columns:list)->pd.DataFrame:
+    codes = np.load(paths['data'], mmap_mode='r', allow_pickle=False)
+    with np.load(paths['categories'], allow_pickle=False) as snapshot:
+        column_starts = snapshot['column_starts'].tolist()
+        string_offsets = snapshot['string_offsets'].tolist()
+        text = snapshot['text'].tobytes().decode('utf-8')
+
+    all_categories = [text[start:end] for start, end in zip(string_offsets[:-1], string_offsets[1:])]
+
+    decoded_columns = []
+    for col_num in range(codes.shape[1]):
+        decoded_columns.append(pd.Categorical.from_codes(codes[:, col_num], categories=all_categories[column_starts[col_num]:column_starts[col_num + 1]]))
+
+    return to_typed_frame(dict(zip(columns, decoded_columns[1:])), decoded_columns[0], index_name, categorical_columns)
+
+
+def save_feather_snapshot(df:pd.DataFrame, paths:dict):
+    categorical_df = df.astype('category').reset_index(drop=True)
+    categorical_df.columns = [str(col_num) for col_num in range(len(df.columns))]
+    categorical_df['index'] = pd.Categorical(np.asarray(df.index, dtype=str))
+    categorical_df.to_feather(paths['data'])
+
+
+def load_feather_snapshot(paths:dict, columns:list, index_name, categorical_columns:list)->pd.DataFrame:
+    snapshot = pd.read_feather(paths['data'], memory_map=True)
+    snapshot_columns = {column: snapshot[str(col_num)].array for col_num, column in enumerate(columns)}
+
+    return to_typed_frame(snapshot_columns, snapshot['index'].array, index_name, categorical_columns)
+
+
+def csv_key(csv_path:str, content_hash:str=None, csv_stat:os.stat_result=None)->dict:
+    if csv_stat is None:
+        csv_stat = os.stat(csv_path)
+    return {
+        'mtime_ns': csv_stat.st_mtime_ns,
+        'size': csv_stat.st_size,
+        'sha256': content_hash if content_hash else hash_file(csv_path)
+    }
+
+
+def read_manifest(manifest_path:str):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest_path:str, manifest:dict):
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+
+def csv_matches_key(csv_path:str, key)->bool:
+    """ Returns True if the CSV has the content described by key (see csv_key), e.g. the CSV a snapshot or an index was made from. The CSV is hashed only if its mtime or size differ from the key. """
+    if not key:
+        return False
+
+    csv_stat = os.stat(csv_path)
+    if csv_stat.st_mtime_ns == key['mtime_ns'] and csv_stat.st_size == key['size']:
+        return True
+
+    return csv_stat.st_size == key['size'] and hash_file(csv_path) == key['sha256']
+
+
+def snapshot_is_valid(csv_path:str, manifest, manifest_path:str)->bool:
+    """ The snapshot is valid, if it was made from the CSV with the same content (see csv_matches_key); if only the mtime of the CSV changed, the new mtime is saved to the manifest. """
+    if not manifest or manifest.get('version') != SNAPSHOT_VERSION or manifest.get('format') != SNAPSHOT_FORMAT:
+        return False
+
+    if not csv_matches_key(csv_path, manifest['csv']):
+        return False
+
+    if os.stat(csv_path).st_mtime_ns != manifest['csv']['mtime_ns']:
+        manifest['csv'] = csv_key(csv_path, content_hash=manifest['csv']['sha256'])
+        try:
+            write_manifest(manifest_path, manifest)
+        except OSError:
+            pass
+
+    return True
+
+
+def save_snapshot(df:pd.DataFrame, csv_path:str, file_key:dict, validation_keys:list):
+    """ This saves the snapshot of the dataframe read from csv_path (file_key is the key of the bytes it was parsed from, see read_database_csv_with_key). The manifest is written last, so that an interrupted write leaves no valid snapshot. """
+    paths = snapshot_paths(csv_path)
+
+    if os.path.exists(paths['manifest']):
+        os.remove(paths['manifest'])
+
+    if SNAPSHOT_FORMAT == 'feather':
+        save_feather_snapshot(df, paths)
+    else:
+        save_npy_snapshot(df, paths)
+
+    write_manifest(paths['manifest'], {
+        'version': SNAPSHOT_VERSION,
+        'format': SNAPSHOT_FORMAT,
+        'csv': file_key,
+        'columns': list(df.columns),
+        'index_name': df.index.name,
+        'validated': validation_keys
+    })
+
+
+def load_database(csv_path:str, use_snapshot:bool=True, categorical_columns:list=(), validate=None, validation_key:str=None)->pd.DataFrame:
+    """
+    This function loads the database as pd.read_csv(csv_path, delimiter=';', dtype=str, index_col=0) would do, but it uses the snapshot of the CSV if there is a valid one (and makes it if there is none).
+
+    Args:
+        csv_path (str): path to the CSV file (e.g., UGARIT_TEXTS_DATABASE.csv)
+        use_snapshot (bool, optional): if False, the CSV is parsed and no snapshot is used or made. Defaults to True.
+        categorical_columns (list, optional): columns returned as pandas categoricals (with sorted categories, as .astype('category') makes them). Defaults to ().
+        validate (function, optional): check of the loaded dataframe (raising ValueError, e.g., validate_columns in database_schema.py); it is called only if the snapshot has not been validated with validation_key yet (the keys are saved in the manifest). Defaults to None.
+        validation_key (str, optional): identifies the check (e.g., hash of the schema). Defaults to None.
+
+    Returns:
+        pd.DataFrame: the database with string columns (empty cells are np.nan) and with the categorical_columns
+    """
+    if not use_snapshot:
+        df = read_database_csv(csv_path)
+        if validate:
+            validate(df)
+        return df.astype(dict.fromkeys(categorical_columns, 'category'))
+
+    paths = snapshot_paths(csv_path)
+    manifest = read_manifest(paths['manifest'])
+
+    if all(os.path.exists(path) for path in paths.values()) and snapshot_is_valid(csv_path, manifest, paths['manifest']):
+        try:
+            if SNAPSHOT_FORMAT == 'feather':
+                df = load_feather_snapshot(paths, manifest['columns'], manifest['index_name'], categorical_columns)
+            else:
+                df = load_npy_snapshot(paths, manifest['columns'], manifest['index_name'], categorical_columns)
+        except (OSError, KeyError, ValueError) as e:
+            print('The snapshot of the database could not be loaded, the CSV file is used instead:', e)
+        else:
+            if validate and validation_key not in manifest['validated']:
+                validate(df)
+                manifest['validated'].append(validation_key)
+                try:
+                    write_manifest(paths['manifest'], manifest)
+                except OSError:
+                    pass
+            return df
+
+    df, file_key = read_database_csv_with_key(csv_path)
+    if validate:
+        validate(df)
+
+    try:
+        save_snapshot(df, csv_path, file_key, [validation_key] if validate else [])
+    except OSError as e:
+        print('The snapshot of the database could not be saved:', e)
+
+    return df.astype(dict.fromkeys(categorical_columns, 'category'))
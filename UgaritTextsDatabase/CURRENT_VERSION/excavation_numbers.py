@@ -0,0 +1,176 @@
+""" This file serves to encode and decode multi-valued excavation number fields (e.g., 'Excavation Numbers "Cleared"') without the use of eval(). """
+
+import numpy as np
+import pandas as pd
+
+# NOTE: excavation numbers are saved as one string with a fixed delimiter (e.g., "1957.3#Varia11"); the delimiter and the escape character are escaped by a backslash when they appear in the number itself.
+EX_NUM_DELIMITER = '#'
+EX_NUM_ESCAPE = '\\'
+
+# NOTE: pandas reads these strings as empty cells, so the encoder escapes their first character (e.g., "\None"); the same is done for strings that would be read as a python list (e.g., "\['x']", see is_list_repr).
+csv_na_strings = {'-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+# NOTE: older files (RSTI_MODIFIED.csv and the published UGARIT_TEXTS_DATABASE.csv) store the numbers as python lists, e.g. "['1957.3', 'Varia11']".
+simple_escapes = {'\\': '\\', "'": "'", '"': '"', 'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+hex_escapes = {'x': 2, 'u': 4, 'U': 8}
+
+
+def encode_ex_nums(ex_nums:list):
+    """ This encodes a list of excavation numbers to one string (empty list is encoded as np.nan, i.e., an empty cell). """
+    if not ex_nums:
+        return np.nan
+
+    encoded_nums = []
+    for ex_num in ex_nums:
+        if EX_NUM_ESCAPE in ex_num or EX_NUM_DELIMITER in ex_num:
+            ex_num = ex_num.replace(EX_NUM_ESCAPE, EX_NUM_ESCAPE + EX_NUM_ESCAPE).replace(EX_NUM_DELIMITER, EX_NUM_ESCAPE + EX_NUM_DELIMITER)
+        encoded_nums.append(ex_num)
+
+    encoded = EX_NUM_DELIMITER.join(encoded_nums)
+    if encoded in csv_na_strings or is_list_repr(encoded):
+        encoded = EX_NUM_ESCAPE + encoded
+
+    return encoded
+
+
+def iter_delimited_ex_nums(encoded:str):
+    """ Streaming parser of the delimited format, yields individual excavation numbers. """
+    if EX_NUM_ESCAPE not in encoded:
+        yield from encoded.split(EX_NUM_DELIMITER)
+        return
+
+    ex_num = []
+    chars = iter(encoded)
+    for char in chars:
+        if char == EX_NUM_ESCAPE:
+            ex_num.append(next(chars, EX_NUM_ESCAPE))
+        elif char == EX_NUM_DELIMITER:
+            yield ''.join(ex_num)
+            ex_num = []
+        else:
+            ex_num.append(char)
+
+    yield ''.join(ex_num)
+
+
+def iter_list_repr_ex_nums(list_repr:str):
+    """ Streaming parser of python list of strings (as saved by older versions of the scripts), yields individual excavation numbers. Adjacent string literals are joined as python does. """
+    position = 0
+    length = len(list_repr)
+
+    def skip_spaces(position):
+        while position < length and list_repr[position].isspace():
+            position += 1
+        return position
+
+    def check_end_of_list(position):
+        if skip_spaces(position + 1) != length:
+            raise ValueError(f'Not a list of excavation numbers: {list_repr}')
+
+    position = skip_spaces(position)
+    if position >= length or list_repr[position] != '[':
+        raise ValueError(f'Not a list of excavation numbers: {list_repr}')
+    position = skip_spaces(position + 1)
+
+    if position < length and list_repr[position] == ']':
+        check_end_of_list(position)
+        return
+
+    while True:
+        ex_num = []
+        literals_read = 0
+
+        # NOTE: one item may consist of more adjacent string literals (e.g., "'20.211B' '20.185E'").
+        while position < length and list_repr[position] in '\'"':
+            quote = list_repr[position]
+            position += 1
+            while position < length and list_repr[position] != quote:
+                char = list_repr[position]
+                if char == '\\':
+                    escape = list_repr[position + 1 : position + 2]
+                    if escape in simple_escapes:
+                        ex_num.append(simple_escapes[escape])
+                        position += 2
+                    elif escape in hex_escapes:
+                        hex_length = hex_escapes[escape]
+                        ex_num.append(chr(int(list_repr[position + 2 : position + 2 + hex_length], 16)))
+                        position += 2 + hex_length
+                    else:
+                        ex_num.append(char)
+                        position += 1
+                else:
+                    ex_num.append(char)
+                    position += 1
+
+            if position >= length:
+                raise ValueError(f'Unterminated excavation number in: {list_repr}')
+            position = skip_spaces(position + 1)
+            literals_read += 1
+
+        if not literals_read:
+            raise ValueError(f'Not a list of excavation numbers: {list_repr}')
+
+        yield ''.join(ex_num)
+
+        if position < length and list_repr[position] == ',':
+            position = skip_spaces(position + 1)
+            if position < length and list_repr[position] == ']':
+                check_end_of_list(position)
+                return
+        elif position < length and list_repr[position] == ']':
+            check_end_of_list(position)
+            return
+        else:
+            raise ValueError(f'Not a list of excavation numbers: {list_repr}')
+
+
+def is_list_repr(encoded:str)->bool:
+    """ Python lists of strings start with "[" followed by a quote (or are empty); excavation numbers in the delimited format may start with "[" too (e.g., "[Varia1]"). """
+    stripped = encoded.strip()
+    if not stripped.startswith('[') or not stripped.endswith(']'):
+        return False
+
+    inner = stripped[1:-1].strip()
+    return inner == '' or inner[0] in '\'"'
+
+
+def decode_ex_nums(encoded)->list:
+    """ This decodes one cell with excavation numbers (in the delimited format or as a python list) to a list. Empty cells give an empty list. """
+    if type(encoded) != str:
+        return []
+
+    if is_list_repr(encoded):
+        return list(iter_list_repr_ex_nums(encoded))
+    else:
+        return list(iter_delimited_ex_nums(encoded))
+
+
+def explode_ex_nums(encoded_column:pd.core.series.Series)->pd.core.series.Series:
+    """
+    This decodes the whole column with excavation numbers to a columnar representation: one excavation number per item, indexed by the index of the row it belongs to.
+
+    Args:
+        encoded_column (pd.core.series.Series): column with encoded excavation numbers (e.g., 'Excavation Numbers "Cleared"')
+
+    Returns:
+        pd.core.series.Series: series of excavation numbers, the index is repeated for rows with more numbers; rows without numbers are left out
+    """
+    decoded_cells = [decode_ex_nums(encoded) for encoded in encoded_column]
+    row_lengths = [len(ex_nums) for ex_nums in decoded_cells]
+
+    return pd.Series([ex_num for ex_nums in decoded_cells for ex_num in ex_nums], index=np.repeat(encoded_column.index, row_lengths), dtype=object, name=encoded_column.name)
+
+
+if __name__ == '__main__':
+    # NOTE: round-trip check of the encoder and the decoder on numbers that look like the python lists, the delimiter, escapes or empty cells.
+    round_trip_cases = [["['x']"], ['["q"]'], ["['a", "b']"], ['[]'], [' []'], ['[Varia1]'], ['1957.3', 'Varia11'], ['20.161#26', 'a\\b'], ['None'], ['', '']]
+    for ex_nums in round_trip_cases:
+        decoded = decode_ex_nums(encode_ex_nums(ex_nums))
+        if decoded != ex_nums:
+            raise AssertionError(f'{ex_nums} was decoded as {decoded} (encoded: {encode_ex_nums(ex_nums)})')
+
+        exploded = explode_ex_nums(pd.Series([encode_ex_nums(ex_nums), np.nan], index=[7, 7]))
+        if exploded.tolist() != ex_nums or exploded.index.tolist() != [7] * len(ex_nums):
+            raise AssertionError(f'{ex_nums} was exploded as {exploded.tolist()}')
+
+    print(f'All {len(round_trip_cases)} lists of excavation numbers were decoded as encoded.')
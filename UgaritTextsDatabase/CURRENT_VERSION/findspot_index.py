@@ -0,0 +1,63 @@
+""" This file serves to index the texts by their location: general area --> detail in the area --> findspot --> topographic point. Each node of this hierarchy points to the positions of its rows, so that the texts of one cluster (or of one room in the cluster) are selected without scanning the whole database. """
+
+import numpy as np
+import pandas as pd
+
+# NOTE: derived columns with the effective location of each row (see derive_row_attributes in analyse.py), from the broadest to the narrowest.
+location_levels = ['general_area', 'detail_in_cluster', 'findspot', 'topographic_point']
+
+
+def build_findspot_index(db:pd.core.frame.DataFrame, levels:list=location_levels)->dict:
+    """
+    This function builds the index of the location hierarchy.
+
+    Args:
+        db (pd.core.frame.DataFrame): dataframe with the columns in levels (the positions in the index are positions of its rows)
+        levels (list, optional): columns of the hierarchy, from the broadest. Defaults to location_levels.
+
+    Returns:
+        dict: path (tuple of values, e.g. ('Royal Palace', 'Central archive')) --> np.array of row positions in db (in the order of the rows); the empty path () points to all rows
+    """
+    findspot_index = {(): np.arange(len(db))}
+
+    level_codes = []
+    level_values = []
+    for level in levels:
+        codes, values = pd.factorize(db[level])
+        level_codes.append(codes)
+        level_values.append(values)
+
+    for depth in range(1, len(levels) + 1):
+        # NOTE: rows are grouped by the combination of codes of all levels up to this depth; a stable sort keeps the positions ordered within each node.
+        node_codes = np.ravel_multi_index([codes + 1 for codes in level_codes[:depth]], [len(values) + 1 for values in level_values[:depth]])
+        order = np.argsort(node_codes, kind='stable')
+        sorted_codes = node_codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+
+        for positions in np.split(order, boundaries):
+            if len(positions) == 0:
+                continue
+            first_row = positions[0]
+            path = tuple(level_values[level_num][level_codes[level_num][first_row]] if level_codes[level_num][first_row] >= 0 else np.nan for level_num in range(depth))
+            findspot_index[path] = positions
+
+    return findspot_index
+
+
+def find_positions(findspot_index:dict, *path)->np.ndarray:
+    """ Returns the row positions of the location given by path (e.g., find_positions(index, 'House of the High Priest', 'Other/unknown')); empty array for unknown locations. """
+    return findspot_index.get(tuple(path), np.array([], dtype=np.intp))
+
+
+def select_location(db:pd.core.frame.DataFrame, findspot_index:dict, *path)->pd.core.frame.DataFrame:
+    """ Returns the rows of db in the location given by path (the index must have been built from db). """
+    return db.iloc[find_positions(findspot_index, *path)]
+
+
+def list_sublocations(findspot_index:dict, *path)->list:
+    """ Returns the names of the locations directly under path (in the order of their first row). """
+    depth = len(path) + 1
+    sublocations = [(positions[0], node[-1]) for node, positions in findspot_index.items() if len(node) == depth and node[:-1] == tuple(path)]
+    sublocations.sort(key=lambda sublocation: sublocation[0])
+
+    return [name for first_row, name in sublocations]
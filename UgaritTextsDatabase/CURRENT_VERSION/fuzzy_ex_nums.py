@@ -0,0 +1,162 @@
+""" This file serves to find excavation numbers that almost match (e.g., "24.244" and "24.424", "347" and "20.347", "88.0237" and "88.237"), so that entries of two sources that were not linked by the exact match of their numbers may be checked. The numbers are split to their parts (season, number, suffix) and indexed by season and by the deletion variants of the rest of the number (as in the "symmetric delete" spelling correction), so that only the few candidates found in the index are compared, not all pairs. """
+
+import re
+
+# NOTE: distance of a number without the season (e.g., "347") from the same number with a season (e.g., "20.347"); the distance of two different seasons is at most twice this, so that the distance stays a metric.
+MISSING_SEASON_DISTANCE = 1
+MAX_SEASON_DISTANCE = 2 * MISSING_SEASON_DISTANCE
+
+# NOTE: different spellings of the same season (after clear_rs_num, which removes the spaces).
+season_aliases = {'var': 'varia', 'v': 'varia'}
+
+# NOTE: e.g., "24.244A" (season, number, suffix), "1-11.047", "20.161,26", "15.Y", "4.---", "Varia11", "Var.11", "347", "8431,7".
+rs_number_patterns = [
+    re.compile(r'(?P<season>\d+(?:-\d+)?)\.(?P<number>\d+|[a-z]+|-+)(?P<suffix>.*)'),
+    re.compile(r'(?P<season>[a-z]+)\.?(?P<number>\d+)(?P<suffix>.*)'),
+    re.compile(r'(?P<season>)(?P<number>\d+)(?P<suffix>.*)')
+]
+
+
+def parse_rs_number(rs_num:str)->tuple:
+    """ Returns the parts of a (cleared) excavation number that are compared, e.g. "24.244A" --> ('24', '244', 'a'), "Varia11" --> ('varia', '11', ''), "347" --> ('', '347', ''). Case, leading zeros of the number and uncertainty marks ("?", "'") are left out; numbers of other forms are kept whole as the season. """
+    rs_num = rs_num.lower()
+    for pattern in rs_number_patterns:
+        rs_match = pattern.fullmatch(rs_num)
+        if rs_match:
+            season, number, suffix = rs_match.group('season', 'number', 'suffix')
+            if number.isdigit():
+                number = number.lstrip('0') or '0'
+            return season_aliases.get(season, season), number, suffix.strip("?'")
+
+    return rs_num, '', ''
+
+
+def damerau_levenshtein(string_1:str, string_2:str)->int:
+    """ Number of insertions, deletions, substitutions and transpositions of adjacent characters needed to change string_1 to string_2 (e.g., "244" --> "424" is 1). Unlike the simpler "optimal string alignment" distance, this is a metric. """
+    if string_1 == string_2:
+        return 0
+    if not string_1 or not string_2:
+        return len(string_1) + len(string_2)
+
+    max_distance = len(string_1) + len(string_2)
+    last_rows = {}
+    rows = [[max_distance] * (len(string_2) + 2)]
+    rows += [[max_distance, 0] + list(range(1, len(string_2) + 1))]
+    for i, char_1 in enumerate(string_1, start=1):
+        row = [max_distance, i] + [0] * len(string_2)
+        last_column = 0
+        for j, char_2 in enumerate(string_2, start=1):
+            last_row = last_rows.get(char_2, 0)
+            cost = 0 if char_1 == char_2 else 1
+            row[j + 1] = min(
+                rows[i][j] + cost,
+                rows[i][j + 1] + 1,
+                row[j] + 1,
+                rows[last_row][last_column] + (i - last_row - 1) + 1 + (j - last_column - 1)
+            )
+            if not cost:
+                last_column = j
+        rows.append(row)
+        last_rows[char_1] = i
+
+    return rows[-1][-1]
+
+
+def season_distance(season_1:str, season_2:str)->int:
+    if season_1 == season_2:
+        return 0
+    if not season_1 or not season_2:
+        return MISSING_SEASON_DISTANCE
+    return min(damerau_levenshtein(season_1, season_2), MAX_SEASON_DISTANCE)
+
+
+def rs_distance(parts_1:tuple, parts_2:tuple)->int:
+    """ Distance of two excavation numbers split by parse_rs_number: the sum of the distances of their seasons, numbers and suffixes. """
+    season_1, number_1, suffix_1 = parts_1
+    season_2, number_2, suffix_2 = parts_2
+    return season_distance(season_1, season_2) + damerau_levenshtein(number_1, number_2) + damerau_levenshtein(suffix_1, suffix_2)
+
+
+def rest_of_number(parts:tuple)->str:
+    """ The number and the suffix of the excavation number split by parse_rs_number, as one string (the parts are separated by a character that is not in any number). """
+    return f'{parts[1]}\0{parts[2]}'
+
+
+def deletion_variants(string:str, max_deletions:int)->set:
+    """ Returns the strings made by deleting at most max_deletions characters of string (incl. string itself). Two strings within the Damerau-Levenshtein distance k have a common variant made by at most k deletions from each of them (a substitution or a transposition is found by deleting one character from both, an insertion by deleting it from one of them). """
+    variants = {string}
+    last_variants = {string}
+    for _ in range(max_deletions):
+        last_variants = {variant[:position] + variant[position + 1:] for variant in last_variants for position in range(len(variant))}
+        variants |= last_variants
+
+    return variants
+
+
+def build_rs_number_index(rs_nums:list, max_distance:int)->tuple:
+    """
+    This function indexes excavation numbers for find_similar_rs_numbers.
+
+    Args:
+        rs_nums (list): (cleared) excavation numbers
+        max_distance (int): the largest distance that will be searched for
+
+    Returns:
+        tuple: the index (season --> deletion variant of the rest of the number (see rest_of_number) --> set of the parts of the numbers, see parse_rs_number) and the numbers of each parts (parts --> list of (position in rs_nums, number))
+    """
+    rs_number_index = {}
+    rs_nums_by_parts = {}
+    for position, rs_num in enumerate(rs_nums):
+        parts = parse_rs_number(rs_num)
+        if parts not in rs_nums_by_parts:
+            rs_nums_by_parts[parts] = []
+            season_index = rs_number_index.setdefault(parts[0], {})
+            for variant in deletion_variants(rest_of_number(parts), max_distance):
+                season_index.setdefault(variant, set()).add(parts)
+        rs_nums_by_parts[parts].append((position, rs_num))
+
+    return rs_number_index, rs_nums_by_parts
+
+
+def find_similar_rs_numbers(rs_nums_1:list, rs_nums_2:list, max_distance:int=1)->list:
+    """
+    This function finds pairs of similar excavation numbers of two lists (e.g., numbers of two sources that did not match exactly).
+
+    The numbers of rs_nums_2 are indexed by season (see build_rs_number_index). For each number of rs_nums_1, only the seasons within max_distance from its season are searched, and in each of them, only the numbers whose rest shares a deletion variant with the rest of the number (within the distance left after the difference of the seasons); the exact distance (see rs_distance) is computed for these candidates only.
+
+    Args:
+        rs_nums_1 (list): (cleared) excavation numbers
+        rs_nums_2 (list): (cleared) excavation numbers
+        max_distance (int, optional): the largest distance of the numbers of a pair (see rs_distance). Defaults to 1.
+
+    Returns:
+        list: (number from rs_nums_1, number from rs_nums_2, distance), the closest pairs first (pairs of equal distance in the order of rs_nums_1 and rs_nums_2)
+    """
+    rs_number_index, rs_nums_by_parts = build_rs_number_index(rs_nums_2, max_distance)
+
+    # NOTE: the seasons (excavation campaigns) are few, so their distances are computed for all pairs of seasons.
+    parts_1 = [parse_rs_number(rs_num) for rs_num in rs_nums_1]
+    close_seasons = {}
+    for season_1 in dict.fromkeys(parts[0] for parts in parts_1):
+        season_distances = ((season_2, season_distance(season_1, season_2)) for season_2 in rs_number_index)
+        close_seasons[season_1] = [(season_2, distance) for season_2, distance in season_distances if distance <= max_distance]
+
+    similar_pairs = []
+    for position_1, (rs_num_1, parts) in enumerate(zip(rs_nums_1, parts_1)):
+        rest = rest_of_number(parts)
+        for season_2, distance_of_seasons in close_seasons[parts[0]]:
+            season_index = rs_number_index[season_2]
+            candidates = set()
+            for variant in deletion_variants(rest, max_distance - distance_of_seasons):
+                candidates.update(season_index.get(variant, ()))
+
+            for candidate in candidates:
+                distance = rs_distance(parts, candidate)
+                if distance > max_distance:
+                    continue
+                for position_2, rs_num_2 in rs_nums_by_parts[candidate]:
+                    if rs_num_1 != rs_num_2:
+                        similar_pairs.append((distance, position_1, position_2, rs_num_1, rs_num_2))
+
+    similar_pairs.sort()
+    return [(rs_num_1, rs_num_2, distance) for distance, position_1, position_2, rs_num_1, rs_num_2 in similar_pairs]
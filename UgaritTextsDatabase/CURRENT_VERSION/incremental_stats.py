@@ -0,0 +1,145 @@
+""" This file serves to regenerate the statistics incrementally: it keeps the hash of each row of the database, the derived attributes of the rows and the counts of the count cube (see count_cube.py) from the previous run, so that only the rows that have changed since then need to be processed again. """
+
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+
+# NOTE: change this when the structure of the state changes, older states are then ignored (and the statistics are computed from scratch). Changes of the code that derives the row attributes are found by the hash of the code saved in the state (see load_stats_state).
+STATS_STATE_VERSION = 1
+
+
+def hash_rows(db:pd.core.frame.DataFrame)->pd.core.series.Series:
+    """ Returns the hash (uint64) of the content of each row (incl. its index). """
+    return pd.util.hash_pandas_object(db.astype(object), index=True)
+
+
+def hash_code(code_paths:list)->str:
+    """ Returns the hash of the content of the source files (in the given order). """
+    code_hash = hashlib.sha256()
+    for code_path in code_paths:
+        with open(code_path, 'rb') as f:
+            code_hash.update(hashlib.sha256(f.read()).digest())
+
+    return code_hash.hexdigest()
+
+
+def cell_key(values)->tuple:
+    """ Key of the cube cell; empty values are saved as None, so that all of them are equal. """
+    return tuple(None if pd.isna(value) else value for value in values)
+
+
+def empty_stats_state(dimensions:list, code_hash:str)->dict:
+    return {
+        'version': STATS_STATE_VERSION,
+        'code_hash': code_hash,
+        'dimensions': list(dimensions),
+        'row_hashes': pd.Series(dtype=np.uint64),
+        'row_attributes': None,
+        'cell_ids': pd.Series(dtype=np.int64),
+        'cell_keys': [],
+        'cell_ids_by_key': {},
+        'cell_counts': np.zeros(0, dtype=np.int64)
+    }
+
+
+def load_stats_state(state_path:str, dimensions:list, code_hash:str):
+    """ Returns the state saved by the previous run, or None (when there is none, or it is incompatible). When the state was made by other code (code_hash, see hash_code), a new empty state is returned instead, so that the row attributes of all rows are derived again (the saved ones would not be derived again for the unchanged rows). """
+    if not os.path.exists(state_path):
+        return None
+
+    try:
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        print('The previous state of the statistics could not be loaded:', e)
+        return None
+
+    if state.get('version') != STATS_STATE_VERSION or state.get('dimensions') != list(dimensions):
+        return None
+
+    if state.get('code_hash') != code_hash:
+        print('The code of the statistics has changed since the previous run, the row attributes of all rows are derived again.')
+        return empty_stats_state(dimensions, code_hash)
+
+    return state
+
+
+def save_stats_state(state:dict, state_path:str):
+    temporary_path = state_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, state_path)
+
+
+def find_changed_rows(state:dict, row_hashes:pd.core.series.Series):
+    """ Returns the indexes of rows that are new or changed, and of rows that have been removed (compared to the state). """
+    previous_hashes = state['row_hashes'].reindex(row_hashes.index)
+    changed_rows = row_hashes.index[previous_hashes.to_numpy() != row_hashes.to_numpy()]
+    removed_rows = state['row_hashes'].index.difference(row_hashes.index)
+
+    return changed_rows, removed_rows
+
+
+def update_stats_state(state:dict, db:pd.core.frame.DataFrame, row_hashes:pd.core.series.Series, changed_attributes:pd.core.frame.DataFrame, removed_rows:pd.Index)->dict:
+    """
+    This function applies the changed rows to the state: the counts of the cells of the old versions of the rows are decreased, the counts of the cells of the new versions are increased.
+
+    Args:
+        state (dict): state of the previous run (see empty_stats_state)
+        db (pd.core.frame.DataFrame): the current database (its index gives the current order of rows)
+        row_hashes (pd.core.series.Series): hashes of the current rows (see hash_rows)
+        changed_attributes (pd.core.frame.DataFrame): derived attributes of the new and changed rows only
+        removed_rows (pd.Index): rows that are no more in the database
+
+    Returns:
+        dict: the updated state
+    """
+    cell_counts = state['cell_counts']
+    cell_ids = state['cell_ids']
+
+    # NOTE: old versions of the changed rows and the removed rows are subtracted from the counts.
+    outdated_rows = cell_ids.index.intersection(changed_attributes.index.append(removed_rows))
+    np.subtract.at(cell_counts, cell_ids.loc[outdated_rows].to_numpy(), 1)
+
+    new_cell_ids = []
+    for values in changed_attributes[state['dimensions']].itertuples(index=False, name=None):
+        key = cell_key(values)
+        if key not in state['cell_ids_by_key']:
+            state['cell_ids_by_key'][key] = len(state['cell_keys'])
+            state['cell_keys'].append(key)
+        new_cell_ids.append(state['cell_ids_by_key'][key])
+
+    cell_counts = np.concatenate([cell_counts, np.zeros(len(state['cell_keys']) - len(cell_counts), dtype=np.int64)])
+    np.add.at(cell_counts, np.array(new_cell_ids, dtype=np.int64), 1)
+
+    cell_ids = cell_ids.drop(outdated_rows)
+    cell_ids = pd.concat([cell_ids, pd.Series(new_cell_ids, index=changed_attributes.index, dtype=np.int64)]).loc[db.index]
+
+    if state['row_attributes'] is None:
+        row_attributes = changed_attributes
+    else:
+        unchanged_rows = state['row_attributes'].index.difference(outdated_rows)
+        row_attributes = pd.concat([state['row_attributes'].loc[unchanged_rows], changed_attributes])
+        # NOTE: concatenation of categoricals with different categories gives object columns.
+        categorical_columns = [column for column in changed_attributes.columns if isinstance(changed_attributes[column].dtype, pd.CategoricalDtype)]
+        row_attributes = row_attributes.astype(dict.fromkeys(categorical_columns, 'category'))
+    row_attributes = row_attributes.loc[db.index]
+
+    state.update({
+        'row_hashes': row_hashes,
+        'row_attributes': row_attributes,
+        'cell_ids': cell_ids,
+        'cell_counts': cell_counts
+    })
+
+    return state
+
+
+def count_cube_from_state(state:dict)->pd.core.series.Series:
+    """ Returns the count cube (as build_count_cube in count_cube.py would), with the cells in the order of their first row in the current database. """
+    cells_in_order = pd.unique(state['cell_ids'].to_numpy())
+    keys = [state['cell_keys'][cell_id] for cell_id in cells_in_order]
+
+    return pd.Series(state['cell_counts'][cells_in_order], index=pd.MultiIndex.from_tuples(keys, names=state['dimensions']))
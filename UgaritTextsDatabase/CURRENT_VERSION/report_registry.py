@@ -0,0 +1,94 @@
+""" This file serves to decide which statistics have to be made again (as make does): each report declares its parameters, input columns and output files, and its fingerprint (parameters + input columns + code of the report and of the modules the numbers are made by) is saved after it has been made. A report is up to date when its fingerprint has not changed and all its output files exist. """
+
+import os
+import json
+import hashlib
+import inspect
+import pandas as pd
+
+REPORTS_MANIFEST_NAME = 'REPORTS_MANIFEST.json'
+
+
+def hash_column(db:pd.core.frame.DataFrame, column:str)->str:
+    """ Returns the hash of the values of the column (incl. the index, so that the order of rows counts as well). """
+    row_hashes = pd.util.hash_pandas_object(db[column].astype(object), index=True)
+
+    return hashlib.sha256(row_hashes.to_numpy().tobytes()).hexdigest()
+
+
+def update_column_hashes(column_hashes:dict, db:pd.core.frame.DataFrame)->dict:
+    """ This adds the rows of db to the running hashes of its columns (column --> hashlib.sha256 object); when the database is hashed by chunks in the order of rows, the hexdigest of each running hash equals hash_column over the whole database. """
+    for column, column_hash in column_hashes.items():
+        column_hash.update(pd.util.hash_pandas_object(db[column].astype(object), index=True).to_numpy().tobytes())
+
+    return column_hashes
+
+
+def report_fingerprint(report:dict, column_hashes:dict, code_hash:str)->str:
+    """
+    This function returns the fingerprint of the report.
+
+    Args:
+        report (dict): the report, with keys "function", "parameters" and "input_columns"
+        column_hashes (dict): column --> its hash (see hash_column); must contain the input columns of the report
+        code_hash (str): hash of the modules the numbers of the reports are made by (see hash_code in incremental_stats.py), e.g. derivation of the row attributes, classification rules, counting; the code of the report function alone does not tell whether its numbers changed
+
+    Returns:
+        str: hash of the parameters, of the input columns, of the code of the report function and of the modules
+    """
+    fingerprint = {
+        'parameters': repr(sorted(report['parameters'].items())),
+        'input_columns': {column: column_hashes[column] for column in report['input_columns']},
+        'code': hashlib.sha256(inspect.getsource(report['function']).encode('utf-8')).hexdigest(),
+        'modules': code_hash
+    }
+
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_reports_manifest(stats_path:str)->dict:
+    """ Returns the fingerprints of the reports saved by the previous run: name of the report --> {'fingerprint': ..., 'outputs': [...]}. """
+    manifest_path = os.path.join(stats_path, REPORTS_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print('The manifest of the reports could not be loaded:', e)
+        return {}
+
+
+def save_reports_manifest(manifest:dict, stats_path:str):
+    manifest_path = os.path.join(stats_path, REPORTS_MANIFEST_NAME)
+    temporary_path = manifest_path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
+
+
+def report_input_columns(reports:dict)->list:
+    return sorted({column for report in reports.values() for column in report['input_columns']})
+
+
+def get_report_fingerprints(reports:dict, code_hash:str, db:pd.core.frame.DataFrame=None, column_hashes:dict=None)->dict:
+    """ Returns name of the report --> its fingerprint (see report_fingerprint), for all reports (each input column is hashed only once). The input columns are hashed from db, or their running hashes are given as column_hashes (see update_column_hashes). """
+    if column_hashes is None:
+        column_hashes = {column: hash_column(db, column) for column in report_input_columns(reports)}
+    else:
+        column_hashes = {column: column_hash.hexdigest() for column, column_hash in column_hashes.items()}
+
+    return {name: report_fingerprint(report, column_hashes, code_hash) for name, report in reports.items()}
+
+
+def find_outdated_reports(reports:dict, fingerprints:dict, manifest:dict, stats_path:str)->list:
+    """ Returns the names of the reports that have to be made again: their fingerprint differs from the manifest, or some of their output files are missing. """
+    outdated_reports = []
+    for name, report in reports.items():
+        if manifest.get(name, {}).get('fingerprint') != fingerprints[name]:
+            outdated_reports.append(name)
+        elif not all(os.path.exists(os.path.join(stats_path, output)) for output in report['outputs']):
+            outdated_reports.append(name)
+
+    return outdated_reports
@@ -0,0 +1,153 @@
+""" This file serves to measure the stages of the scripts (loading, merge phases, individual reports, export, ...): wall time, CPU time, peak memory, rows processed and size of the output of each stage are recorded to the run log, which is saved as JSON (one run) and appended to a CSV (history of runs). Each stage may also be profiled (cProfile, or pyinstrument if installed). """
+
+import os
+import sys
+import json
+import time
+import cProfile
+import contextlib
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# NOTE: directory for profiles of the stages (one file per stage); profiling is off when None. It may be set by the environment variable UGARIT_PROFILE_DIR (for scripts without command line options) or by configure_profiling.
+PROFILE_DIR = os.environ.get('UGARIT_PROFILE_DIR')
+PROFILER = os.environ.get('UGARIT_PROFILER', 'cProfile')
+
+# NOTE: cpu_seconds is the CPU time of this process only (not of its worker processes); max_rss_mb is the peak of this process so far, rss_growth_mb is how much the stage raised it.
+run_log_columns = ['script', 'stage', 'started', 'wall_seconds', 'cpu_seconds', 'max_rss_mb', 'rss_growth_mb', 'rows', 'output_bytes']
+
+# NOTE: records of the stages of this run (in the order of their end), see measure_stage.
+run_log_records = []
+profiled_stages = []
+
+
+def configure_profiling(profile_dir:str=None, profiler:str='cProfile'):
+    """ This turns profiling of the stages on (profile_dir is the directory of the profiles) or off (None). profiler is "cProfile" or "pyinstrument". """
+    global PROFILE_DIR, PROFILER
+    PROFILE_DIR = profile_dir
+    PROFILER = profiler
+
+
+def max_rss_mb():
+    """ Peak resident memory of this process so far (MB); None where it cannot be measured (e.g., on Windows). """
+    if resource is None:
+        return None
+
+    # NOTE: ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def output_size(output_paths:list)->int:
+    """ Sum of the sizes of the existing files (bytes). """
+    return sum(os.path.getsize(path) for path in output_paths if os.path.exists(path))
+
+
+def start_profiler():
+    if PROFILER == 'pyinstrument':
+        try:
+            import pyinstrument
+        except ImportError:
+            print('NOTE: pyinstrument is not installed, cProfile is used instead.')
+        else:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, script:str, stage:str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    file_name = ''.join(char if char.isalnum() or char in '-_.' else '_' for char in f'{script}--{stage}')
+
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(os.path.join(PROFILE_DIR, file_name + '.prof'))
+    else:
+        profiler.stop()
+        with open(os.path.join(PROFILE_DIR, file_name + '.html'), 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+
+
+@contextlib.contextmanager
+def measure_stage(script:str, stage:str, rows:int=None, output_paths:list=None):
+    """
+    This context manager measures the stage (the code in the with block) and adds its record to run_log_records, e.g.:
+
+        with measure_stage('analyse.py', 'load database') as record:
+            db = load_typed_database(...)
+            record['rows'] = len(db)
+
+    Args:
+        script (str): name of the script
+        stage (str): name of the stage
+        rows (int, optional): number of rows processed (may also be set in the record in the block). Defaults to None.
+        output_paths (list, optional): files written by the stage (their size is recorded; may also be set as record['output_paths']). Defaults to None.
+
+    Yields:
+        dict: the record of the stage
+    """
+    record = {'script': script, 'stage': stage, 'started': time.strftime('%Y-%m-%d %H:%M:%S'), 'rows': rows, 'output_paths': output_paths or []}
+
+    # NOTE: stages inside a profiled stage are not profiled on their own (only one profiler may run at a time).
+    profiler = start_profiler() if PROFILE_DIR and not profiled_stages else None
+    if profiler is not None:
+        profiled_stages.append(stage)
+
+    rss_before = max_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall_start, 4)
+        record['cpu_seconds'] = round(time.process_time() - cpu_start, 4)
+
+        if profiler is not None:
+            save_profile(profiler, script, stage)
+            profiled_stages.pop()
+
+        rss_after = max_rss_mb()
+        record['max_rss_mb'] = None if rss_after is None else round(rss_after, 1)
+        record['rss_growth_mb'] = None if rss_after is None else round(rss_after - rss_before, 1)
+        output_paths = record.pop('output_paths')
+        record['output_bytes'] = output_size(output_paths) if output_paths else None
+
+        run_log_records.append({column: record.get(column) for column in run_log_columns})
+
+
+def add_records(records:list):
+    """ This adds records measured in other processes (e.g., reports run by worker processes). """
+    run_log_records.extend(records)
+
+
+def save_run_log(run_log_dir:str, script:str)->str:
+    """ This saves the records of this run as JSON (run_log_dir/<script>_<time>.json) and appends them to run_log_dir/run_log.csv; returns the path to the JSON. """
+    os.makedirs(run_log_dir, exist_ok=True)
+    run_name = f'{os.path.splitext(script)[0]}_{time.strftime("%Y-%m-%d--%H-%M-%S")}'
+
+    json_path = os.path.join(run_log_dir, run_name + '.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'run': run_name, 'records': run_log_records}, f, indent=4)
+
+    csv_path = os.path.join(run_log_dir, 'run_log.csv')
+    records = pd.DataFrame(run_log_records, columns=run_log_columns)
+    records.insert(0, 'run', run_name)
+    records = records.astype({'rows': 'Int64', 'output_bytes': 'Int64'})
+    records.to_csv(csv_path, sep=',', encoding='utf-8', index=False, mode='a', header=not os.path.exists(csv_path))
+
+    return json_path
+
+
+def print_run_log(top:int=10):
+    """ This prints the slowest stages of this run. """
+    print()
+    print('The slowest stages:')
+    for record in sorted(run_log_records, key=lambda record: record['wall_seconds'], reverse=True)[:top]:
+        print(f'    {record["wall_seconds"]:>8.3f} s (CPU {record["cpu_seconds"]:.3f} s, peak {record["max_rss_mb"]} MB) - {record["script"]}: {record["stage"]}')
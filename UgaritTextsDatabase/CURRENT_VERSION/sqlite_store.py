@@ -0,0 +1,427 @@
+""" This file serves to export UGARIT_TEXTS_DATABASE.csv to an SQLite file (and to import it back), so that other tools can query the texts by indexed SQL queries without parsing the whole CSV. Besides the texts themselves, the file has normalised side tables (excavation numbers, KTU numbers, languages and findspots of the texts, derived attributes of the rows as analyse.py derives them) and one view for each of the statistics of analyse.py (all_reports), giving the same numbers as the CSV files in STATISTICS. """
+
+import os
+import re
+import sys
+import sqlite3
+import hashlib
+import inspect
+import argparse
+import numpy as np
+import pandas as pd
+
+import analyse
+from analyse import all_reports, derive_row_attributes, classify_cluster_genres, language_column, ktu_classification, locations_in_ugarit, locations_around_ugarit, locations_outside_ugarit, flourish_order_totals
+from database_schema import load_typed_database
+from database_snapshot import csv_key, csv_matches_key, to_string_frame
+from excavation_numbers import decode_ex_nums
+from text_lookup import normalise_ex_num, normalise_ktu, DEFAULT_EXCAVATION_SIGLUM
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+UGARIT_TEXTS_DATABASE_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
+
+# NOTE: change this when the tables or views change, older files are then exported again.
+SQLITE_STORE_VERSION = 1
+
+# NOTE: derived attributes of the rows that are saved to the findspots table (the rest is saved to text_attributes).
+findspot_columns = ['general_area', 'detail_in_cluster', 'findspot', 'topographic_point']
+boolean_attributes = ['has_excavation_siglum', 'has_ktu', 'possible_relevant_genre']
+
+indexes = {
+    'texts_ktu3': 'texts (ktu3)',
+    'excavation_numbers_rs_number': 'excavation_numbers (rs_number)',
+    'excavation_numbers_text_id': 'excavation_numbers (text_id)',
+    'ktu_numbers_ktu': 'ktu_numbers (ktu)',
+    'ktu_numbers_text_id': 'ktu_numbers (text_id)',
+    'text_languages_language': 'text_languages (language, source)',
+    'text_languages_text_id': 'text_languages (text_id)',
+    'findspots_general_area': 'findspots (general_area, detail_in_cluster)',
+    'text_attributes_languages_utdb': 'text_attributes (languages_utdb)',
+    'text_attributes_ktu_category': 'text_attributes (ktu_category)'
+}
+
+
+def sqlite_path_for(csv_path:str)->str:
+    return f'{os.path.splitext(csv_path)[0]}.sqlite'
+
+
+def sql_name(column:str)->str:
+    """ Name of the column in SQL, e.g. 'Excavation Numbers "Cleared"' --> 'excavation_numbers_cleared'. """
+    return re.sub(r'[^0-9a-zA-Z]+', '_', column).strip('_').lower()
+
+
+def sql_literal(value)->str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_list(values)->str:
+    return '(' + ', '.join(sql_literal(value) for value in values) + ')'
+
+
+def to_sql_values(df:pd.core.frame.DataFrame)->list:
+    """ Rows of df as tuples for executemany (empty values as None, booleans as 0/1). """
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def insert_rows(connection:sqlite3.Connection, table:str, df:pd.core.frame.DataFrame):
+    connection.execute(f'CREATE TABLE {table} ({", ".join(df.columns)})')
+    connection.executemany(f'INSERT INTO {table} VALUES ({", ".join("?" * len(df.columns))})', to_sql_values(df))
+
+
+def excavation_numbers_table(db:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
+    """ One row per excavation number of each text (every alternative number of a join), with the number normalised as in text_lookup.py (e.g., "RS 24.244"). """
+    rows = []
+    excavation_sigla = db['Excavation Siglum'].astype(object).fillna(DEFAULT_EXCAVATION_SIGLUM).to_numpy()
+    for position, (text_id, encoded) in enumerate(zip(db.index, db['Excavation Numbers "Cleared"'].to_numpy())):
+        for ex_num_position, ex_num in enumerate(decode_ex_nums(encoded)):
+            for rs_number in normalise_ex_num(ex_num, excavation_sigla[position]):
+                rows.append((text_id, ex_num_position, excavation_sigla[position], ex_num, rs_number))
+
+    return pd.DataFrame(rows, columns=['text_id', 'position', 'excavation_siglum', 'excavation_number', 'rs_number'])
+
+
+def ktu_numbers_table(db:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
+    """ One row per KTU3 number of each text (e.g., "4.5+4.19" gives two rows). """
+    rows = [(text_id, ktu) for text_id, value in db['KTU3'].items() if type(value) == str for ktu in normalise_ktu(value)]
+
+    return pd.DataFrame(rows, columns=['text_id', 'ktu'])
+
+
+def text_languages_table(row_attributes:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
+    """ One row per (normalised) language of each text according to each source ("utdb", "rsti", "sau"). """
+    parts = []
+    for lang_by in analyse.language_columns:
+        languages = row_attributes[language_column(lang_by, False)].str.split(';').explode()
+        languages = languages[languages.notna() & (languages != '')]
+        parts.append(pd.DataFrame({'text_id': languages.index, 'source': lang_by, 'language': languages.to_numpy()}))
+
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_metadata(sqlite_path:str)->dict:
+    if not os.path.exists(sqlite_path):
+        return {}
+
+    try:
+        with sqlite3.connect(sqlite_path) as connection:
+            return dict(connection.execute('SELECT key, value FROM metadata').fetchall())
+    except sqlite3.Error:
+        return {}
+
+
+def is_up_to_date(csv_path:str, sqlite_path:str)->bool:
+    """ The SQLite file is up to date when it was exported (by this version) from the CSV with the same content, by the same code of the statistics (STATISTICS_CODE_HASH in analyse.py) and with the same parameters of the reports (the views of the statistics depend on both). """
+    metadata = read_metadata(sqlite_path)
+    if metadata.get('version') != str(SQLITE_STORE_VERSION):
+        return False
+
+    if metadata.get('statistics_code') != analyse.STATISTICS_CODE_HASH or metadata.get('report_parameters') != hash_report_parameters(all_reports):
+        return False
+
+    try:
+        file_key = {'mtime_ns': int(metadata['csv_mtime_ns']), 'size': int(metadata['csv_size']), 'sha256': metadata['csv_sha256']}
+    except (KeyError, ValueError):
+        return False
+
+    return csv_matches_key(csv_path, file_key)
+
+
+def export_to_sqlite(csv_path:str=UGARIT_TEXTS_DATABASE_PATH, sqlite_path:str=None, force:bool=False)->str:
+    """
+    This function exports the database to the SQLite file (tables, indexes and the views of the statistics). The file is replaced at once (readers never see a half-written file).
+
+    Args:
+        csv_path (str, optional): the database CSV. Defaults to UGARIT_TEXTS_DATABASE_PATH.
+        sqlite_path (str, optional): the SQLite file. Defaults to None (the CSV with the extension .sqlite).
+        force (bool, optional): export even if the file is up to date with the CSV. Defaults to False.
+
+    Returns:
+        str: path to the SQLite file
+    """
+    if sqlite_path is None:
+        sqlite_path = sqlite_path_for(csv_path)
+
+    if not force and is_up_to_date(csv_path, sqlite_path):
+        print('The SQLite file is up to date:', sqlite_path)
+        return sqlite_path
+
+    db = load_typed_database(csv_path)
+    row_attributes = derive_row_attributes(db)
+    row_attributes = pd.concat([row_attributes, classify_cluster_genres(row_attributes, {})], axis=1)
+    row_attributes[boolean_attributes] = row_attributes[boolean_attributes].astype(int)
+
+    texts = db.copy()
+    texts.columns = [sql_name(column) for column in db.columns]
+    if texts.columns.duplicated().any():
+        raise ValueError(f'Columns of {csv_path} have the same names in SQL: {list(texts.columns[texts.columns.duplicated()])}')
+    texts.insert(0, 'text_id', db.index)
+    texts.insert(1, 'row_order', np.arange(len(db)))
+
+    findspots = row_attributes[findspot_columns].reset_index(drop=True)
+    findspots.insert(0, 'text_id', db.index)
+
+    text_attributes = row_attributes.drop(columns=findspot_columns).reset_index(drop=True)
+    text_attributes.insert(0, 'text_id', db.index)
+    text_attributes.insert(1, 'row_order', np.arange(len(db)))
+
+    ktu_categories = row_attributes['ktu_category'][row_attributes['has_ktu'] == 1].dropna().unique()
+    ktu_classifications = pd.DataFrame({'ktu_category': ktu_categories, 'classification': [ktu_classification.get(int(ktu_category)) for ktu_category in ktu_categories]})
+
+    csv_columns = pd.DataFrame({'position': np.arange(len(db.columns)), 'csv_name': db.columns, 'sql_name': texts.columns[2:]})
+
+    file_key = csv_key(csv_path)
+    metadata = pd.DataFrame({
+        'key': ['version', 'index_name', 'csv_mtime_ns', 'csv_size', 'csv_sha256', 'statistics_code', 'report_parameters'],
+        'value': [str(SQLITE_STORE_VERSION), db.index.name, str(file_key['mtime_ns']), str(file_key['size']), file_key['sha256'], analyse.STATISTICS_CODE_HASH, hash_report_parameters(all_reports)]
+    })
+
+    temporary_path = sqlite_path + '.tmp'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    connection = sqlite3.connect(temporary_path)
+    try:
+        # NOTE: the tables are declared with the primary keys, the rest is made by insert_rows from the dataframes.
+        connection.execute(f'CREATE TABLE texts (text_id TEXT PRIMARY KEY, row_order INTEGER NOT NULL, {", ".join(f"{column} TEXT" for column in texts.columns[2:])})')
+        connection.executemany(f'INSERT INTO texts VALUES ({", ".join("?" * len(texts.columns))})', to_sql_values(texts))
+        connection.execute(f'CREATE TABLE findspots (text_id TEXT PRIMARY KEY REFERENCES texts, {", ".join(f"{column} TEXT" for column in findspot_columns)})')
+        connection.executemany(f'INSERT INTO findspots VALUES ({", ".join("?" * len(findspots.columns))})', to_sql_values(findspots))
+        connection.execute(f'CREATE TABLE text_attributes (text_id TEXT PRIMARY KEY REFERENCES texts, row_order INTEGER NOT NULL, {", ".join(text_attributes.columns[2:])})')
+        connection.executemany(f'INSERT INTO text_attributes VALUES ({", ".join("?" * len(text_attributes.columns))})', to_sql_values(text_attributes))
+
+        insert_rows(connection, 'excavation_numbers', excavation_numbers_table(db))
+        insert_rows(connection, 'ktu_numbers', ktu_numbers_table(db))
+        insert_rows(connection, 'text_languages', text_languages_table(row_attributes))
+        insert_rows(connection, 'ktu_classifications', ktu_classifications)
+        insert_rows(connection, 'csv_columns', csv_columns)
+        insert_rows(connection, 'metadata', metadata)
+
+        for index_name, indexed_columns in indexes.items():
+            connection.execute(f'CREATE INDEX {index_name} ON {indexed_columns}')
+
+        for report_name, report in all_reports.items():
+            connection.execute(f'CREATE VIEW {report_view_name(report_name)} AS {report_view_sql(report)}')
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(temporary_path, sqlite_path)
+    print('The database has been exported to', sqlite_path)
+
+    return sqlite_path
+
+
+def import_from_sqlite(sqlite_path:str)->pd.core.frame.DataFrame:
+    """ Returns the texts of the SQLite file as load_database in database_snapshot.py returns the CSV (the same columns, index and order of rows; empty cells are np.nan). """
+    with sqlite3.connect(sqlite_path) as connection:
+        csv_columns = pd.read_sql_query('SELECT csv_name, sql_name FROM csv_columns ORDER BY position', connection)
+        index_name = connection.execute("SELECT value FROM metadata WHERE key = 'index_name'").fetchone()[0]
+        texts = pd.read_sql_query(f'SELECT text_id, {", ".join(csv_columns["sql_name"])} FROM texts ORDER BY row_order', connection)
+
+    columns = {csv_name: texts[sql_name].to_numpy(dtype=object) for csv_name, sql_name in zip(csv_columns['csv_name'], csv_columns['sql_name'])}
+    for values in columns.values():
+        values[pd.isna(values)] = np.nan
+
+    return to_string_frame(columns, texts['text_id'].to_numpy(dtype=object), index_name)
+
+
+# NOTE: the views of the statistics. Each view has the columns row_label, column_label and value, i.e. the cells of the CSV file of the report (cells with 0 are left out).
+
+def report_view_name(report_name:str)->str:
+    return 'report_' + sql_name(report_name)
+
+
+def report_parameters(report:dict)->dict:
+    """ Parameters of the report incl. the defaults of the report function. """
+    defaults = {name: parameter.default for name, parameter in inspect.signature(report['function']).parameters.items() if parameter.default is not inspect.Parameter.empty}
+    return {**defaults, **report['parameters']}
+
+
+def hash_report_parameters(reports:dict)->str:
+    """ Returns the hash of the parameters of all the reports (incl. the defaults of the report functions, see report_parameters). """
+    parameters = [(report_name, sorted(report_parameters(report).items())) for report_name, report in reports.items()]
+    return hashlib.sha256(repr(parameters).encode('utf-8')).hexdigest()
+
+
+def location_row(locations:list, left_out:list=None)->str:
+    """ SQL expression of the row of the location: its own row for the locations, "Other/unknown" for the rest (NULL for left_out locations). """
+    left_out_case = f' WHEN f.general_area IN {sql_list(left_out)} THEN NULL' if left_out else ''
+    return f"CASE WHEN f.general_area IN {sql_list(locations)} THEN f.general_area{left_out_case} ELSE 'Other/unknown' END"
+
+
+def counts_by_location_sql(category:str, condition:str, locations:list, left_out:list=None, totals_of:list=None)->str:
+    """ Counts of texts (meeting the condition) by location (see location_row) and category; with the "total" of each of the locations in totals_of. """
+    totals_of = totals_of if totals_of is not None else locations
+    counts = f'''SELECT row_label, column_label, value FROM (
+        SELECT {location_row(locations, left_out)} AS row_label, {category} AS column_label, COUNT(*) AS value
+        FROM text_attributes a JOIN findspots f USING (text_id)
+        WHERE {condition}
+        GROUP BY row_label, column_label) WHERE row_label IS NOT NULL'''
+    totals = f'''SELECT f.general_area, 'total', COUNT(*)
+        FROM text_attributes a JOIN findspots f USING (text_id)
+        WHERE ({condition}) AND f.general_area IN {sql_list(totals_of)}
+        GROUP BY f.general_area'''
+
+    return f'{counts}\n    UNION ALL\n    {totals}'
+
+
+def flourish_totals_sql()->str:
+    return '\n    UNION ALL\n    '.join(f"SELECT {sql_literal(location)}, 'total', {total}" for location, total in flourish_order_totals.items())
+
+
+def locations_et_languages_sql(parameters:dict)->str:
+    languages = language_column('utdb', parameters['use_multilingual'])
+    return counts_by_location_sql(f'a.{languages}', f'a.{languages} NOT IN {sql_list(parameters["ignore_langs"])}', locations_in_ugarit, left_out=locations_outside_ugarit)
+
+
+def languages_in_RSTI_et_SAU_sql(parameters:dict)->str:
+    sau_languages = language_column('sau', parameters['use_multilingual'])
+    rsti_languages = language_column('rsti', parameters['use_multilingual'])
+    ignore_langs = parameters['ignore_langs'] or []
+    return f'''SELECT {sau_languages} AS row_label, {rsti_languages} AS column_label, COUNT(*) AS value
+    FROM text_attributes
+    WHERE {sau_languages} NOT IN {sql_list(ignore_langs)} AND {rsti_languages} NOT IN {sql_list(ignore_langs)}
+    GROUP BY row_label, column_label'''
+
+
+def languages_sql(parameters:dict)->str:
+    languages = language_column('utdb', parameters['use_multilingual'])
+    conditions = [f'{languages} NOT IN {sql_list(parameters["ignore_langs"])}']
+    if parameters['only_Ugarit_MeB_RIH']:
+        conditions.append('has_excavation_siglum = 1')
+    if parameters['only_multi']:
+        conditions.append(f"instr({languages}, ';') > 0")
+    return f'''SELECT {languages} AS row_label, 'count of texts' AS column_label, COUNT(*) AS value
+    FROM text_attributes
+    WHERE {" AND ".join(conditions)}
+    GROUP BY row_label'''
+
+
+def locations_et_ktu_genres_sql(parameters:dict)->str:
+    category = '(SELECT classification FROM ktu_classifications k WHERE k.ktu_category = a.ktu_category)'
+    return counts_by_location_sql(category, 'a.has_ktu = 1', locations_in_ugarit)
+
+
+def religious_texts_sql(parameters:dict)->str:
+    relation = 'a.relation_category' if parameters['detailed_relation'] else 'a.relational_category'
+    category = f"CASE WHEN a.possible_relevant_genre = 1 OR a.ktu_category = '1' THEN 'religious' ELSE COALESCE({relation}, 'other') END"
+    locations = locations_in_ugarit + locations_around_ugarit
+    totals_of = [location for location in locations if location not in flourish_order_totals]
+    return counts_by_location_sql(category, '1', locations, totals_of=totals_of) + '\n    UNION ALL\n    ' + flourish_totals_sql()
+
+
+def religious_texts_detailed_sql(parameters:dict)->str:
+    locations = locations_in_ugarit + locations_around_ugarit
+    totals_of = [location for location in locations if location not in flourish_order_totals]
+    return counts_by_location_sql('a.religious_genre', 'a.religious_genre IS NOT NULL', locations, totals_of=totals_of) + '\n    UNION ALL\n    ' + flourish_totals_sql()
+
+
+def religious_languages_sql(parameters:dict)->str:
+    languages = language_column('utdb', parameters['use_multilingual'])
+    category = f"CASE WHEN a.possible_relevant_genre = 1 OR a.genre_by_sau IS NOT NULL THEN a.{languages} WHEN a.relational_category IS NOT NULL THEN 'related ' || a.{languages} END"
+    return counts_by_location_sql(category, f'({category}) NOT IN {sql_list(parameters["ignore_langs"])}', locations_in_ugarit)
+
+
+def genres_in_cluster_sql(parameters:dict)->str:
+    return f'''SELECT a.cluster_genre AS row_label, '0' AS column_label, COUNT(*) AS value
+    FROM text_attributes a JOIN findspots f USING (text_id)
+    WHERE f.general_area = {sql_literal(parameters["cluster"])} AND a.cluster_genre IS NOT NULL
+    GROUP BY row_label'''
+
+
+def genres_detailes_in_cluster_sql(parameters:dict)->str:
+    condition = f'f.general_area = {sql_literal(parameters["cluster"])} AND a.cluster_genre_detailed IS NOT NULL'
+    return f'''SELECT f.detail_in_cluster AS row_label, a.cluster_genre_detailed AS column_label, COUNT(*) AS value
+    FROM text_attributes a JOIN findspots f USING (text_id)
+    WHERE {condition}
+    GROUP BY row_label, column_label
+    UNION ALL
+    SELECT f.detail_in_cluster, 'total', COUNT(*)
+    FROM text_attributes a JOIN findspots f USING (text_id)
+    WHERE {condition} AND f.detail_in_cluster != 'Other/unknown'
+    GROUP BY f.detail_in_cluster'''
+
+
+# NOTE: report function of analyse.py --> function making the SQL of its view from the parameters of the report.
+report_views = {
+    analyse.list_locations_et_languages: locations_et_languages_sql,
+    analyse.compare_languages_in_RSTI_et_SAU: languages_in_RSTI_et_SAU_sql,
+    analyse.list_languages: languages_sql,
+    analyse.list_locations_et_ktu_genres: locations_et_ktu_genres_sql,
+    analyse.get_religious_texts_stats: religious_texts_sql,
+    analyse.get_religious_texts_detailed_stats: religious_texts_detailed_sql,
+    analyse.religious_languages: religious_languages_sql,
+    analyse.list_genres_in_cluster: genres_in_cluster_sql,
+    analyse.list_genres_detailes_in_cluster: genres_detailes_in_cluster_sql
+}
+
+
+def report_view_sql(report:dict)->str:
+    if report['function'] not in report_views:
+        raise ValueError(f'There is no SQL view for the report function {report["function"].__name__}')
+
+    return report_views[report['function']](report_parameters(report))
+
+
+def query_report(connection:sqlite3.Connection, report_name:str)->pd.core.frame.DataFrame:
+    """ Returns the cells of the report (row_label, column_label, value) from its view; cells with 0 are left out. """
+    return pd.read_sql_query(f'SELECT row_label, column_label, value FROM {report_view_name(report_name)} WHERE value != 0', connection)
+
+
+def report_csv_cells(csv_path:str)->pd.core.frame.DataFrame:
+    """ Returns the cells of the CSV file of a report in the form of the views (row_label, column_label, value), without cells with 0. """
+    df = pd.read_csv(csv_path, index_col=0, keep_default_na=False, na_values=[''])
+    # NOTE: texts without any known language have the empty language (""), which pandas reads as "Unnamed: ..." in the header and as NaN in the cells.
+    df.columns = ['' if column.startswith('Unnamed: ') else column for column in df.columns]
+    if 'count of texts' in df.columns:
+        cells = pd.DataFrame({'row_label': df['language'], 'column_label': 'count of texts', 'value': df['count of texts']})
+    elif 'SAU language' in df.columns:
+        cells = pd.DataFrame({'row_label': df['SAU language'], 'column_label': df['"RSTI" language'], 'value': df['value']})
+    else:
+        df.index = df.index.fillna('').astype(str)
+        cells = df.rename_axis('row_label').reset_index().melt(id_vars='row_label', var_name='column_label', value_name='value')
+
+    cells = cells[cells['value'].notna() & (cells['value'] != 0)].fillna({'row_label': '', 'column_label': ''})
+    return cells.astype({'row_label': str, 'column_label': str, 'value': 'int64'}).reset_index(drop=True)
+
+
+def compare_with_statistics(sqlite_path:str, stats_path:str, report_names:list=None)->dict:
+    """ Compares the views with the CSV files of the reports in stats_path; returns name of the report --> differing cells (empty dataframe when the numbers are the same; None when the CSV file does not exist). """
+    differences = {}
+    with sqlite3.connect(sqlite_path) as connection:
+        for report_name in report_names or all_reports:
+            csv_path = os.path.join(stats_path, all_reports[report_name]['outputs'][0])
+            if not os.path.exists(csv_path):
+                differences[report_name] = None
+                continue
+
+            view_cells = query_report(connection, report_name).astype({'row_label': str, 'column_label': str, 'value': 'int64'})
+            merged = view_cells.merge(report_csv_cells(csv_path), on=['row_label', 'column_label'], how='outer', suffixes=('_sql', '_csv'))
+            differences[report_name] = merged[merged['value_sql'] != merged['value_csv']]
+
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Exports the Ugarit texts database to an SQLite file (with side tables, indexes and views of the statistics).')
+    parser.add_argument('--database', default=UGARIT_TEXTS_DATABASE_PATH, help='the database CSV file (default: UGARIT_TEXTS_DATABASE.csv next to this script)')
+    parser.add_argument('--output', help='the SQLite file (default: the database with the extension .sqlite)')
+    parser.add_argument('--force', action='store_true', help='export even if the SQLite file is up to date')
+    parser.add_argument('--check', metavar='STATISTICS', help='compare the views with the statistics (CSV files) in this directory')
+    arguments = parser.parse_args()
+
+    sqlite_path = export_to_sqlite(arguments.database, arguments.output, force=arguments.force)
+
+    if arguments.check:
+        differences = compare_with_statistics(sqlite_path, arguments.check)
+        for report_name, differing_cells in differences.items():
+            if differing_cells is None:
+                print(f'{report_name}: there is no CSV file')
+            elif len(differing_cells):
+                print(f'{report_name}: {len(differing_cells)} cells differ')
+                print(differing_cells.to_string())
+            else:
+                print(f'{report_name}: the same numbers')
+
+        sys.exit(1 if any(differing_cells is not None and len(differing_cells) for differing_cells in differences.values()) else 0)
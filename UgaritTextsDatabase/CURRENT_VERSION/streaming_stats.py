@@ -0,0 +1,32 @@
+""" This file serves to compute the statistics from a database that is read by parts (chunks of rows) instead of being loaded whole: each chunk is counted into the cells of the count cube (see count_cube.py) and the counts of all chunks are summed. The memory needed thus depends on the size of a chunk and on the number of distinct cells of the cube, not on the number of rows of the database. """
+
+import pandas as pd
+
+from database_schema import UGARIT_TEXTS_DATABASE_SCHEMA, apply_schema
+from incremental_stats import cell_key
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def read_database_chunks(csv_path:str, chunk_size:int=DEFAULT_CHUNK_SIZE, schema:dict=UGARIT_TEXTS_DATABASE_SCHEMA):
+    """ Yields the database by chunks of chunk_size rows (in the order of the rows), loaded as load_typed_database in database_schema.py would load them. """
+    with pd.read_csv(csv_path, encoding='utf-8', delimiter=';', dtype=str, index_col=0, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, schema, source_name=csv_path)
+
+
+def add_cube_counts(cell_counts:dict, cube:pd.core.series.Series)->dict:
+    """ This adds the counts of the cube (of one chunk) to cell_counts (cell key --> count, see cell_key in incremental_stats.py). The cells are kept in the order of their first appearance, so that adding the cubes of the chunks in the order of the rows gives the cells in the order of build_count_cube over the whole database. """
+    for values, count in cube.items():
+        key = cell_key(values)
+        cell_counts[key] = cell_counts.get(key, 0) + int(count)
+
+    return cell_counts
+
+
+def cube_from_counts(cell_counts:dict, dimensions:list)->pd.core.series.Series:
+    """ Returns the count cube (as build_count_cube in count_cube.py would) from the summed counts of the chunks. """
+    if not cell_counts:
+        return pd.Series([], index=pd.MultiIndex.from_tuples([], names=dimensions), dtype='int64')
+
+    return pd.Series(list(cell_counts.values()), index=pd.MultiIndex.from_tuples(list(cell_counts), names=dimensions), dtype='int64')
@@ -0,0 +1,107 @@
+""" This file serves to generate synthetic corpora of any size shaped as the real ones (SAU_COLLECTION.csv, RSTI_MODIFIED.csv and UGARIT_TEXTS_DATABASE.csv), e.g. for benchmarks (see benchmark.py). The real files are repeated (the last copy is a random sample of rows), so all values (excavation sigla, "SAU Script et Language" codes, areas, genres, Clemens values, ...) keep their real distributions; only the excavation numbers are renumbered in each copy, so that they stay unique and the copies do not link to each other. """
+
+import os
+import re
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+REAL_DATA_PATH = os.path.join(ROOT_PATH, '..', 'ARCHIVE-BEFORE_27-02-2024', 'DATA_BEFORE_27-02-2024', 'CSV')
+REAL_SAU_PATH = os.path.join(REAL_DATA_PATH, 'SAU_COLLECTION.csv')
+REAL_RSTI_PATH = os.path.join(REAL_DATA_PATH, 'RSTI_MODIFIED.csv')
+REAL_UTDB_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
+
+# NOTE: files that are published together with the database (02_backup-et-publish.py) but are not scaled (they are copied as they are).
+UNSCALED_FILES = ['RSTI_NON_TEXTS_OBJECTS.csv', 'SAU_NON_TEXTS_OBJECTS.csv']
+
+# NOTE: the number after the season (e.g., "17.331") is increased by this offset times the number of the copy (k-th copy: "17.<331 + k*OFFSET>"); the same number thus gets the same new number in all files, so SAU and RSTI overlap as the real ones do.
+EX_NUM_OFFSET = 10000
+ex_num_pattern = re.compile(r'(\d+)\.(\d+)')
+
+ex_num_columns = {
+    'SAU': ['RS'],
+    'RSTI': ['Excavation Numbers', 'Associated Text'],
+    'UTDB': ['Excavation Numbers "Cleared"', 'Excavation Numbers UTDB', 'Excavation Numbers SAU']
+}
+
+
+def renumber_ex_nums(values:pd.core.series.Series, copy_num:int)->pd.core.series.Series:
+    """ This renumbers all excavation numbers in the values for the copy_num-th copy of the corpus (the 0th copy keeps the real numbers). """
+    if copy_num == 0:
+        return values
+
+    def renumber(match):
+        return f'{match[1]}.{int(match[2]) + copy_num * EX_NUM_OFFSET:0{len(match[2])}d}'
+
+    return values.str.replace(ex_num_pattern, renumber, regex=True)
+
+
+def copy_rows(real_df:pd.core.frame.DataFrame, rows:int, seed:int=0)->list:
+    """ Returns the copies of real_df to make rows rows: (copy number, dataframe); the last copy is a random sample (in the original order of rows). """
+    rng = np.random.default_rng(seed)
+    copies = []
+    for copy_num in range(-(-rows // len(real_df))):
+        rows_in_copy = min(len(real_df), rows - copy_num * len(real_df))
+        if rows_in_copy == len(real_df):
+            copies.append((copy_num, real_df))
+        else:
+            copies.append((copy_num, real_df.iloc[np.sort(rng.choice(len(real_df), rows_in_copy, replace=False))]))
+
+    return copies
+
+
+def scale_corpus(real_df:pd.core.frame.DataFrame, rows:int, columns:list, seed:int=0)->pd.core.frame.DataFrame:
+    """ This makes the corpus of rows rows from the real one (see copy_rows), with the excavation numbers in columns renumbered in each copy. """
+    copies = []
+    for copy_num, copy_df in copy_rows(real_df, rows, seed):
+        copy_df = copy_df.copy()
+        for column in columns:
+            copy_df[column] = renumber_ex_nums(copy_df[column], copy_num)
+        copies.append(copy_df)
+
+    return pd.concat(copies)
+
+
+def generate_corpus(output_dir:str, rows:int, seed:int=0)->dict:
+    """
+    This function generates the synthetic corpus to output_dir: RSTI_MODIFIED.csv with rows rows, SAU_COLLECTION.csv with the number of rows in the real ratio to RSTI, the unscaled files, and UTDB/UGARIT_TEXTS_DATABASE.csv (shaped as the database analysed by analyse.py) with rows rows.
+
+    Returns:
+        dict: name of the file --> its number of rows
+    """
+    os.makedirs(os.path.join(output_dir, 'UTDB'), exist_ok=True)
+
+    real_sau = pd.read_csv(REAL_SAU_PATH, encoding='utf-8', delimiter=';', dtype=str)
+    real_rsti = pd.read_csv(REAL_RSTI_PATH, encoding='utf-8', delimiter=';', dtype=str)
+    real_utdb = pd.read_csv(REAL_UTDB_PATH, encoding='utf-8', delimiter=';', dtype=str, index_col=0)
+
+    sau_rows = round(rows * len(real_sau) / len(real_rsti))
+
+    # NOTE: SAU and RSTI use the same seed, so that their last (partial) copies are sampled from the same positions.
+    sau = scale_corpus(real_sau, sau_rows, ex_num_columns['SAU'], seed)
+    sau.to_csv(os.path.join(output_dir, 'SAU_COLLECTION.csv'), sep=';', encoding='utf-8', index=False)
+
+    rsti = scale_corpus(real_rsti, rows, ex_num_columns['RSTI'], seed)
+    rsti.to_csv(os.path.join(output_dir, 'RSTI_MODIFIED.csv'), sep=';', encoding='utf-8', index=False)
+
+    utdb = scale_corpus(real_utdb, rows, ex_num_columns['UTDB'], seed)
+    utdb.index = pd.Index(np.arange(len(utdb)).astype(str), name=real_utdb.index.name)
+    utdb.to_csv(os.path.join(output_dir, 'UTDB', 'UGARIT_TEXTS_DATABASE.csv'), sep=';', encoding='utf-8')
+
+    for file_ in UNSCALED_FILES:
+        shutil.copyfile(os.path.join(REAL_DATA_PATH, file_), os.path.join(output_dir, file_))
+
+    return {'SAU_COLLECTION.csv': len(sau), 'RSTI_MODIFIED.csv': len(rsti), 'UTDB/UGARIT_TEXTS_DATABASE.csv': len(utdb)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generates a synthetic corpus shaped as the real one.')
+    parser.add_argument('rows', type=int, help='number of rows of RSTI_MODIFIED.csv and of UGARIT_TEXTS_DATABASE.csv')
+    parser.add_argument('output_dir', help='directory of the generated files')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    for file_, file_rows in generate_corpus(arguments.output_dir, arguments.rows, arguments.seed).items():
+        print(file_, file_rows, 'rows')
@@ -0,0 +1,276 @@
+""" This file serves to look up texts of UGARIT_TEXTS_DATABASE.csv by their identifiers: excavation number (every alternative number of a join, e.g. "RS 24.244"), KTU3 number (e.g. "KTU 1.3") and museal siglum (e.g. "AO 12.008"). The identifiers are indexed once (hash index for exact lookups, sorted keys for prefix and range queries) and the index is saved next to the CSV, so that it is rebuilt only when the CSV changes. """
+
+import os
+import re
+import sys
+import bisect
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+
+from database_snapshot import load_database, csv_key, csv_matches_key
+from excavation_numbers import decode_ex_nums
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+UGARIT_TEXTS_DATABASE_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
+
+# NOTE: change this when the structure of the index or the normalisation of identifiers changes, older indexes are then rebuilt.
+LOOKUP_INDEX_VERSION = 1
+
+DEFAULT_EXCAVATION_SIGLUM = 'RS'
+
+identifier_columns = {
+    'rs': ['Excavation Numbers "Cleared"'],
+    'ktu': ['KTU3'],
+    'museum': ['Museal Siglum', 'SAU Museal Siglum']
+}
+
+# NOTE: prefixes of queries that tell the kind of the identifier (see parse_query); queries without any of them are museal sigla.
+query_prefixes = {'rs': re.compile(r'(RS|RIH)(?![A-Z])\.?\s*', re.IGNORECASE), 'ktu': re.compile(r'KTU\s*(3\s*:)?\s*', re.IGNORECASE)}
+
+whitespace_pattern = re.compile(r'\s+')
+natural_parts_pattern = re.compile(r'(\d+)')
+
+# NOTE: a cell may contain more numbers, e.g. "4.5+4.19" or "2.36, 2.37" (KTU3), "1.087|1.084" (excavation numbers), "M3357 = A2746 (AO 12.008 + 12.024)" (museal siglum).
+ktu_delimiters = re.compile(r'[+,;|]')
+ex_num_delimiters = re.compile(r'\|')
+museum_delimiters = re.compile(r'[+,;|=()]')
+museum_siglum_pattern = re.compile(r'^(?P<collection>[^\d]*?)\s*(?P<number>\d[\w./-]*(?:\s*\[[^\]]*\]|\s+[A-Z]\b|\s*bis\b)?)')
+
+
+def normalise_text(value:str)->str:
+    """ Unifies whitespace (incl. non-breaking spaces) and case. """
+    return whitespace_pattern.sub(' ', value).strip().upper()
+
+
+def normalise_ktu(value:str)->list:
+    """ Returns the KTU numbers in the cell/query (without the "KTU" prefix), e.g. "4.5+4.19" --> ['4.5', '4.19']. """
+    value = query_prefixes['ktu'].sub('', normalise_text(value), count=1)
+    return [ktu_num.replace(' ', '') for ktu_num in (part.strip() for part in ktu_delimiters.split(value)) if ktu_num]
+
+
+def normalise_ex_num(ex_num:str, excavation_siglum:str=DEFAULT_EXCAVATION_SIGLUM)->list:
+    """ Returns the keys of the excavation number, e.g. "24.244" --> ['RS 24.244'] (the siglum is taken from the number if it has one, e.g. "RIH 77.01"). """
+    keys = []
+    for part in ex_num_delimiters.split(normalise_text(ex_num)):
+        part = part.strip()
+        siglum_match = query_prefixes['rs'].match(part)
+        if siglum_match:
+            excavation_siglum, part = siglum_match[1], part[siglum_match.end():]
+        if part:
+            keys.append(f'{excavation_siglum.upper()} {part.replace(" ", "")}')
+
+    return keys
+
+
+def normalise_museal_siglum(value:str)->list:
+    """ Returns the museal sigla in the cell/query, e.g. "M3357 = A2746 (AO 12.008 + 12.024)" --> ['M 3357', 'A 2746', 'AO 12.008', 'AO 12.024']. Parts without any number (e.g., "Damas s.n.", "D -") are left out; a number without a collection belongs to the collection of the previous siglum. """
+    sigla = []
+    collection = ''
+    for part in museum_delimiters.split(normalise_text(value)):
+        siglum_match = museum_siglum_pattern.match(part.strip())
+        if not siglum_match:
+            continue
+        if siglum_match['collection']:
+            collection = siglum_match['collection'].strip()
+        siglum = f'{collection} {siglum_match["number"].replace(" ", "")}'.strip()
+        if siglum not in sigla:
+            sigla.append(siglum)
+
+    return sigla
+
+
+def natural_key(key:str)->tuple:
+    """ Sort key comparing the numbers in the key as numbers ("KTU 1.2" < "KTU 1.10"); the key itself breaks ties (e.g., "19.65" and "19.065"). """
+    return tuple((0, int(part)) if part.isdigit() else (1, part) for part in natural_parts_pattern.split(key) if part) + ((2, key),)
+
+
+def collect_identifiers(db:pd.core.frame.DataFrame)->dict:
+    """ Returns kind of identifier --> list of (key, row position) for all identifiers of the rows of db. """
+    identifiers = {kind: [] for kind in identifier_columns}
+
+    excavation_sigla = db['Excavation Siglum'].fillna(DEFAULT_EXCAVATION_SIGLUM).to_numpy()
+    for column in identifier_columns['rs']:
+        for position, encoded in enumerate(db[column].to_numpy()):
+            for ex_num in decode_ex_nums(encoded):
+                identifiers['rs'].extend((key, position) for key in normalise_ex_num(ex_num, excavation_sigla[position]))
+
+    for kind, normalise in [('ktu', normalise_ktu), ('museum', normalise_museal_siglum)]:
+        for column in identifier_columns[kind]:
+            for position, value in enumerate(db[column].to_numpy()):
+                if type(value) == str:
+                    identifiers[kind].extend((key, position) for key in normalise(value))
+
+    return identifiers
+
+
+def build_lookup_index(db:pd.core.frame.DataFrame)->dict:
+    """
+    This function builds the index of the identifiers of the texts.
+
+    Args:
+        db (pd.core.frame.DataFrame): the database (the positions in the index are positions of its rows)
+
+    Returns:
+        dict: "row_ids" (index of db) and for each kind of identifier ("rs", "ktu", "museum"): "positions" (key --> np.array of row positions, in the order of the rows), "keys" (keys sorted as strings, for prefix queries) and "natural_keys" (keys and their natural_key sorted by natural_key, for range queries)
+    """
+    lookup_index = {'row_ids': db.index.to_numpy()}
+
+    for kind, identifiers in collect_identifiers(db).items():
+        key_positions = {}
+        for key, position in identifiers:
+            key_positions.setdefault(key, set()).add(position)
+
+        positions = {key: np.array(sorted(key_positions[key]), dtype=np.intp) for key in key_positions}
+        natural_keys = sorted((natural_key(key), key) for key in positions)
+        lookup_index[kind] = {
+            'positions': positions,
+            'keys': sorted(positions),
+            'natural_keys': [key for sort_key, key in natural_keys],
+            'natural_sort_keys': [sort_key for sort_key, key in natural_keys]
+        }
+
+    return lookup_index
+
+
+def lookup_index_path(csv_path:str)->str:
+    return f'{os.path.splitext(csv_path)[0]}.lookup.pickle'
+
+
+def load_lookup_index(csv_path:str=UGARIT_TEXTS_DATABASE_PATH, db:pd.core.frame.DataFrame=None)->dict:
+    """
+    This function loads the index saved next to the CSV if it was made from the same content of the CSV; otherwise it builds the index and saves it.
+
+    Args:
+        csv_path (str, optional): path to the database. Defaults to UGARIT_TEXTS_DATABASE_PATH.
+        db (pd.core.frame.DataFrame, optional): the database loaded from csv_path (it is loaded only if the index has to be built). Defaults to None.
+
+    Returns:
+        dict: the index (see build_lookup_index)
+    """
+    index_path = lookup_index_path(csv_path)
+
+    try:
+        with open(index_path, 'rb') as f:
+            saved_index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        saved_index = None
+
+    if saved_index and saved_index.get('version') == LOOKUP_INDEX_VERSION:
+        if csv_matches_key(csv_path, saved_index['csv']):
+            return saved_index['index']
+
+    if db is None:
+        db = load_database(csv_path)
+    lookup_index = build_lookup_index(db)
+
+    try:
+        with open(index_path + '.tmp', 'wb') as f:
+            pickle.dump({'version': LOOKUP_INDEX_VERSION, 'csv': csv_key(csv_path), 'index': lookup_index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError as e:
+        print('The lookup index could not be saved:', e)
+
+    return lookup_index
+
+
+def query_keys(kind:str, query:str)->list:
+    """ Returns the keys of the index for the query (normalised as the identifiers in the database). """
+    if kind == 'rs':
+        return normalise_ex_num(query)
+    elif kind == 'ktu':
+        return normalise_ktu(query)
+    elif kind == 'museum':
+        return normalise_museal_siglum(query)
+    else:
+        raise ValueError(f'Unknown kind of identifier: {kind} (use one of {list(identifier_columns)})')
+
+
+def merge_positions(positions:list)->np.ndarray:
+    if not positions:
+        return np.array([], dtype=np.intp)
+    if len(positions) == 1:
+        return positions[0]
+    return np.unique(np.concatenate(positions))
+
+
+def find_positions(lookup_index:dict, kind:str, query:str)->np.ndarray:
+    """ Returns the row positions of the texts with the identifier (e.g., find_positions(index, 'rs', 'RS 24.244')); a query with more identifiers (e.g., "4.5+4.19") finds texts with any of them. """
+    kind_index = lookup_index[kind]['positions']
+    return merge_positions([kind_index[key] for key in query_keys(kind, query) if key in kind_index])
+
+
+def find_prefix_positions(lookup_index:dict, kind:str, prefix:str)->np.ndarray:
+    """ Returns the row positions of the texts with any identifier starting with the prefix (e.g., 'KTU 1.' for all of KTU 1, 'RS 24.' for all of RS 24). The prefix is compared as a string: "KTU 1.1" matches 1.1, 1.10, 1.100, ... """
+    prefix_keys = query_keys(kind, prefix + '0')
+    if not prefix_keys:
+        return np.array([], dtype=np.intp)
+    # NOTE: the "0" added above keeps the prefix from being dropped by the normalisation (e.g., "AO " has no number); it is removed here again.
+    prefix = prefix_keys[0][:-1]
+
+    keys = lookup_index[kind]['keys']
+    start = bisect.bisect_left(keys, prefix)
+    end = bisect.bisect_left(keys, prefix + '\uffff', lo=start)
+
+    kind_index = lookup_index[kind]['positions']
+    return merge_positions([kind_index[key] for key in keys[start:end]])
+
+
+def find_range_positions(lookup_index:dict, kind:str, first:str, last:str)->np.ndarray:
+    """ Returns the row positions of the texts with any identifier between first and last (both included), comparing the numbers in them as numbers, e.g. find_range_positions(index, 'ktu', '1.1', '1.20'). """
+    first_keys, last_keys = query_keys(kind, first), query_keys(kind, last)
+    if not first_keys or not last_keys:
+        return np.array([], dtype=np.intp)
+
+    sort_keys = lookup_index[kind]['natural_sort_keys']
+    start = bisect.bisect_left(sort_keys, natural_key(first_keys[0])[:-1])
+    end = bisect.bisect_right(sort_keys, natural_key(last_keys[0])[:-1] + ((3, ''),), lo=start)
+
+    kind_index = lookup_index[kind]['positions']
+    return merge_positions([kind_index[key] for key in lookup_index[kind]['natural_keys'][start:end]])
+
+
+def find_row_ids(lookup_index:dict, kind:str, query:str)->np.ndarray:
+    """ Returns the row IDs (index of the database) of the texts found by the query; a query ending with "*" is a prefix query (e.g., "KTU 1.*"). """
+    if query.endswith('*'):
+        return lookup_index['row_ids'][find_prefix_positions(lookup_index, kind, query[:-1])]
+    return lookup_index['row_ids'][find_positions(lookup_index, kind, query)]
+
+
+def select_texts(db:pd.core.frame.DataFrame, lookup_index:dict, kind:str, query:str)->pd.core.frame.DataFrame:
+    """ Returns the rows of db found by the query (see find_row_ids); the index must have been built from db. """
+    if query.endswith('*'):
+        return db.iloc[find_prefix_positions(lookup_index, kind, query[:-1])]
+    return db.iloc[find_positions(lookup_index, kind, query)]
+
+
+def parse_query(query:str)->tuple:
+    """ Returns the kind of identifier and the query, e.g. "KTU 1.3" --> ('ktu', 'KTU 1.3'), "RS 24.*" --> ('rs', 'RS 24.*'), "AO 12.008" --> ('museum', 'AO 12.008'). """
+    for kind, prefix_pattern in query_prefixes.items():
+        if prefix_pattern.match(query.strip()):
+            return kind, query.strip()
+    return 'museum', query.strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Looks up texts of the database by excavation number (RS ..., RIH ...), KTU3 number (KTU ...) or museal siglum; a query ending with "*" finds all identifiers starting with it (e.g., "KTU 1.*").')
+    parser.add_argument('queries', nargs='+', help='e.g., "RS 24.244" "KTU 1.*" "AO 12.008"')
+    parser.add_argument('--database', default=UGARIT_TEXTS_DATABASE_PATH, help='path to UGARIT_TEXTS_DATABASE.csv (default: the one next to this script)')
+    parser.add_argument('--columns', nargs='+', default=['Excavation Siglum', 'Excavation Numbers "Cleared"', 'KTU3', 'Museal Siglum'], help='columns to print')
+    arguments = parser.parse_args()
+
+    db = load_database(arguments.database)
+    lookup_index = load_lookup_index(arguments.database, db)
+
+    found_texts = 0
+    for query in arguments.queries:
+        kind, query = parse_query(query)
+        texts = select_texts(db, lookup_index, kind, query)
+        found_texts += len(texts)
+        print(f'{query} ({kind}): {len(texts)} texts')
+        if len(texts):
+            print(texts[arguments.columns].to_string())
+        print()
+
+    sys.exit(0 if found_texts else 1)
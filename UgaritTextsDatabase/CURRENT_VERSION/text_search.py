@@ -0,0 +1,276 @@
+""" This file serves to search the free-text columns of UGARIT_TEXTS_DATABASE.csv (descriptions, notes, bibliography, possible religious genres) by words and phrases. The words of the columns are kept in an inverted index (word --> texts and positions of the word in them), the texts found are ranked by BM25. The index is saved next to the CSV; when the CSV changes, only the rows whose indexed columns changed are indexed again. """
+
+import os
+import re
+import sys
+import math
+import pickle
+import argparse
+import unicodedata
+import pandas as pd
+
+from database_snapshot import load_database, csv_key, csv_matches_key
+from incremental_stats import hash_rows
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+UGARIT_TEXTS_DATABASE_PATH = os.path.join(ROOT_PATH, 'UGARIT_TEXTS_DATABASE.csv')
+
+# NOTE: change this when the structure of the index or the tokenisation changes, older indexes are then rebuilt.
+SEARCH_INDEX_VERSION = 1
+
+search_columns = ['RSTI description', 'Note', 'Clemens Note', 'SAU Biblio (not full!!)', 'possible relevant (religious) genres']
+
+# NOTE: the usual parameters of BM25 (k1: saturation of the frequency of a word in a text, b: normalisation by the length of the text).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# NOTE: words are sequences of letters and digits of any script; diacritics and transliteration signs are kept (e.g., "Lamaštu", "ˁbd"), only the case is unified. Other characters (spaces, punctuation, "." in "4.464") separate the words.
+token_pattern = re.compile(r'\w+')
+query_pattern = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenise(value:str)->list:
+    """ Returns the words of the value, e.g. "Ritual for Rašap (KTU 1.91)" --> ['ritual', 'for', 'rašap', 'ktu', '1', '91']. The text is normalised to NFC first, so that "š" written as one character or as "s" with a combining caron is the same word. """
+    return token_pattern.findall(unicodedata.normalize('NFC', value).casefold())
+
+
+def empty_search_index(fields:list=search_columns)->dict:
+    return {
+        'fields': list(fields),
+        'row_hashes': {},
+        'order': {},
+        'postings': {field: {} for field in fields},
+        'lengths': {field: {} for field in fields},
+        'total_lengths': {field: 0 for field in fields},
+        'document_terms': {}
+    }
+
+
+def add_document(search_index:dict, row_id, values:list, token_cache:dict):
+    document_terms = {}
+    for field, value in zip(search_index['fields'], values):
+        if type(value) != str:
+            continue
+
+        if value not in token_cache:
+            term_positions = {}
+            tokens = tokenise(value)
+            for position, term in enumerate(tokens):
+                term_positions.setdefault(term, []).append(position)
+            token_cache[value] = (len(tokens), {term: tuple(positions) for term, positions in term_positions.items()})
+        length, term_positions = token_cache[value]
+        if not length:
+            continue
+
+        field_postings = search_index['postings'][field]
+        for term, positions in term_positions.items():
+            field_postings.setdefault(term, {})[row_id] = positions
+        search_index['lengths'][field][row_id] = length
+        search_index['total_lengths'][field] += length
+        document_terms[field] = tuple(term_positions)
+
+    search_index['document_terms'][row_id] = document_terms
+
+
+def remove_document(search_index:dict, row_id):
+    for field, terms in search_index['document_terms'].pop(row_id, {}).items():
+        field_postings = search_index['postings'][field]
+        for term in terms:
+            del field_postings[term][row_id]
+            if not field_postings[term]:
+                del field_postings[term]
+        search_index['total_lengths'][field] -= search_index['lengths'][field].pop(row_id)
+
+
+def update_search_index(search_index:dict, db:pd.core.frame.DataFrame)->dict:
+    """
+    This function brings the index up to date with db: rows that are new or whose indexed columns changed are indexed (again), rows no longer in db are removed from the index.
+
+    Args:
+        search_index (dict): the index (see empty_search_index), it is changed in place
+        db (pd.core.frame.DataFrame): the database (its index identifies the rows)
+
+    Returns:
+        dict: numbers of "added", "changed" and "removed" rows
+    """
+    fields = search_index['fields']
+    row_hashes = dict(zip(db.index, hash_rows(db[fields]).to_numpy().tolist()))
+    old_hashes = search_index['row_hashes']
+
+    removed_rows = [row_id for row_id in old_hashes if row_id not in row_hashes]
+    changed_rows = [row_id for row_id, row_hash in row_hashes.items() if row_id in old_hashes and old_hashes[row_id] != row_hash]
+    added_rows = [row_id for row_id in row_hashes if row_id not in old_hashes]
+
+    for row_id in removed_rows + changed_rows:
+        remove_document(search_index, row_id)
+
+    # NOTE: the words of a value are found only once per update, the free-text columns repeat many values (e.g., "Tablet, Alphabetic Ugaritic").
+    token_cache = {}
+    rows_to_index = set(changed_rows + added_rows)
+    if rows_to_index:
+        values = db[fields].to_numpy()
+        for position, row_id in enumerate(db.index):
+            if row_id in rows_to_index:
+                add_document(search_index, row_id, values[position], token_cache)
+
+    search_index['row_hashes'] = row_hashes
+    search_index['order'] = {row_id: position for position, row_id in enumerate(db.index)}
+
+    return {'added': len(added_rows), 'changed': len(changed_rows), 'removed': len(removed_rows)}
+
+
+def build_search_index(db:pd.core.frame.DataFrame, fields:list=search_columns)->dict:
+    """ This function builds the index of the words of the columns (fields) of db. """
+    search_index = empty_search_index(fields)
+    update_search_index(search_index, db)
+    return search_index
+
+
+def search_index_path(csv_path:str)->str:
+    return f'{os.path.splitext(csv_path)[0]}.search.pickle'
+
+
+def load_search_index(csv_path:str=UGARIT_TEXTS_DATABASE_PATH, db:pd.core.frame.DataFrame=None)->dict:
+    """
+    This function loads the index saved next to the CSV. If the CSV changed since the index was saved, the index is updated (see update_search_index) and saved again; it is built anew only if there is no usable saved index.
+
+    Args:
+        csv_path (str, optional): path to the database. Defaults to UGARIT_TEXTS_DATABASE_PATH.
+        db (pd.core.frame.DataFrame, optional): the database loaded from csv_path (it is loaded only if the index has to be updated). Defaults to None.
+
+    Returns:
+        dict: the index (see empty_search_index)
+    """
+    index_path = search_index_path(csv_path)
+
+    try:
+        with open(index_path, 'rb') as f:
+            saved_index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        saved_index = None
+
+    if saved_index and saved_index.get('version') == SEARCH_INDEX_VERSION and saved_index['index']['fields'] == search_columns:
+        if csv_matches_key(csv_path, saved_index['csv']):
+            return saved_index['index']
+        search_index = saved_index['index']
+    else:
+        search_index = empty_search_index()
+
+    if db is None:
+        db = load_database(csv_path)
+    updated_rows = update_search_index(search_index, db)
+    print(f'The search index was updated (rows added: {updated_rows["added"]}, changed: {updated_rows["changed"]}, removed: {updated_rows["removed"]}).')
+
+    try:
+        with open(index_path + '.tmp', 'wb') as f:
+            pickle.dump({'version': SEARCH_INDEX_VERSION, 'csv': csv_key(csv_path), 'index': search_index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError as e:
+        print('The search index could not be saved:', e)
+
+    return search_index
+
+
+def parse_search_query(query:str)->list:
+    """ Returns the parts of the query as lists of words: a part in quotes is a phrase (its words must follow each other), other parts are single words, e.g. 'ritual "KTU 1.91"' --> [['ritual'], ['ktu', '1', '91']]. A part without quotes that consists of more words (e.g., "4.464") is also a phrase. """
+    parts = []
+    for phrase, word in query_pattern.findall(query):
+        terms = tokenise(phrase or word)
+        if terms:
+            parts.append(terms)
+    return parts
+
+
+def find_phrase(field_postings:dict, terms:list)->dict:
+    """ Returns row ID --> number of occurrences of the words (terms) one after another in the field. """
+    if any(term not in field_postings for term in terms):
+        return {}
+    if len(terms) == 1:
+        return {row_id: len(positions) for row_id, positions in field_postings[terms[0]].items()}
+
+    term_postings = [field_postings[term] for term in terms]
+    # NOTE: the rows are taken from the rarest word of the phrase.
+    rarest_postings = min(term_postings, key=len)
+    phrase_counts = {}
+    for row_id in rarest_postings:
+        if not all(row_id in postings for postings in term_postings):
+            continue
+        following_positions = [set(postings[row_id]) for postings in term_postings[1:]]
+        count = sum(1 for start in term_postings[0][row_id] if all(start + offset in positions for offset, positions in enumerate(following_positions, start=1)))
+        if count:
+            phrase_counts[row_id] = count
+
+    return phrase_counts
+
+
+def search(search_index:dict, query:str, fields:list=None, match_all:bool=False, limit:int=None)->list:
+    """
+    This function finds the texts matching the query and ranks them by BM25 (the scores of the words and phrases of the query in all the fields searched are summed).
+
+    Args:
+        search_index (dict): the index (see load_search_index)
+        query (str): words and phrases in quotes, e.g. 'Lamaštu "no religious content"'
+        fields (list, optional): columns to search. Defaults to None (all indexed columns).
+        match_all (bool, optional): find only texts containing every word and phrase of the query (otherwise any of them). Defaults to False.
+        limit (int, optional): maximum number of texts returned. Defaults to None (all).
+
+    Returns:
+        list: (row ID, score) of the texts found, the best first (texts with equal scores in the order of the rows)
+    """
+    fields = search_index['fields'] if fields is None else fields
+    unknown_fields = [field for field in fields if field not in search_index['fields']]
+    if unknown_fields:
+        raise ValueError(f'Columns not in the search index: {unknown_fields} (use some of {search_index["fields"]})')
+
+    text_count = len(search_index['row_hashes'])
+    query_parts = parse_search_query(query)
+    scores = {}
+    matched_parts = {}
+    for part_number, terms in enumerate(query_parts):
+        for field in fields:
+            average_length = search_index['total_lengths'][field] / text_count if text_count else 0
+            if not average_length:
+                continue
+
+            phrase_counts = find_phrase(search_index['postings'][field], terms)
+            idf = math.log(1 + (text_count - len(phrase_counts) + 0.5) / (len(phrase_counts) + 0.5))
+            lengths = search_index['lengths'][field]
+            for row_id, count in phrase_counts.items():
+                length_norm = 1 - BM25_B + BM25_B * lengths[row_id] / average_length
+                scores[row_id] = scores.get(row_id, 0.0) + idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+                matched_parts.setdefault(row_id, set()).add(part_number)
+
+    if match_all:
+        scores = {row_id: score for row_id, score in scores.items() if len(matched_parts[row_id]) == len(query_parts)}
+
+    order = search_index['order']
+    found_texts = sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+    return found_texts if limit is None else found_texts[:limit]
+
+
+def search_texts(db:pd.core.frame.DataFrame, search_index:dict, query:str, fields:list=None, match_all:bool=False, limit:int=None)->pd.core.frame.DataFrame:
+    """ Returns the rows of db found by the query (see search), the best first, with their score in the column "score"; the index must be up to date with db. """
+    found_texts = search(search_index, query, fields=fields, match_all=match_all, limit=limit)
+    return db.loc[[row_id for row_id, score in found_texts]].assign(score=[score for row_id, score in found_texts])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Searches the free-text columns of the database (descriptions, notes, bibliography, possible religious genres) by words and phrases in quotes, e.g. \'Lamaštu "no religious content"\'; the texts found are ranked by BM25.')
+    parser.add_argument('query', help='words and "phrases" to search for')
+    parser.add_argument('--database', default=UGARIT_TEXTS_DATABASE_PATH, help='path to UGARIT_TEXTS_DATABASE.csv (default: the one next to this script)')
+    parser.add_argument('--fields', nargs='+', default=None, help=f'columns to search (default: all of {search_columns})')
+    parser.add_argument('--all', action='store_true', help='find only texts containing every word and phrase of the query')
+    parser.add_argument('--limit', type=int, default=20, help='maximum number of texts printed (default: 20)')
+    parser.add_argument('--columns', nargs='+', default=['Excavation Numbers "Cleared"', 'KTU3'], help='columns to print besides the columns searched')
+    arguments = parser.parse_args()
+
+    db = load_database(arguments.database)
+    search_index = load_search_index(arguments.database, db)
+
+    texts = search_texts(db, search_index, arguments.query, fields=arguments.fields, match_all=arguments.all)
+    print(f'{arguments.query}: {len(texts)} texts')
+    if len(texts):
+        printed_columns = ['score'] + arguments.columns + [column for column in (arguments.fields or search_columns) if column not in arguments.columns]
+        print(texts.head(arguments.limit)[printed_columns].to_string())
+
+    sys.exit(0 if len(texts) else 1)